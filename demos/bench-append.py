@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (C) 2013 Nicolas P. Rougier. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY NICOLAS P. ROUGIER ''AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL NICOLAS P. ROUGIER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of Nicolas P. Rougier.
+# -----------------------------------------------------------------------------
+"""
+Compare construction time of large collections using one append per item
+versus a single append_many (no OpenGL context is needed).
+"""
+import time
+import numpy as np
+from shapes import star
+from glagg import PathCollection, CircleCollection
+
+
+def bench(name, function, collection, *args):
+    t0 = time.time()
+    function(collection, *args)
+    t = time.time()-t0
+    print "%-28s %8.3f second(s)" % (name, t)
+    return t
+
+
+def circles_append(collection, centers):
+    for center in centers:
+        collection.append(center=center, radius=5)
+
+def circles_append_many(collection, centers):
+    collection.append_many(centers, radius=5)
+
+def paths_append(collection, vertices, translate):
+    for i in range(len(vertices)):
+        collection.append(vertices[i], closed=True, translate=translate[i], scale=10)
+
+def paths_append_many(collection, vertices, translate):
+    collection.append_many(vertices, closed=True, translate=translate, scale=10)
+
+
+# -----------------------------------------------------------------------------
+if __name__ == '__main__':
+    n = 10000
+
+    print "%d circles" % n
+    centers = np.random.uniform(0,800,(n,2))
+    t1 = bench("  append", circles_append, CircleCollection(), centers)
+    t2 = bench("  append_many", circles_append_many, CircleCollection(), centers)
+    print "  speedup: %.1fx" % (t1/t2)
+    t3 = bench("  append_many (instanced)", circles_append_many,
+               CircleCollection(instanced=True), centers)
+    print "  speedup: %.1fx" % (t1/t3)
+
+    print "%d stars" % n
+    vertices = [star(n=5)]*n
+    translate = np.random.uniform(0,800,(n,2))
+    t1 = bench("  append", paths_append, PathCollection(), vertices, translate)
+    t2 = bench("  append_many", paths_append_many, PathCollection(), vertices, translate)
+    print "  speedup: %.1fx" % (t1/t2)
@@ -58,7 +58,7 @@ if __name__ == '__main__':
     glut.glutReshapeFunc(on_reshape)
     glut.glutKeyboardFunc(on_keyboard)
 
-    collection = CircleCollection()
+    collection = CircleCollection(instanced=True)
     radius = 255.0
     theta, dtheta = 0, 5.5/180.0*math.pi
     for i in range(500):
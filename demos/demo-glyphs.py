@@ -44,6 +44,7 @@ def on_display():
 def on_reshape(width, height):
     collection.translate = position * [width, height]
     gl.glViewport(0, 0, width, height)
+    collection.viewport = 0, 0, width, height
 
 # -------------------------------------
 def on_keyboard(key, x, y):
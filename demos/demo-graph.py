@@ -149,13 +149,13 @@ def integration(nodes, links):
 def on_display():
     gl.glClearColor(1,1,1,1);
     gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
-    lines.draw()
-    circles.draw()
+    renderer.draw()
     glut.glutSwapBuffers()
 
 # -------------------------------------
 def on_reshape(width, height):
     gl.glViewport(0, 0, width, height)
+    renderer.viewport = 0, 0, width, height
 
 # -------------------------------------
 def on_keyboard(key, x, y):
@@ -178,6 +178,18 @@ def on_mouse(button, state, x, y):
             drag = True
 
 
+# -------------------------------------
+def update():
+    # Collections are instanced: one vertex per node and one per link
+    circles.vertices.data['a_center'] = nodes['position']
+    circles.vertices.set_dirty()
+    circles._vbuffer._dirty = True
+    lines.vertices.data['a_p0'] = nodes[links['source']]['position']
+    lines.vertices.data['a_p1'] = nodes[links['target']]['position']
+    lines.vertices.set_dirty()
+    lines._vbuffer._dirty = True
+
+
 # -------------------------------------
 def on_motion(x, y):
     global drag, mouse, index
@@ -185,16 +197,7 @@ def on_motion(x, y):
         _,_,w,h = gl.glGetIntegerv( gl.GL_VIEWPORT )
         nodes['position'][index] = x,h-y
 
-        P = nodes['position']
-        circles.vertices.data['a_center'] = np.repeat(P,4,axis=0)
-        circles._vbuffer._dirty = True
-        src = nodes[links['source']]['position']
-        tgt = nodes[links['target']]['position']
-        src = np.repeat(src,4,axis=0)
-        lines.vertices.data['a_p0'] = src
-        tgt = np.repeat(tgt,4,axis=0)
-        lines.vertices.data['a_p1'] = tgt
-        lines._vbuffer._dirty = True
+        update()
 
     glut.glutPostRedisplay()
 
@@ -207,17 +210,7 @@ def on_timer(fps):
     attraction(nodes,links)
     integration(nodes,links)
 
-    # Update collection
-    P = nodes['position']
-    circles.vertices.data['a_center'] = np.repeat(P,4,axis=0)
-    circles._vbuffer._dirty = True
-    src = nodes[links['source']]['position']
-    tgt = nodes[links['target']]['position']
-    src = np.repeat(src,4,axis=0)
-    lines.vertices.data['a_p0'] = src
-    tgt = np.repeat(tgt,4,axis=0)
-    lines.vertices.data['a_p1'] = tgt
-    lines._vbuffer._dirty = True
+    update()
 
     glut.glutTimerFunc(1000/fps, on_timer, fps)
     glut.glutPostRedisplay()
@@ -226,7 +219,7 @@ def on_timer(fps):
 
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
-    from glagg import LineCollection, CircleCollection
+    from glagg import LineCollection, CircleCollection, Renderer
 
     glut.glutInit(sys.argv)
     glut.glutInitDisplayMode(glut.GLUT_DOUBLE | glut.GLUT_RGB | glut.GLUT_DEPTH)
@@ -241,8 +234,8 @@ if __name__ == '__main__':
 
     nodes,links = graph( )
 
-    circles = CircleCollection()
-    lines = LineCollection()
+    circles = CircleCollection(instanced=True)
+    lines = LineCollection(instanced=True)
     for node in nodes:
         position = node['position']
         circles.append(center = position, radius=5, linewidth=2,
@@ -253,6 +246,9 @@ if __name__ == '__main__':
     V = np.array(zip(src,tgt)).reshape(2*len(src),2)
     lines.append(V, linewidth=1.5, color=(0.75,0.75,0.75,1.00))
 
+    # Nodes are drawn on top of links
+    renderer = Renderer([lines, circles], sort=False)
+
     drag,index = False, -1
 
     fps = 60
@@ -40,6 +40,7 @@ def on_display():
 # -------------------------------------
 def on_reshape(width, height):
     gl.glViewport(0, 0, width, height)
+    collection.viewport = 0, 0, width, height
 
 # -------------------------------------
 def on_keyboard(key, x, y):
@@ -98,33 +99,13 @@ def on_wheel(wheel, direction, x, y):
         on_scroll(direction,0)
 
 
-# -------------------------------------
-def svg_open(filename):
-    dom = xml.dom.minidom.parse(filename)
-    tag = dom.documentElement
-    if tag.tagName != 'svg':
-        raise ValueError('document is <%s> instead of <svg>'%tag.tagName)
-    path_re = re.compile(r'([MLHVCSQTAZ])([^MLHVCSQTAZ]+)', re.IGNORECASE)
-    float_re = re.compile(r'(?:[\s,]*)([+-]?\d+(?:\.\d+)?)')
-    path = Path()
-    for tag in tag.getElementsByTagName('g'):
-        for tag in tag.getElementsByTagName('path'):
-            for cmd, values in path_re.findall(tag.getAttribute('d')):
-                points = [float(v) for v in float_re.findall(values)]
-                path.svg_parse(cmd, points)
-    return path.vertices
-
-
 # -----------------------------------------------------------------------------
 if __name__ == '__main__':
     import sys
     import numpy as np
     import OpenGL.GL as gl
     import OpenGL.GLUT as glut
-    import re
-    import xml.dom
-    import xml.dom.minidom
-    from glagg import Path, PathCollection
+    from glagg import PathCollection, Approximation, svg
 
     t0, frames, t = glut.glutGet(glut.GLUT_ELAPSED_TIME), 0, 0
     glut.glutInit(sys.argv)
@@ -155,20 +136,10 @@ if __name__ == '__main__':
             glut.glutMouseWheelFunc(on_wheel)
 
 
-    collection = PathCollection()
-    def dist(v0,v1):
-        x0,y0 = v0
-        x1,y1 = v1
-        dx,dy = (x1-x0), (y1-y0)
-        return dx*dx+dy*dy
-
-    vertices = svg_open('data/tiger.svg')
-    for V in vertices:
-        closed = dist(V[0],V[-1]) < 1e-10
-        V = np.array(V)
-        V[:,1] = -V[:,1]
-        collection.append(V, closed=closed, linewidth=scale/4.0,
-                          translate=translate, scale=scale,
-                          dash_pattern = 'loosely dashed')
+    collection = PathCollection(packed=True, itype=np.uint16)
+    path = svg.load('data/tiger.svg', Approximation(scale), flip=True)
+    collection.append_path(path, linewidth=scale/4.0,
+                           translate=translate, scale=scale,
+                           dash_pattern = 'loosely dashed')
 
     glut.glutMainLoop()
@@ -30,6 +30,7 @@
 # -----------------------------------------------------------------------------
 
 import sdf
+import svg
 #import spatial_filter
 
 from path import Path
@@ -37,6 +38,9 @@ from transforms import *
 from shader import Shader
 from dash_atlas import DashAtlas
 from vertex_buffer import VertexBuffer
+from renderer import Renderer, RenderState
+from uniform_storage import UniformTexture, WrappedUniformTexture
+from uniform_storage import UniformTextureBuffer
 from glyph_collection import GlyphCollection
 from path_collection import PathCollection
 from line_collection import LineCollection
@@ -45,4 +49,5 @@ from circle_collection import CircleCollection
 from ellipse_collection import EllipseCollection
 from arc import elliptical_arc, arc
 from curves import curve3_bezier, curve4_bezier
+from curves import curve3_bezier_many, curve4_bezier_many, Approximation
 
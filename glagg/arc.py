@@ -53,8 +53,10 @@
 # ----------------------------------------------------------------------------
 import math
 import numpy as np
+from curves import Approximation
 
-def elliptical_arc(x0, y0, rx, ry, angle, large_arc_flag, sweep_flag, x2, y2):
+def elliptical_arc(x0, y0, rx, ry, angle, large_arc_flag, sweep_flag, x2, y2,
+                   approximation=None):
     """
     """
 
@@ -151,7 +153,8 @@ def elliptical_arc(x0, y0, rx, ry, angle, large_arc_flag, sweep_flag, x2, y2):
     if sweep_angle <= -2.0 * math.pi:
         sweep_angle = -2.0 * math.pi
 
-    V = arc( cx, cy, rx, ry, start_angle, start_angle+sweep_angle, sweep_flag )
+    V = arc( cx, cy, rx, ry, start_angle, start_angle+sweep_angle, sweep_flag,
+             approximation )
     c = math.cos(angle)
     s = math.sin(angle)
     X,Y = V[:,0]-cx, V[:,1]-cy
@@ -160,10 +163,12 @@ def elliptical_arc(x0, y0, rx, ry, angle, large_arc_flag, sweep_flag, x2, y2):
     return V
 
 
-def arc(cx, cy, rx, ry, a1, a2, ccw=False):
+def arc(cx, cy, rx, ry, a1, a2, ccw=False, approximation=None):
     """
     """
-    scale = 1.0
+    if approximation is None:
+        approximation = Approximation()
+    scale = approximation.scale
     ra = (abs(rx) + abs(ry)) / 2.0
     da = math.acos(ra / (ra + 0.125 / scale)) * 2.0
     if ccw:
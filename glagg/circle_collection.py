@@ -39,10 +39,27 @@ from collection import Collection
 # -----------------------------------------------------------------------------
 class CircleCollection(Collection):
     # ---------------------------------
-    def __init__(self, dash_atlas=None):
+    def __init__(self, dash_atlas=None, instanced=False):
+        """
+        Create a new circle collection.
+
+        Parameters
+        ----------
+
+        dash_atlas: DashAtlas
+            Dash atlas (a new one is created if None)
+
+        instanced: bool
+            Whether circles are drawn by instancing a single quad, each circle
+            being stored as a single vertex (center and uniform index).
+        """
         self.dash_atlas = dash_atlas
-        self.vtype = np.dtype([('a_center', 'f4', 2),
-                               ('a_texcoord', 'f4', 2)])
+        self.instanced = instanced
+        if instanced:
+            self.vtype = np.dtype([('a_center', 'f4', 2)])
+        else:
+            self.vtype = np.dtype([('a_center', 'f4', 2),
+                                   ('a_texcoord', 'f4', 2)])
         self.utype = np.dtype([('fg_color', 'f4', 4),
                                ('bg_color', 'f4', 4),
                                ('translate', 'f4', 2),
@@ -55,7 +72,12 @@ class CircleCollection(Collection):
                                ('dash_period', 'f4', 1),
                                ('dash_index', 'f4', 1),
                                ('dash_caps', 'f4', 2)])
-        Collection.__init__(self, self.vtype, self.utype)
+        if instanced:
+            Collection.__init__(self, self.vtype, self.utype,
+                                shape=self._quad())
+        else:
+            Collection.__init__(self, self.vtype, self.utype,
+                                quad=(0,1,2,1,2,3))
 
         if dash_atlas is None:
             self.dash_atlas = DashAtlas()
@@ -66,8 +88,8 @@ class CircleCollection(Collection):
         vertex_shader= os.path.join( shaders, 'circles.vert')
         fragment_shader= os.path.join( shaders, 'circles.frag')
 
-        self.shader = Shader( open(vertex_shader).read(),
-                              open(fragment_shader).read() )
+        self.shader = Shader.from_files( vertex_shader, fragment_shader,
+                                         self._ustorage.code )
 
 
     # ---------------------------------
@@ -96,11 +118,68 @@ class CircleCollection(Collection):
         Collection.append(self, V, I, U)
 
 
+    # ---------------------------------
+    def append_many( self, centers, radius=100.0,
+                     fg_color=(0, 0, 0, 1), bg_color=(1, 1, 1, 0),
+                     linewidth=1.0, antialias=1.0,
+                     translate=(0, 0), scale=1.0, rotate=0.0,
+                     dash_pattern='dotted', dash_phase=0.0, dash_caps=('round', 'round') ):
+        """
+        Append several circles at once. Each parameter is either common to all
+        circles (same as for append) or given for each circle.
+        """
+        V, I, vsizes, isizes = self.bake_many(centers)
+        U = np.zeros(len(vsizes), self.utype)
+        U['linewidth'] = linewidth
+        U['antialias'] = antialias
+        U['fg_color'] = fg_color
+        U['bg_color'] = bg_color
+        U['translate'] = translate
+        U['scale'] = scale
+        U['rotate'] = rotate
+        U['radius'] = radius
+        if self.dash_atlas:
+            dash = self._map(lambda key: self.dash_atlas[key], dash_pattern)
+            U['dash_phase'] = dash_phase
+            U['dash_index'] = dash[...,0]
+            U['dash_period'] = dash[...,1]
+            U['dash_caps'] = self._map(lambda key: self.caps.get(key, 1), dash_caps)
+        Collection.append_many(self, V, I, U, vsizes, isizes)
+
+
+    # ---------------------------------
+    def _quad(self):
+        """ Quad shared by all instances """
+        V = np.zeros(4, dtype=[('a_texcoord', 'f4', 2)])
+        V['a_texcoord'] = (-1, -1), (-1, +1), (+1, -1), (+1, +1)
+        I = np.array([0, 1, 2, 1, 2, 3], dtype=np.uint32)
+        return V, I
+
+
     # ---------------------------------
     def bake(self, center ):
+        if self.instanced:
+            V = np.zeros(1, dtype=self.vtype)
+            V['a_center'] = center
+            return V, np.zeros(0, dtype=np.uint32), 0
         V = np.zeros(4, dtype=self.vtype)
         V['a_center'] = center
         V['a_texcoord'] = (-1, -1), (-1, +1), (+1, -1), (+1, +1)
         I = np.array([0, 1, 2, 1, 2, 3], dtype=np.int32)
         return V, I, 0
 
+
+    # ---------------------------------
+    def bake_many(self, centers ):
+        centers = np.array(centers, dtype=np.float32).reshape(-1, 2)
+        n = len(centers)
+        if self.instanced:
+            V = np.zeros(n, dtype=self.vtype)
+            V['a_center'] = centers
+            I = np.zeros(0, dtype=np.uint32)
+            return V, I, np.ones(n, dtype=int), np.zeros(n, dtype=int)
+        V = np.zeros((n, 4), dtype=self.vtype)
+        V['a_center'] = centers.reshape(n, 1, 2)
+        V['a_texcoord'] = (-1, -1), (-1, +1), (+1, -1), (+1, +1)
+        I = np.resize(np.array([0, 1, 2, 1, 2, 3], dtype=np.uint32), 6*n)
+        return V.ravel(), I, 4*np.ones(n, dtype=int), 6*np.ones(n, dtype=int)
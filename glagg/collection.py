@@ -44,14 +44,23 @@ To modify a parameter (e.g. translate) for a single item (e.g. index=1)::
 
    collection['translate'][1] = x,y
 
+Uniforms are stored on the GPU using a uniform storage (see uniform_storage)
+that also provides the GLSL code vertex shaders use to fetch them. To store
+uniforms of all path collections in a texture buffer::
+
+    PathCollection.uniform_storage = UniformTextureBuffer
+
+Shaders of a collection must be created with this code prepended to the
+vertex shader (self._ustorage.code).
 """
 import numpy as np
 import OpenGL
 import OpenGL.GL as gl
 from operator import mul
-from transforms import orthographic
 from vertex_buffer import VertexBuffer
 from dynamic_buffer import DynamicBuffer
+from uniform_storage import UniformTexture
+from renderer import Renderer
 
 
 
@@ -198,6 +207,7 @@ class Item(object):
 
         if key in self.uniforms.dtype.names:
             self.uniforms[key] = value
+            self.parent._ubuffer.set_dirty(self.key)
             self.parent._dirty = True
             return
         raise KeyError
@@ -247,6 +257,7 @@ class Item(object):
                     getattr(self.parent,'set_'+name)(self.key, value)
                     return
                 uniforms[name] = value
+                self.parent._ubuffer.set_dirty(self.key)
                 self.parent._dirty = True
                 return
         object.__setattr__(self, name, value)
@@ -262,6 +273,10 @@ class CollectionException(Exception):
 # -----------------------------------------------------------------------------
 class Collection(object):
 
+    # Storage of uniforms on the GPU, created with the number of vec4 per
+    # item (see uniform_storage)
+    uniform_storage = UniformTexture
+
     join = { 'miter' : 0,
              'round' : 1,
              'bevel' : 2 }
@@ -284,7 +299,41 @@ class Collection(object):
 
 
     # ---------------------------------
-    def __init__(self, vtype, utype):
+    def __init__(self, vtype, utype, lazy=True, shape=None,
+                 itype=np.float32, normalized=(), quad=None):
+        """
+        Create a new collection.
+
+        Parameters
+        ----------
+
+        vtype: numpy dtype
+            Type of item vertices
+
+        utype: numpy dtype
+            Type of item uniforms (float32 fields only)
+
+        lazy: bool
+            Whether deleted items are only marked as free until compaction
+
+        shape: (array-like, array-like)
+            Vertices and indices of a shape shared by all items. If given,
+            the collection is instanced: item vertices (of type vtype) hold
+            per-instance attributes and the shape is drawn once per vertex.
+
+        itype: numpy dtype
+            Type of the uniform index vertex attribute (a_index). Integer
+            types limit the number of uniform rows (65536 for uint16).
+
+        normalized: sequence of str
+            Names of (integer) vertex fields whose values are normalized
+            to [-1,1] or [0,1] when accessed in shaders.
+
+        quad: sequence of 6 int
+            If given, item vertices are grouped as quads of 4 consecutive
+            vertices, triangulated using this pattern, and no indices are
+            stored (see VertexBuffer).
+        """
         self.dash_atlas = None
 
         # Convert types to lists (in case they were already dtypes) such that
@@ -293,7 +342,11 @@ class Collection(object):
         utype = eval(str(np.dtype(utype)))
 
         # We add a uniform index to access uniform data from texture
-        vtype.append( ('a_index', 'f4') )
+        vtype.append( ('a_index', np.dtype(itype).str) )
+        if np.dtype(itype).kind in 'iu':
+            self._imax = np.iinfo(itype).max
+        else:
+            self._imax = 2**24
 
         # Check if given utype is made of float32 only
         rutype = dtype_reduce(utype)
@@ -307,10 +360,26 @@ class Collection(object):
                 utype.append(('unnused', 'f4', size*4-count))
             count = size*4
             self.utype = utype
-        self._vbuffer = VertexBuffer(vtype)
-        self._ubuffer = DynamicBuffer( utype )
-        self._ubuffer_id = 0
-        self._ubuffer_shape = [0,count]
+        # With lazy buffers, deleted items are only marked as free and
+        # uniforms keep their location (hence a_index remains valid) until the
+        # collection is compacted.
+        self._lazy = lazy
+        if shape is None:
+            self._shape = None
+            self._vbuffer = VertexBuffer(vtype, lazy, normalized=normalized,
+                                         quad=quad)
+        else:
+            vertices, indices = shape
+            vertices = np.asarray(vertices)
+            self._shape = VertexBuffer(vertices.dtype)
+            self._shape.append(vertices, indices)
+            self._vbuffer = VertexBuffer(vtype, lazy, divisor=1,
+                                         normalized=normalized)
+        self._ubuffer = DynamicBuffer( utype, lazy )
+        # Uniform row (zeroed, owned by no item) used by free instances
+        self._free_row = None
+        self._renderer = Renderer( [self], sort=False )
+        self._ustorage = self.uniform_storage(count//4)
 
         self._dirty = True
 
@@ -321,22 +390,48 @@ class Collection(object):
 
     # ---------------------------------
     def __getitem__(self, key):
-        V = self._vbuffer.vertices[key]
-        I = self._vbuffer.indices[key]
+        V, I = self._vbuffer[key]
         U = self._ubuffer[key]
         return Item(self, key, V, I, U)
 
 
     # ---------------------------------
     def __delitem__(self, key):
-        start,end = self._vbuffer.vertices.range(key)
-        del self._vbuffer[key]
-        del self._ubuffer[key]
-        self._vbuffer.vertices.data['a_index'][start:] -= 1
+        if self._lazy:
+            if self._shape is not None:
+                items = self._vbuffer.vertices.items[key].reshape(-1,2).copy()
+            del self._vbuffer[key]
+            del self._ubuffer[key]
+            # Free quads are drawn but their vertices are all the same (zeroed)
+            # hence they are degenerate.
+            if self._shape is not None:
+                self._free_instances(items)
+            if self._ubuffer.fragmentation > self._ubuffer.threshold:
+                self.compact()
+        else:
+            start,end = self._vbuffer.vertices.range(key)
+            del self._vbuffer[key]
+            del self._ubuffer[key]
+            self._vbuffer.vertices.data['a_index'][start:] -= 1
+            self._vbuffer.vertices._set_dirty_range(start, len(self._vbuffer.vertices.data))
         self._vbuffer._dirty = True
         self._dirty = True
 
 
+    # ---------------------------------
+    def compact(self):
+        """ Reclaim space left by deleted items (lazy collection only) """
+
+        self._vbuffer.compact()
+        remap = self._ubuffer.compact()
+        if remap is not None:
+            self._free_row = None
+            index = self._vbuffer.vertices.data['a_index']
+            index[...] = remap[index.astype(int)]
+            self._vbuffer._dirty = True
+            self._dirty = True
+
+
     # ---------------------------------
     def get_vertices(self):
         return self._vbuffer.vertices
@@ -360,6 +455,7 @@ class Collection(object):
         if hasattr(self, '_ubuffer'):
             buffer = object.__getattribute__(self,'_ubuffer')
             if name in buffer.dtype.names:
+                self.compact()
                 return buffer.data[name]
         return object.__getattribute__(self,name)
 
@@ -370,8 +466,9 @@ class Collection(object):
         if hasattr(self, '_ubuffer'):
             buffer = object.__getattribute__(self,'_ubuffer')
             if name in buffer.dtype.names:
+                self.compact()
                 buffer.data[name] = value
-                # buffer._dirty = True
+                buffer.set_dirty()
                 object.__setattr__(self, '_dirty', True)
         object.__setattr__(self, name, value)
 
@@ -380,6 +477,7 @@ class Collection(object):
     def clear(self):
         self._vbuffer.clear()
         self._ubuffer.clear()
+        self._free_row = None
         self._dirty = True
 
 
@@ -388,13 +486,110 @@ class Collection(object):
         vertices = np.array(vertices).astype(self._vbuffer.vertices.dtype)
         indices  = np.array(indices).astype(self._vbuffer.indices.dtype)
         uniforms = np.array(uniforms).astype(self._ubuffer.dtype)
-        vertices['a_index'] = len(self)
-        self._vbuffer.append( vertices, indices)
+        self._check_index(1)
         self._ubuffer.append( uniforms )
-        self._ubuffer_shape[0] = len(self)
+        # Uniforms may have been stored in place of deleted ones (lazy buffer)
+        vertices['a_index'],_ = self._ubuffer.range(len(self._ubuffer)-1)
+        self._vbuffer.append( vertices, indices)
         self._dirty = True
 
 
+    # ---------------------------------
+    def append_many(self, vertices, indices, uniforms, vsizes, isizes):
+        """
+        Append several items at once.
+
+        Parameters
+        ----------
+
+        vertices: array-like
+            Concatenated vertices of all items
+
+        indices: array-like
+            Concatenated indices of all items, each one being relative to the
+            first vertex of its own item
+
+        uniforms: array-like
+            Uniforms of all items (one row per item)
+
+        vsizes: array-like
+            Number of vertices of each item
+
+        isizes: array-like
+            Number of indices of each item
+        """
+        vertices = np.array(vertices).astype(self._vbuffer.vertices.dtype)
+        uniforms = np.array(uniforms).astype(self._ubuffer.dtype).ravel()
+        count = len(uniforms)
+        self._check_index(count)
+        rstart = len(self._ubuffer.data)
+        self._ubuffer.append_many( uniforms, np.ones(count, dtype=int) )
+        vertices['a_index'] = np.repeat(np.arange(rstart, rstart+count), vsizes)
+        self._vbuffer.append_many( vertices, indices, vsizes, isizes )
+        self._dirty = True
+
+
+    # ---------------------------------
+    def replace(self, key, vertices, indices):
+        """
+        Replace vertices and indices of an item (of any size), keeping its
+        uniforms.
+
+        Parameters
+        ----------
+
+        key: int
+            Item index
+
+        vertices: array-like
+            New vertices of the item
+
+        indices: array-like
+            New indices of the item, relative to its first vertex
+        """
+        vertices = np.array(vertices).astype(self._vbuffer.vertices.dtype)
+        vertices['a_index'],_ = self._ubuffer.range(key)
+        items = self._vbuffer.vertices.items[key:key+1].copy()
+        self._vbuffer.replace(key, vertices, indices)
+        if self._shape is not None and self._lazy:
+            if tuple(self._vbuffer.vertices.range(key)) != tuple(items[0]):
+                self._free_instances(items)
+        self._dirty = True
+
+
+    # ---------------------------------
+    def _free_instances(self, items):
+        """
+        Make free instances (data locations of given vertex items) invisible.
+
+        Free instances are drawn anyway. They cannot use the uniforms of their
+        former item since uniform rows and vertices are reused independently,
+        so they all use a zeroed uniform row that belongs to no item.
+        """
+        vertices = self._vbuffer.vertices
+        if vertices.packed or not len(items):
+            return
+        if self._free_row is None:
+            self._free_row = self._ubuffer.reserve(1)
+        # Freed data has already been marked dirty
+        vertices.data['a_index'][vertices._gather(items)] = self._free_row
+
+
+    # ---------------------------------
+    def _check_index(self, count):
+        """ Check that count new uniform rows can be indexed by a_index """
+        if len(self._ubuffer.data) + count - 1 > self._imax:
+            raise CollectionException("Too many items for uniform index type")
+
+
+    # ---------------------------------
+    def _map(self, function, keys):
+        """ Map function over a single key or a (nested) sequence of keys """
+        keys = np.asarray(keys)
+        values = np.array([function(key) for key in keys.ravel()], dtype=np.float32)
+        return values.reshape(keys.shape + values.shape[1:])
+
+
     # ---------------------------------
     def upload(self):
 
@@ -402,35 +597,8 @@ class Collection(object):
             return
 
         self._vbuffer.upload()
-
-        gl.glActiveTexture( gl.GL_TEXTURE0 )
-        data = self._ubuffer.data.view(np.float32)
-        shape = self._ubuffer_shape
-        if not self._ubuffer_id:
-            self._ubuffer_id = gl.glGenTextures(1)
-
-            gl.glBindTexture( gl.GL_TEXTURE_2D, self._ubuffer_id )
-            gl.glPixelStorei( gl.GL_UNPACK_ALIGNMENT, 1 )
-            gl.glPixelStorei( gl.GL_PACK_ALIGNMENT, 1 )
-            gl.glTexParameterf( gl.GL_TEXTURE_2D,
-                                gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST )
-            gl.glTexParameterf( gl.GL_TEXTURE_2D,
-                                gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST )
-            gl.glTexParameterf( gl.GL_TEXTURE_2D,
-                                gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE )
-            gl.glTexParameterf( gl.GL_TEXTURE_2D,
-                                gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE )
-            gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_BASE_LEVEL, 0)
-            gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAX_LEVEL, 0)
-            gl.glTexImage2D( gl.GL_TEXTURE_2D, 0, gl.GL_RGBA32F,
-                             shape[1]//4, shape[0], 0, gl.GL_RGBA, gl.GL_FLOAT, data )
-
         gl.glActiveTexture( gl.GL_TEXTURE0 )
-        gl.glBindTexture( gl.GL_TEXTURE_2D, self._ubuffer_id )
-        gl.glTexImage2D( gl.GL_TEXTURE_2D, 0, gl.GL_RGBA32F,
-                         shape[1]//4, shape[0], 0, gl.GL_RGBA, gl.GL_FLOAT, data )
-        #gl.glTexSubImage2D( gl.GL_TEXTURE_2D,0, 0, 0, shape[1]//4, shape[0],
-        #                    gl.GL_RGBA, gl.GL_FLOAT, data);
+        self._ustorage.upload( self._ubuffer )
         self._dirty = False
 
 
@@ -440,30 +608,56 @@ class Collection(object):
 
 
     # ---------------------------------
-    def draw(self):
-        if self._dirty:
-            self.upload()
-
-        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
-        gl.glEnable(gl.GL_BLEND)
-        _,_,width,height = gl.glGetIntegerv( gl.GL_VIEWPORT )
-        P = orthographic( 0, width, 0, height, -1, +1 )
-        V = np.eye(4).astype( np.float32 )
-        M = np.eye(4).astype( np.float32 )
-
-        shader = self.shader
-        shader.bind()
-        gl.glActiveTexture( gl.GL_TEXTURE0 )
-        shader.uniformi( 'u_uniforms', 0 )
-        gl.glBindTexture( gl.GL_TEXTURE_2D, self._ubuffer_id )
+    def _textures(self):
+        """ Textures used by the collection as (unit, target, id) """
+        textures = [ (0, self._ustorage.target, self._ustorage.id) ]
+        atlas = self.dash_atlas
+        if atlas:
+            textures.append( (1, gl.GL_TEXTURE_2D, atlas.texture_id) )
+        return textures
+
+
+    # ---------------------------------
+    def _activate(self, shader, state):
+        """ Set collection uniforms (shader and textures being bound) """
+        self._ustorage.setup( shader, 0 )
         if self.dash_atlas:
-            gl.glActiveTexture( gl.GL_TEXTURE1 )
-            shader.uniformi('u_dash_atlas', 1)
-            gl.glBindTexture( gl.GL_TEXTURE_2D, self.dash_atlas.texture_id )
-        shader.uniform_matrixf( 'u_M', M )
-        shader.uniform_matrixf( 'u_V', V )
-        shader.uniform_matrixf( 'u_P', P )
-        shape = self._ubuffer_shape
-        shader.uniformf( 'u_uniforms_shape', shape[1]//4, shape[0])
-        self._vbuffer.draw( )
-        shader.unbind()
+            shader.uniformi( 'u_dash_atlas', 1 )
+
+
+    # ---------------------------------
+    def _draw(self, shader):
+        if self._shape is None:
+            self._vbuffer.draw( program=shader.handle )
+        else:
+            self._shape.draw( instances=self._vbuffer,
+                              program=shader.handle )
+
+
+    # ---------------------------------
+    def get_viewport(self):
+        """
+        Viewport as (x, y, width, height) used for default projection, None
+        if queried at each draw (see Renderer).
+        """
+        return self._renderer.viewport
+
+    def set_viewport(self, viewport):
+        self._renderer.viewport = viewport
+    viewport = property(get_viewport, set_viewport)
+
+
+    # ---------------------------------
+    def draw(self, P=None, V=None, M=None):
+        """
+        Draw collection (see Renderer to draw several collections at once).
+
+        Parameters
+        ----------
+
+        P, V, M: 4x4 arrays
+            Projection, view and model matrices. Default projection is an
+            orthographic one covering the viewport (in pixels), default view
+            and model are identity.
+        """
+        self._renderer.draw( P, V, M )
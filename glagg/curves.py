@@ -58,10 +58,86 @@ curve_distance_epsilon        = 1e-30
 curve_collinearity_epsilon    = 1e-30
 curve_angle_tolerance_epsilon = 0.01
 curve_recursion_limit         = 32
+curve_batch_threshold         = 8
 m_cusp_limit                  = 0.0
 m_angle_tolerance             = 10*math.pi/180.0
 m_approximation_scale         = 1.0
-m_distance_tolerance_square   = (0.5 / m_approximation_scale)**2
+m_distance_tolerance_square   = 0.5**2
+
+
+# -----------------------------------------------------------------------------
+class Approximation(object):
+    """
+    Curve approximation parameters used when flattening curves and arcs.
+
+    The approximation scale is the number of pixels a path unit will span on
+    screen: a path drawn at scale 0.1 can be flattened ten times coarser than
+    the same path drawn at scale 1 for the same visual result. As advised by
+    AGG, the angle tolerance only matters for large scales and is therefore
+    ignored when scale is below 1. The distance tolerance is derived from
+    m_distance_tolerance_square (its square at scale 1) divided by the square
+    of the scale.
+
+    Parameters
+    ----------
+
+    scale : float
+        Approximation scale (defaults to m_approximation_scale)
+
+    angle_tolerance : float
+        Angle tolerance in radians (defaults to m_angle_tolerance)
+
+    cusp_limit : float
+        Cusp limit in radians, 0 to disable (defaults to m_cusp_limit)
+    """
+
+    # ---------------------------------
+    def __init__(self, scale=None, angle_tolerance=None, cusp_limit=None):
+        if scale is None:
+            scale = m_approximation_scale
+        if angle_tolerance is None:
+            angle_tolerance = m_angle_tolerance
+        if cusp_limit is None:
+            cusp_limit = m_cusp_limit
+        self.scale = scale
+        self._angle_tolerance = angle_tolerance
+        self.cusp_limit = cusp_limit
+
+
+    # ---------------------------------
+    def get_scale(self):
+        """ Get approximation scale """
+        return self._scale
+
+    def set_scale(self, scale):
+        """ Set approximation scale """
+        self._scale = float(scale)
+        self._distance_tolerance_square = (m_distance_tolerance_square /
+                                           self._scale**2)
+
+    scale = property(get_scale, set_scale)
+
+
+    # ---------------------------------
+    def get_distance_tolerance_square(self):
+        """ Get square of the distance tolerance (derived from scale) """
+        return self._distance_tolerance_square
+
+    distance_tolerance_square = property(get_distance_tolerance_square)
+
+
+    # ---------------------------------
+    def get_angle_tolerance(self):
+        """ Get angle tolerance (0 when scale is below 1) """
+        if self._scale < 1.0:
+            return 0.0
+        return self._angle_tolerance
+
+    def set_angle_tolerance(self, angle_tolerance):
+        """ Set angle tolerance """
+        self._angle_tolerance = angle_tolerance
+
+    angle_tolerance = property(get_angle_tolerance, set_angle_tolerance)
 
 
 # -----------------------------------------------------------------------------
@@ -72,7 +148,12 @@ def calc_sq_distance( x1,y1, x2,y2 ):
 
 
 # -----------------------------------------------------------------------------
-def curve3_recursive_bezier( points, x1, y1, x2, y2, x3, y3, level = 0 ):
+def curve3_recursive_bezier( points, x1, y1, x2, y2, x3, y3, level = 0,
+                             approximation = None ):
+    if approximation is None:
+        approximation = Approximation()
+    distance_tolerance_square = approximation.distance_tolerance_square
+    angle_tolerance = approximation.angle_tolerance
     if level > curve_recursion_limit:
         return
 
@@ -92,10 +173,10 @@ def curve3_recursive_bezier( points, x1, y1, x2, y2, x3, y3, level = 0 ):
     if d > curve_collinearity_epsilon:
         # Regular case
         # ------------
-        if d*d <= m_distance_tolerance_square * (dx*dx + dy*dy):
+        if d*d <= distance_tolerance_square * (dx*dx + dy*dy):
             # If the curvature doesn't exceed the distance_tolerance value
             # we tend to finish subdivisions.
-            if m_angle_tolerance < curve_angle_tolerance_epsilon:
+            if angle_tolerance < curve_angle_tolerance_epsilon:
                 points.append( (x123,y123) )
                 return
 
@@ -104,7 +185,7 @@ def curve3_recursive_bezier( points, x1, y1, x2, y2, x3, y3, level = 0 ):
             if da >= math.pi:
                 da = 2*math.pi - da
 
-            if da < m_angle_tolerance:
+            if da < angle_tolerance:
                 # Finally we can stop the recursion
                 points.append( (x123,y123) )
                 return
@@ -126,18 +207,26 @@ def curve3_recursive_bezier( points, x1, y1, x2, y2, x3, y3, level = 0 ):
             else:
                d = calc_sq_distance(x2, y2, x1 + d*dx, y1 + d*dy)
 
-        if d < m_distance_tolerance_square:
+        if d < distance_tolerance_square:
             points.append( (x2,y2) )
             return
 
     # Continue subdivision
     # --------------------
-    curve3_recursive_bezier( points, x1, y1, x12, y12, x123, y123, level + 1 )
-    curve3_recursive_bezier( points, x123, y123, x23, y23, x3, y3, level + 1 )
+    curve3_recursive_bezier( points, x1, y1, x12, y12, x123, y123, level + 1,
+                             approximation )
+    curve3_recursive_bezier( points, x123, y123, x23, y23, x3, y3, level + 1,
+                             approximation )
 
 
 # -----------------------------------------------------------------------------
-def curve4_recursive_bezier( points, x1, y1, x2, y2, x3, y3, x4, y4, level=0):
+def curve4_recursive_bezier( points, x1, y1, x2, y2, x3, y3, x4, y4, level=0,
+                             approximation = None ):
+    if approximation is None:
+        approximation = Approximation()
+    distance_tolerance_square = approximation.distance_tolerance_square
+    angle_tolerance = approximation.angle_tolerance
+    cusp_limit = approximation.cusp_limit
     if level > curve_recursion_limit: 
         return
 
@@ -202,19 +291,19 @@ def curve4_recursive_bezier( points, x1, y1, x2, y2, x3, y3, x4, y4, level=0):
                 d3 = calc_sq_distance(x3, y3, x1 + d3*dx, y1 + d3*dy)
 
         if d2 > d3:
-            if d2 < m_distance_tolerance_square:
+            if d2 < distance_tolerance_square:
                 points.append( (x2, y2) )
                 return
         else:
-            if d3 < m_distance_tolerance_square:
+            if d3 < distance_tolerance_square:
                 points.append( (x3, y3) )
                 return
 
     elif s == 1:
         # p1,p2,p4 are collinear, p3 is significant
         # -----------------------------------------
-        if d3 * d3 <= m_distance_tolerance_square * (dx*dx + dy*dy):
-            if m_angle_tolerance < curve_angle_tolerance_epsilon:
+        if d3 * d3 <= distance_tolerance_square * (dx*dx + dy*dy):
+            if angle_tolerance < curve_angle_tolerance_epsilon:
                 points.append((x23, y23) )
                 return
             
@@ -224,20 +313,20 @@ def curve4_recursive_bezier( points, x1, y1, x2, y2, x3, y3, x4, y4, level=0):
             if da1 >= math.pi:
                 da1 = 2*math.pi - da1
             
-            if da1 < m_angle_tolerance:
+            if da1 < angle_tolerance:
                 points.extend( [(x2, y2),(x3, y3)] )
                 return
 
-            if m_cusp_limit != 0.0:
-                if da1 > m_cusp_limit:
+            if cusp_limit != 0.0:
+                if da1 > cusp_limit:
                     points.append( (x3, y3) )
                     return
 
     elif s == 2:
         # p1,p3,p4 are collinear, p2 is significant
         # -----------------------------------------
-        if d2 * d2 <= m_distance_tolerance_square * (dx*dx + dy*dy):
-            if m_angle_tolerance < curve_angle_tolerance_epsilon:
+        if d2 * d2 <= distance_tolerance_square * (dx*dx + dy*dy):
+            if angle_tolerance < curve_angle_tolerance_epsilon:
                 points.append( (x23, y23) )
                 return
             
@@ -247,23 +336,23 @@ def curve4_recursive_bezier( points, x1, y1, x2, y2, x3, y3, x4, y4, level=0):
             if da1 >= math.pi:
                 da1 = 2*math.pi - da1
             
-            if da1 < m_angle_tolerance:
+            if da1 < angle_tolerance:
                 points.extend( [(x2, y2),(x3, y3)] )
                 return
             
-            if m_cusp_limit != 0.0:
-                if da1 > m_cusp_limit:
+            if cusp_limit != 0.0:
+                if da1 > cusp_limit:
                     points.append( (x2, y2) )
                     return
         
     elif s == 3:
         # Regular case
         # ------------
-        if (d2 + d3)*(d2 + d3) <= m_distance_tolerance_square * (dx*dx + dy*dy):
+        if (d2 + d3)*(d2 + d3) <= distance_tolerance_square * (dx*dx + dy*dy):
             # If the curvature doesn't exceed the distance_tolerance value
             # we tend to finish subdivisions.
 
-            if m_angle_tolerance < curve_angle_tolerance_epsilon:
+            if angle_tolerance < curve_angle_tolerance_epsilon:
                 points.append( (x23, y23) )
                 return
             
@@ -277,34 +366,339 @@ def curve4_recursive_bezier( points, x1, y1, x2, y2, x3, y3, x4, y4, level=0):
             if da2 >= math.pi:
                 da2 = 2*math.pi - da2
 
-            if da1 + da2 < m_angle_tolerance:
+            if da1 + da2 < angle_tolerance:
                 # Finally we can stop the recursion
                 # ---------------------------------
                 points.append( (x23, y23) )
                 return
             
-            if m_cusp_limit != 0.0:
-                if da1 > m_cusp_limit:
+            if cusp_limit != 0.0:
+                if da1 > cusp_limit:
                     points.append( (x2, y2) )
                     return
                 
-                if da2 > m_cusp_limit:
+                if da2 > cusp_limit:
                     points.append( (x3, y3) )
                     return
     
     # Continue subdivision
     # --------------------
-    curve4_recursive_bezier( points, x1, y1, x12, y12, x123, y123, x1234, y1234, level + 1 )
-    curve4_recursive_bezier( points, x1234, y1234, x234, y234, x34, y34, x4, y4, level + 1 )
+    curve4_recursive_bezier( points, x1, y1, x12, y12, x123, y123, x1234, y1234,
+                             level + 1, approximation )
+    curve4_recursive_bezier( points, x1234, y1234, x234, y234, x34, y34, x4, y4,
+                             level + 1, approximation )
+
+
+# -----------------------------------------------------------------------------
+def _angle(x1, y1, x2, y2, x3, y3):
+    """ Angle between (p1,p2) and (p2,p3) segments, wrapped to [0,pi] """
+    da = np.fabs(np.arctan2(y3 - y2, x3 - x2) - np.arctan2(y2 - y1, x2 - x1))
+    return np.where(da >= math.pi, 2*math.pi - da, da)
+
+
+# -----------------------------------------------------------------------------
+def _sq_distance_to_segment(x, y, x1, y1, x2, y2, d):
+    """
+    Squared distance from (x,y) to the point of parameter d along the
+    (x1,y1)-(x2,y2) segment, d being clamped to the segment ends.
+    """
+    return np.where(d <= 0, calc_sq_distance(x, y, x1, y1),
+           np.where(d >= 1, calc_sq_distance(x, y, x2, y2),
+                    calc_sq_distance(x, y, x1 + d*(x2-x1), y1 + d*(y2-y1))))
+
+
+# -----------------------------------------------------------------------------
+def curve3_flatten(curves, approximation):
+    """
+    One subdivision step of quadratic bezier curves, vectorized version of
+    curve3_recursive_bezier.
+
+    Parameters
+    ----------
+
+    curves : (N,3,2) array
+        Control points of the curves
+
+    approximation : Approximation
+        Approximation parameters
+
+    Returns
+    -------
+
+    emits, subdivide, left, right where emits is a list of (mask, points)
+    points to be emitted (in order) for curves where mask is True, subdivide
+    is the mask of curves to be subdivided and left and right are the two
+    halves of all curves.
+    """
+
+    distance_tolerance_square = approximation.distance_tolerance_square
+    angle_tolerance = approximation.angle_tolerance
+
+    (x1,y1), (x2,y2), (x3,y3) = curves[:,0].T, curves[:,1].T, curves[:,2].T
+    p12  = (curves[:,0] + curves[:,1]) / 2.
+    p23  = (curves[:,1] + curves[:,2]) / 2.
+    p123 = (p12 + p23) / 2.
+
+    dx = x3 - x1
+    dy = y3 - y1
+    d = np.fabs((x2-x3)*dy - (y2-y3)*dx)
+    regular = d > curve_collinearity_epsilon
+
+    # Regular case
+    flat = regular & (d*d <= distance_tolerance_square * (dx*dx + dy*dy))
+    if angle_tolerance >= curve_angle_tolerance_epsilon:
+        flat &= _angle(x1,y1,x2,y2,x3,y3) < angle_tolerance
+
+    # Collinear case
+    da = dx*dx + dy*dy
+    d = ((x2 - x1)*dx + (y2 - y1)*dy) / np.where(da == 0, 1, da)
+    simple = ~regular & (da != 0) & (d > 0) & (d < 1)
+    d = np.where(da == 0, calc_sq_distance(x1, y1, x2, y2),
+                 _sq_distance_to_segment(x2, y2, x1, y1, x3, y3, d))
+    point = ~regular & ~simple & (d < distance_tolerance_square)
+
+    subdivide = ~(flat | simple | point)
+    left  = np.dstack((curves[:,0], p12, p123)).transpose(0,2,1)
+    right = np.dstack((p123, p23, curves[:,2])).transpose(0,2,1)
+    return [(flat, p123), (point, curves[:,1])], subdivide, left, right
+
+
+# -----------------------------------------------------------------------------
+def curve4_flatten(curves, approximation):
+    """
+    One subdivision step of cubic bezier curves, vectorized version of
+    curve4_recursive_bezier.
+
+    Parameters
+    ----------
+
+    curves : (N,4,2) array
+        Control points of the curves
+
+    approximation : Approximation
+        Approximation parameters
+
+    Returns
+    -------
+
+    emits, subdivide, left, right where emits is a list of (mask, points)
+    points to be emitted (in order) for curves where mask is True, subdivide
+    is the mask of curves to be subdivided and left and right are the two
+    halves of all curves.
+    """
+
+    distance_tolerance_square = approximation.distance_tolerance_square
+    angle_tolerance = approximation.angle_tolerance
+    cusp_limit = approximation.cusp_limit
+
+    P1, P2, P3, P4 = curves[:,0], curves[:,1], curves[:,2], curves[:,3]
+    (x1,y1), (x2,y2), (x3,y3), (x4,y4) = P1.T, P2.T, P3.T, P4.T
+    P12   = (P1 + P2) / 2.
+    P23   = (P2 + P3) / 2.
+    P34   = (P3 + P4) / 2.
+    P123  = (P12 + P23) / 2.
+    P234  = (P23 + P34) / 2.
+    P1234 = (P123 + P234) / 2.
+
+    dx = x4 - x1
+    dy = y4 - y1
+    d2 = np.fabs(((x2 - x4) * dy - (y2 - y4) * dx))
+    d3 = np.fabs(((x3 - x4) * dy - (y3 - y4) * dx))
+    s = 2*(d2 > curve_collinearity_epsilon) + (d3 > curve_collinearity_epsilon)
+    k = dx*dx + dy*dy
+    N = len(curves)
+
+    # All collinear OR p1==p4
+    k_ = 1. / np.where(k == 0, 1, k)
+    e2 = k_ * ((x2 - x1)*dx + (y2 - y1)*dy)
+    e3 = k_ * ((x3 - x1)*dx + (y3 - y1)*dy)
+    simple = (s == 0) & (k != 0) & (e2 > 0) & (e2 < 1) & (e3 > 0) & (e3 < 1)
+    e2 = np.where(k == 0, calc_sq_distance(x1, y1, x2, y2),
+                  _sq_distance_to_segment(x2, y2, x1, y1, x4, y4, e2))
+    e3 = np.where(k == 0, calc_sq_distance(x4, y4, x3, y3),
+                  _sq_distance_to_segment(x3, y3, x1, y1, x4, y4, e3))
+    collinear = (s == 0) & ~simple
+    point2 = collinear & (e2 > e3) & (e2 < distance_tolerance_square)
+    point3 = collinear & (e2 <= e3) & (e3 < distance_tolerance_square)
+
+    # p1,p2,p4 are collinear, p3 is significant (s == 1)
+    # p1,p3,p4 are collinear, p2 is significant (s == 2)
+    # Regular case (s == 3)
+    d = np.choose(s, (0, d3, d2, d2+d3))
+    near = (s > 0) & (d*d <= distance_tolerance_square * k)
+    point23 = np.zeros(N, dtype=bool)
+    points  = np.zeros(N, dtype=bool)
+    if angle_tolerance < curve_angle_tolerance_epsilon:
+        point23 = near
+    else:
+        da1 = _angle(x1,y1,x2,y2,x3,y3)
+        da2 = _angle(x2,y2,x3,y3,x4,y4)
+        points  = near & (((s == 1) & (da2 < angle_tolerance)) |
+                          ((s == 2) & (da1 < angle_tolerance)))
+        point23 = near & (s == 3) & (da1 + da2 < angle_tolerance)
+        if cusp_limit != 0.0:
+            cusp = near & ~points & ~point23
+            point3 |= cusp & (s == 1) & (da2 > cusp_limit)
+            point2 |= cusp & (s == 2) & (da1 > cusp_limit)
+            point2 |= cusp & (s == 3) & (da1 > cusp_limit)
+            point3 |= cusp & (s == 3) & (da1 <= cusp_limit) & (da2 > cusp_limit)
+
+    subdivide = ~(simple | point2 | point3 | points | point23)
+    left  = np.dstack((P1, P12, P123, P1234)).transpose(0,2,1)
+    right = np.dstack((P1234, P234, P34, P4)).transpose(0,2,1)
+    emits = [ (point2 | points, P2), (point3, P3),
+              (point23, P23), (points, P3) ]
+    return emits, subdivide, left, right
+
+
+# -----------------------------------------------------------------------------
+def bezier_many(curves, flatten, approximation=None):
+    """
+    Flatten a batch of bezier curves using adaptive subdivision.
+
+    Instead of recursing depth-first on each curve, all curves (and their
+    pieces) are subdivided level by level using the given vectorized flatten
+    step. Each emitted point is tagged with its curve, the curve parameter at
+    which its piece starts and its rank within the piece such that sorting
+    restores the order of the recursive version.
+
+    Parameters
+    ----------
+
+    curves : (N,n,2) array
+        Control points of the curves
+
+    flatten : function
+        Vectorized subdivision step (curve3_flatten or curve4_flatten)
+
+    approximation : Approximation
+        Approximation parameters (default ones if None)
+
+    Returns
+    -------
+
+    points, offsets where points of curve i are points[offsets[i]:offsets[i+1]]
+    """
+
+    if approximation is None:
+        approximation = Approximation()
+    curves = np.asarray(curves, dtype=np.float64)
+    n = len(curves)
+    pieces, index, start = curves, np.arange(n), np.zeros(n)
+    P, I, T, J = [], [], [], []
+
+    for level in range(curve_recursion_limit+1):
+        if not len(pieces):
+            break
+        emits, subdivide, left, right = flatten(pieces, approximation)
+        for j, (mask, points) in enumerate(emits):
+            P.append(points[mask])
+            I.append(index[mask])
+            T.append(start[mask])
+            J.append(np.repeat(j, mask.sum()))
+        index, start = index[subdivide], start[subdivide]
+        pieces = np.concatenate((left[subdivide], right[subdivide]))
+        index = np.concatenate((index, index))
+        start = np.concatenate((start, start + 0.5**(level+1)))
+
+    P, I = np.concatenate(P), np.concatenate(I)
+    order = np.lexsort((np.concatenate(J), np.concatenate(T), I))
+    P, I = P[order], I[order]
+
+    # Add curve ends unless already there
+    count = np.bincount(I, minlength=n)
+    first = np.cumsum(count) - count
+    last = first + count - 1
+    empty = count == 0
+    p1, p2 = curves[:,0], curves[:,-1]
+    q1, q2 = P[np.where(empty, 0, first)], P[np.where(empty, 0, last)]
+    head = empty | (((q1 - p1)**2).sum(axis=1) > 1e-10)
+    tail = empty | (((q2 - p2)**2).sum(axis=1) > 1e-10)
+
+    size = count + head + tail
+    offsets = np.zeros(n+1, dtype=int)
+    offsets[1:] = np.cumsum(size)
+    points = np.empty((offsets[-1], 2))
+    points[offsets[:-1][head]] = p1[head]
+    points[offsets[1:][tail]-1] = p2[tail]
+    points[(offsets[:-1] + head - first)[I] + np.arange(len(I))] = P
+    return points, offsets
+
+
+# -----------------------------------------------------------------------------
+def _bezier_few(curves, bezier, approximation=None):
+    """
+    Flatten a few bezier curves one by one (the batched version has a fixed
+    cost per subdivision level that does not pay off for a few curves).
+    """
+    V = [bezier(*curve, approximation=approximation) for curve in curves]
+    offsets = np.zeros(len(V)+1, dtype=int)
+    offsets[1:] = np.cumsum([len(v) for v in V])
+    if not V:
+        return np.zeros((0,2)), offsets
+    return np.concatenate(V), offsets
+
+
+# -----------------------------------------------------------------------------
+def curve3_bezier_many(curves, approximation=None):
+    """
+    Flatten a batch of quadratic bezier curves.
+
+    Parameters
+    ----------
+
+    curves : (N,3,2) array
+        Control points of the curves
+
+    approximation : Approximation
+        Approximation parameters (default ones if None)
+
+    Returns
+    -------
+
+    points, offsets where points of curve i are points[offsets[i]:offsets[i+1]]
+    """
+    curves = np.asarray(curves).reshape(-1,3,2)
+    if len(curves) < curve_batch_threshold:
+        return _bezier_few(curves, curve3_bezier, approximation)
+    return bezier_many(curves, curve3_flatten, approximation)
+
+
+# -----------------------------------------------------------------------------
+def curve4_bezier_many(curves, approximation=None):
+    """
+    Flatten a batch of cubic bezier curves.
+
+    Parameters
+    ----------
+
+    curves : (N,4,2) array
+        Control points of the curves
+
+    approximation : Approximation
+        Approximation parameters (default ones if None)
+
+    Returns
+    -------
+
+    points, offsets where points of curve i are points[offsets[i]:offsets[i+1]]
+    """
+    curves = np.asarray(curves).reshape(-1,4,2)
+    if len(curves) < curve_batch_threshold:
+        return _bezier_few(curves, curve4_bezier, approximation)
+    return bezier_many(curves, curve4_flatten, approximation)
 
 
 # -----------------------------------------------------------------------------
-def curve3_bezier( p1, p2, p3 ):
+def curve3_bezier( p1, p2, p3, approximation=None ):
     x1,y1 = p1
     x2,y2 = p2
     x3,y3 = p3
     points = []
-    curve3_recursive_bezier( points, x1,y1, x2,y2, x3,y3 )
+    curve3_recursive_bezier( points, x1,y1, x2,y2, x3,y3,
+                             approximation = approximation )
+    if not points:
+        return np.array( [(x1,y1), (x3,y3)], dtype=float )
 
     dx,dy = points[0][0]-x1, points[0][1]-y1
     if (dx*dx+dy*dy) > 1e-10: points.insert(0, (x1,y1) )
@@ -316,13 +710,16 @@ def curve3_bezier( p1, p2, p3 ):
 
 
 # -----------------------------------------------------------------------------
-def curve4_bezier( p1, p2, p3, p4 ):
+def curve4_bezier( p1, p2, p3, p4, approximation=None ):
     x1,y1 = p1
     x2,y2 = p2
     x3,y3 = p3
     x4,y4 = p4
     points = []
-    curve4_recursive_bezier( points, x1,y1, x2,y2, x3,y3, x4,y4 )
+    curve4_recursive_bezier( points, x1,y1, x2,y2, x3,y3, x4,y4,
+                             approximation = approximation )
+    if not points:
+        return np.array( [(x1,y1), (x4,y4)], dtype=float )
 
     dx,dy = points[0][0]-x1, points[0][1]-y1
     if (dx*dx+dy*dy) > 1e-10: points.insert(0, (x1,y1) )
@@ -46,6 +46,41 @@ Example:
 >>> del buffer[0]
 >>> print buffer[0]
 [ 1 2 3 ]
+
+Lazy buffers:
+-------------
+
+By default, deleting an item shifts all the data that follows it. A lazy buffer
+instead leaves the item data in place and records it as free, keyed by size, so
+that a later append of the same size can reuse it. Items keep their data
+location until the buffer is explicitly compacted, which packs all items back
+to back (in item order) in a single vectorized pass. Free data is zeroed such
+that freed indices describe degenerate triangles until compaction.
+
+>>> buffer = DynamicBuffer(int, lazy=True)
+>>> buffer.append ( (0,0) )
+>>> buffer.append ( (1,2,3) )
+>>> del buffer[0]
+>>> print buffer.fragmentation
+0.4
+>>> remap = buffer.compact()
+>>> print remap
+[-1 -1  0  1  2]
+
+Dirty ranges:
+-------------
+
+Each modification made through the buffer records the modified data range
+such that only those ranges need to be uploaded to the GPU. Ranges are kept
+sorted and coalesced.
+
+>>> buffer = DynamicBuffer(int)
+>>> buffer.append ( (0,0) )
+>>> buffer.append ( (1,2,3) )
+>>> buffer.clean()
+>>> buffer[1] = 4
+>>> print buffer.dirty_ranges
+[(2, 5)]
 """
 import numpy as np
 
@@ -59,7 +94,24 @@ class DynamicBuffer(object):
     """
 
     # ---------------------------------
-    def __init__(self, dtype=np.float32):
+    def __init__(self, dtype=np.float32, lazy=False, threshold=0.5):
+        """
+        Create a new dynamic buffer.
+
+        Parameters
+        ----------
+
+        dtype: numpy dtype
+            Type of the underlying data
+
+        lazy: bool
+            Whether deleted data is only marked as free instead of being
+            removed immediately.
+
+        threshold: float
+            Fragmentation ratio (free data over used data) above which owners
+            of a lazy buffer are expected to compact it.
+        """
         self._data_dtype = dtype
         self._data_size = 0
         self._data_capacity = 64
@@ -69,7 +121,14 @@ class DynamicBuffer(object):
         self._item_capacity = 512
         self._item = np.zeros( (self._item_capacity, 2), dtype=int )
 
+        self._lazy = lazy
+        self._free = {}
+        self._free_size = 0
+        self._packed = True
+        self.threshold = threshold
+
         self._dirty = False
+        self._dirty_ranges = []
 
         
     # ---------------------------------
@@ -100,13 +159,106 @@ class DynamicBuffer(object):
     capacity = property(get_capacity)
 
 
+    # ---------------------------------
+    def get_items(self):
+        """ Get data location (start, stop) of each item """
+        return self._item[:self._item_size]
+    items = property(get_items)
+
+
+    # ---------------------------------
+    def get_storage(self):
+        """ Get the whole underlying array (up to capacity) """
+        return self._data
+    storage = property(get_storage)
+
+
+    # ---------------------------------
+    def get_lazy(self):
+        """ Whether deletion is deferred until compaction """
+        return self._lazy
+    lazy = property(get_lazy)
+
+
+    # ---------------------------------
+    def get_packed(self):
+        """ Whether items are stored back to back, in item order """
+        return self._packed
+    packed = property(get_packed)
+
+
+    # ---------------------------------
+    def get_fragmentation(self):
+        """ Get ratio of free data over underlying data """
+        if not self._data_size:
+            return 0.0
+        return self._free_size / float(self._data_size)
+    fragmentation = property(get_fragmentation)
+
+
+    # ---------------------------------
+    def get_dirty_ranges(self):
+        """ Get sorted list of data ranges modified since last clean """
+        size = self._data_size
+        return [(start, min(stop, size))
+                for start, stop in self._dirty_ranges if start < size]
+    dirty_ranges = property(get_dirty_ranges)
+
+
+    # ---------------------------------
+    def set_dirty(self, key=None):
+        """ Mark data of given item(s) (or all data if key is None) as dirty """
+        if key is None:
+            self._set_dirty_range(0, self._data_size)
+            return
+        istart, istop, dstart, dstop = self._get_indices(key)
+        if self._packed or istop-istart == 1:
+            self._set_dirty_range(dstart, dstop)
+        else:
+            for dstart, dstop in self._item[istart:istop]:
+                self._set_dirty_range(dstart, dstop)
+
+
+    # ---------------------------------
+    def clean(self):
+        """ Mark all data as clean (e.g. after upload) """
+        self._dirty = False
+        self._dirty_ranges = []
+
+
+    # ---------------------------------
+    def _set_dirty_range(self, start, stop, limit=32):
+        """
+        Mark data range [start,stop[ as dirty, merging it with overlapping or
+        adjacent ranges. Past limit ranges, they are collapsed into one.
+        """
+        self._dirty = True
+        if stop <= start:
+            return
+        ranges = []
+        for range_start, range_stop in self._dirty_ranges:
+            if range_stop < start or range_start > stop:
+                ranges.append( (range_start, range_stop) )
+            else:
+                start, stop = min(start, range_start), max(stop, range_stop)
+        ranges.append( (start, stop) )
+        ranges.sort()
+        if len(ranges) > limit:
+            ranges = [ (ranges[0][0], max(r[1] for r in ranges)) ]
+        self._dirty_ranges = ranges
+
+
     # ---------------------------------
     def clear(self):
         """ Clear buffer """
 
         self._data_size = 0
         self._item_size = 0
+        self._free = {}
+        self._free_size = 0
+        self._packed = True
         self._dirty = True
+        self._dirty_ranges = []
 
 
     # ---------------------------------
@@ -145,20 +297,40 @@ class DynamicBuffer(object):
         return start, stop, items[0][0], items[-1][1]
 
 
+    # ---------------------------------
+    def _get_locations(self, istart, istop, dstart, dstop):
+        """
+        Get data locations of items [istart,istop[ as a slice when they are
+        contiguous or as an array of indices otherwise.
+        """
+
+        if self._packed or istop-istart == 1:
+            return slice(dstart, dstop)
+        return self._gather(self._item[istart:istop])
+
+
+    # ---------------------------------
+    def _gather(self, items):
+        """ Get data indices covered by items, in item order """
+
+        sizes = items[:,1] - items[:,0]
+        offsets = np.repeat(items[:,0] - np.cumsum(sizes) + sizes, sizes)
+        return offsets + np.arange(sizes.sum())
+
+
     # ---------------------------------
     def __getitem__(self, key):
         """ x.__getitem__(y) <==> x[y] """
-        istart, istop, dstart, dstop = self._get_indices(key)
-        return self._data[dstart:dstop]
+        locations = self._get_locations(*self._get_indices(key))
+        return self._data[locations]
 
 
     # ---------------------------------
     def __setitem__(self, key, data):
         """ x.__setitem__(i, y) <==> x[i]=y """
-        istart, istop, dstart, dstop = self._get_indices(key)
-        self._data[dstart:dstop] = data
+        self._data[self._get_locations(*self._get_indices(key))] = data
         # Mark buffer as dirty
-        self._dirty = True
+        self.set_dirty(key)
 
 
     # ---------------------------------
@@ -166,20 +338,33 @@ class DynamicBuffer(object):
         """ x.__delitem__(y) <==> del x[y] """
         istart, istop, dstart, dstop = self._get_indices(key)
 
+        # Lazy buffer: record data as free, zero it and leave it in place
+        if self._lazy:
+            for dstart, dstop in self._item[istart:istop]:
+                if dstop > dstart:
+                    self._free.setdefault(dstop-dstart, []).append(dstart)
+                    self._free_size += dstop-dstart
+                    self._data[dstart:dstop] = np.zeros(1, self._data.dtype)
+                    self._set_dirty_range(dstart, dstop)
+            size = self._item_size - istop
+            self._item[istart:istart+size] = self._item[istop:istop+size]
+            self._item_size -= istop-istart
+            self._packed = False
+            return
+
         # Remove data
         size = self._data_size - dstop
         self._data[dstart:dstart+size] = self._data[dstop:dstop+size]
         self._data_size -= dstop-dstart
 
         # Remove corresponding item and update others
-        size = self._item_size - istop
-        self._item[istart:istart+size] = self._item[istop:istop+size]
-        size = dstop-dstart
-        self._item[istart:istop+size] -= size, size
+        count = self._item_size - istop
+        self._item[istart:istart+count] = self._item[istop:istop+count]
+        self._item[istart:istart+count] -= dstop-dstart
         self._item_size -= istop-istart
 
         # Mark buffer as dirty
-        self._dirty = True
+        self._set_dirty_range(dstart, self._data_size)
 
 
     # ---------------------------------
@@ -190,6 +375,137 @@ class DynamicBuffer(object):
         return self._item[key]
 
 
+    # ---------------------------------
+    def compact(self):
+        """
+        Pack items back to back, in item order, reclaiming free data.
+
+        Returns
+        -------
+
+        New location of each former data element (-1 for free ones) or None
+        if buffer was already packed.
+        """
+
+        if self._packed:
+            return None
+
+        items = self._item[:self._item_size]
+        index = self._gather(items)
+        remap = -np.ones(self._data_size, dtype=int)
+        remap[index] = np.arange(len(index))
+
+        # Move data (fancy indexing makes a copy, overlap is not an issue)
+        self._data[:len(index)] = self._data[index]
+        self._data_size = len(index)
+
+        # Update items
+        sizes = items[:,1] - items[:,0]
+        items[:,1] = np.cumsum(sizes)
+        items[:,0] = items[:,1] - sizes
+
+        self._free = {}
+        self._free_size = 0
+        self._packed = True
+        self._set_dirty_range(0, self._data_size)
+        return remap
+
+
+    # ---------------------------------
+    def _allocate(self, size):
+        """
+        Get start location of size new data elements, reusing free data of
+        the same size if any (lazy buffer) or growing data otherwise.
+        """
+
+        # Reuse free data of the same size if any
+        if self._lazy and self._free.get(size):
+            dstart = self._free[size].pop()
+            if not self._free[size]:
+                del self._free[size]
+            self._free_size -= size
+            return dstart
+
+        # Check if data array is big enough and resize it if necessary
+        if self._data_size + size  >= self._data_capacity:
+            capacity = int(2**np.ceil(np.log2(self._data_size + size)))
+            self._data = np.resize(self._data, capacity)
+            self._data_capacity = capacity
+
+        dstart = self._data_size
+        self._data_size += size
+        return dstart
+
+
+    # ---------------------------------
+    def reserve(self, size=1):
+        """
+        Get start location of size zeroed data elements that belong to no
+        item. They are never reused by appends and are reclaimed by
+        compaction.
+        """
+
+        dstart = self._allocate(size)
+        self._data[dstart:dstart+size] = np.zeros(1, self._data.dtype)
+        self._packed = False
+        self._set_dirty_range(dstart, dstart+size)
+        return dstart
+
+
+    # ---------------------------------
+    def replace(self, key, data):
+        """
+        Replace data of a single item with data of any size.
+
+        When size differs, data that follows the item is shifted (regular
+        buffer) or the item is moved to a free or new location (lazy buffer).
+        """
+
+        data = np.array(data,dtype=self._data_dtype).ravel()
+        istart, istop, dstart, dstop = self._get_indices(key)
+        if istop-istart != 1:
+            raise IndexError("Only single items can be replaced")
+        size, old_size = data.size, dstop-dstart
+
+        # Same size: replace data in place
+        if size == old_size:
+            self._data[dstart:dstop] = data
+            self._set_dirty_range(dstart, dstop)
+            return
+
+        # Lazy buffer: free current data and move the item
+        if self._lazy:
+            if old_size:
+                self._free.setdefault(old_size, []).append(dstart)
+                self._free_size += old_size
+                self._data[dstart:dstop] = np.zeros(1, self._data.dtype)
+                self._set_dirty_range(dstart, dstop)
+            dstart = self._allocate(size)
+            dend = dstart + size
+            self._data[dstart:dend] = data
+            self._item[istart] = dstart, dend
+            self._packed = False
+            self._set_dirty_range(dstart, dend)
+            return
+
+        # Shift data that follows
+        delta = size - old_size
+        tail = self._data[dstop:self._data_size].copy()
+        if self._data_size + delta  >= self._data_capacity:
+            capacity = int(2**np.ceil(np.log2(self._data_size + delta)))
+            self._data = np.resize(self._data, capacity)
+            self._data_capacity = capacity
+        dend = dstart + size
+        self._data[dstart:dend] = data
+        self._data[dend:dend+len(tail)] = tail
+        self._data_size += delta
+
+        # Update item and following ones
+        self._item[istart,1] = dend
+        self._item[istop:self._item_size] += delta
+        self._set_dirty_range(dstart, max(self._data_size, dstop))
+
+
     # ---------------------------------
     def append(self, data ):
         """ L.append(object) -- append object to end """
@@ -201,6 +517,46 @@ class DynamicBuffer(object):
 
         size = data.size
 
+        # Store data
+        dstart = self._allocate(size)
+        dend   = dstart + size
+        self._data[dstart:dend] = data
+
+        # Check if item array is big enough and resize it if necessary
+        if self._item_size + 1  >= self._item_capacity:
+            capacity = int(2**np.ceil(np.log2(self._item_size + 1)))
+            self._item = np.resize(self._item, (capacity, 2))
+            self._item_capacity = capacity
+
+        # Store data location (= item)
+        istart = self._item_size
+        iend   = istart + 1
+        self._item[istart:iend] = dstart, dend
+        self._item_size += 1
+
+        # Mark buffer as dirty
+        self._set_dirty_range(dstart, dend)
+
+
+    # ---------------------------------
+    def append_many(self, data, sizes):
+        """
+        Append several objects at once.
+
+        Parameters
+        ----------
+
+        data: array-like
+            Concatenated data of all objects
+
+        sizes: array-like
+            Size of each object (in data elements)
+        """
+
+        data = np.array(data,dtype=self._data_dtype).ravel()
+        sizes = np.array(sizes,dtype=int).ravel()
+        size, count = data.size, sizes.size
+
         # Check if data array is big enough and resize it if necessary
         if self._data_size + size  >= self._data_capacity:
             capacity = int(2**np.ceil(np.log2(self._data_size + size)))
@@ -214,17 +570,17 @@ class DynamicBuffer(object):
         self._data_size += size
 
         # Check if item array is big enough and resize it if necessary
-        if self._item_size + 1  >= self._item_capacity:
-            capacity = int(2**np.ceil(np.log2(self._item_size + 1)))
+        if self._item_size + count  >= self._item_capacity:
+            capacity = int(2**np.ceil(np.log2(self._item_size + count)))
             self._item = np.resize(self._item, (capacity, 2))
             self._item_capacity = capacity
 
-        # Store data location (= item)
+        # Store data locations (= items)
         istart = self._item_size
-        iend   = istart + 1
-        self._item[istart:iend] = dstart, dend
-        self._item_size += 1
+        iend   = istart + count
+        self._item[istart:iend,1] = dstart + np.cumsum(sizes)
+        self._item[istart:iend,0] = self._item[istart:iend,1] - sizes
+        self._item_size += count
 
         # Mark buffer as dirty
-        self._dirty = True
-
+        self._set_dirty_range(dstart, dend)
@@ -39,9 +39,26 @@ from collection import Collection
 # -----------------------------------------------------------------------------
 class EllipseCollection(Collection):
     # ---------------------------------
-    def __init__(self, dash_atlas=None):
-        self.vtype = np.dtype([('a_center',   'f4', 2),
-                               ('a_texcoord', 'f4', 2)])
+    def __init__(self, dash_atlas=None, instanced=False):
+        """
+        Create a new ellipse collection.
+
+        Parameters
+        ----------
+
+        dash_atlas: DashAtlas
+            Dash atlas (a new one is created if None)
+
+        instanced: bool
+            Whether ellipses are drawn by instancing a single quad, each
+            ellipse being stored as a single vertex (center and uniform index).
+        """
+        self.instanced = instanced
+        if instanced:
+            self.vtype = np.dtype([('a_center',   'f4', 2)])
+        else:
+            self.vtype = np.dtype([('a_center',   'f4', 2),
+                                   ('a_texcoord', 'f4', 2)])
         self.utype = np.dtype([('color',     'f4', 4),
                                ('translate', 'f4', 2),
                                ('scale',     'f4', 1),
@@ -49,7 +66,12 @@ class EllipseCollection(Collection):
                                ('radius',    'f4', 2),
                                ('linewidth', 'f4', 1),
                                ('antialias', 'f4', 1) ])
-        Collection.__init__(self, self.vtype, self.utype)
+        if instanced:
+            Collection.__init__(self, self.vtype, self.utype,
+                                shape=self._quad())
+        else:
+            Collection.__init__(self, self.vtype, self.utype,
+                                quad=(0,1,2,1,2,3))
         if dash_atlas is None:
             self.dash_atlas = DashAtlas()
         else:
@@ -57,8 +79,8 @@ class EllipseCollection(Collection):
         shaders = os.path.join(os.path.dirname(__file__),'shaders')
         vertex_shader= os.path.join( shaders, 'ellipses.vert')
         fragment_shader= os.path.join( shaders, 'ellipses.frag')
-        self.shader = Shader( open(vertex_shader).read(),
-                              open(fragment_shader).read() )
+        self.shader = Shader.from_files( vertex_shader, fragment_shader,
+                                         self._ustorage.code )
 
 
     # ---------------------------------
@@ -76,11 +98,58 @@ class EllipseCollection(Collection):
         Collection.append(self, V, I, U)
 
 
+    # ---------------------------------
+    def append_many( self, centers, radius=100.0, color=(0, 0, 0, 1),
+                     linewidth=1.0, antialias=1.0, translate=(0, 0), scale=1.0, rotate=0.0 ):
+        """
+        Append several ellipses at once. Each parameter is either common to all
+        ellipses (same as for append) or given for each ellipse.
+        """
+        V, I, vsizes, isizes = self.bake_many(centers)
+        U = np.zeros(len(vsizes), self.utype)
+        U['linewidth'] = linewidth
+        U['antialias'] = antialias
+        U['color'] = color
+        U['translate'] = translate
+        U['scale'] = scale
+        U['rotate'] = rotate
+        U['radius'] = radius
+        Collection.append_many(self, V, I, U, vsizes, isizes)
+
+
+    # ---------------------------------
+    def _quad(self):
+        """ Quad shared by all instances """
+        V = np.zeros(4, dtype=[('a_texcoord', 'f4', 2)])
+        V['a_texcoord'] = (-1, -1), (-1, +1), (+1, -1), (+1, +1)
+        I = np.array([0, 1, 2, 1, 2, 3], dtype=np.uint32)
+        return V, I
+
+
     # ---------------------------------
     def bake(self, center ):
+        if self.instanced:
+            V = np.zeros(1, dtype=self.vtype)
+            V['a_center'] = center
+            return V, np.zeros(0, dtype=np.uint32), 0
         V = np.zeros(4, dtype=self.vtype)
         V['a_center'] = center
         V['a_texcoord'] = (-1, -1), (-1, +1), (+1, -1), (+1, +1)
         I = np.array([0, 1, 2, 1, 2, 3], dtype=np.int32)
         return V, I, 0
 
+
+    # ---------------------------------
+    def bake_many(self, centers ):
+        centers = np.array(centers, dtype=np.float32).reshape(-1, 2)
+        n = len(centers)
+        if self.instanced:
+            V = np.zeros(n, dtype=self.vtype)
+            V['a_center'] = centers
+            I = np.zeros(0, dtype=np.uint32)
+            return V, I, np.ones(n, dtype=int), np.zeros(n, dtype=int)
+        V = np.zeros((n, 4), dtype=self.vtype)
+        V['a_center'] = centers.reshape(n, 1, 2)
+        V['a_texcoord'] = (-1, -1), (-1, +1), (+1, -1), (+1, +1)
+        I = np.resize(np.array([0, 1, 2, 1, 2, 3], dtype=np.uint32), 6*n)
+        return V.ravel(), I, 4*np.ones(n, dtype=int), 6*np.ones(n, dtype=int)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (C) 2013 Nicolas P. Rougier. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY NICOLAS P. ROUGIER ''AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL NICOLAS P. ROUGIER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of Nicolas P. Rougier.
+# -----------------------------------------------------------------------------
+"""
+FreeType faces are costly to open (font file is parsed) and are not thread
+safe. A face cache opens each font file once and hands out its face with the
+requested character size, which is only changed when it differs from the
+current one. Faces must be used while holding the cache lock::
+
+    with faces.lock:
+        face = faces.get(filename, size)
+        face.load_char(charcode)
+"""
+import threading
+from freetype import Face, Matrix, Vector
+
+
+# -----------------------------------------------------------------------------
+class FaceCache(object):
+    """
+    FreeType faces shared by fonts, one per font file.
+    """
+
+    # ---------------------------------
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._faces = {}
+
+
+    # ---------------------------------
+    def get(self, filename, size, hres=1):
+        """
+        Get the face of a font file set to a given character size.
+
+        Parameters
+        ----------
+
+        filename: str
+            Font filename
+
+        size: float
+            Character size (in points, at 72 dpi)
+
+        hres: int
+            Horizontal oversampling. The face horizontal resolution is hres
+            times the vertical one and a transform scales glyphs back such
+            that they are rendered with 1/hres pixel horizontal precision.
+        """
+        with self.lock:
+            if filename not in self._faces:
+                self._faces[filename] = [Face(filename), None]
+            face, current = self._faces[filename]
+            if current != (size, hres):
+                face.set_char_size( int(size*64), 0, hres*72, 72 )
+                scale = int(0x10000L/hres)
+                face.set_transform( Matrix(scale, 0, 0, 0x10000L),
+                                    Vector(0,0) )
+                self._faces[filename][1] = size, hres
+            return face
+
+
+    # ---------------------------------
+    def clear(self):
+        """ Close all faces """
+        with self.lock:
+            self._faces = {}
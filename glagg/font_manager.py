@@ -29,6 +29,7 @@
 # policies, either expressed or implied, of Nicolas P. Rougier.
 # -----------------------------------------------------------------------------
 import os
+from glagg.face_cache import FaceCache
 from glagg.texture_font import TextureFont
 from glagg.texture_atlas import TextureAtlas
 
@@ -42,6 +43,9 @@ class FontManager(object):
     """
     """
 
+    # FreeType faces shared by all fonts (one per font file)
+    faces = FaceCache()
+
     def __init__(self, width=1024, height=1024, depth=3 ):
         self._width = 1024
         self._height = 1024
@@ -59,7 +63,7 @@ class FontManager(object):
         key = '%s-%d' % (os.path.basename(filename), size)
         if key in self._fonts.keys():
             return self._fonts[key]
-        font = TextureFont(filename, size, self._atlas)
+        font = TextureFont(filename, size, self._atlas, self.faces)
         self._fonts[key] = font
         return font
         
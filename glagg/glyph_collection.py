@@ -34,7 +34,6 @@ import numpy as np
 import OpenGL.GL as gl
 from glagg.shader import Shader
 from glagg.collection import Collection
-from glagg.transforms import orthographic
 from glagg.font_manager import FontManager
 
 
@@ -57,12 +56,12 @@ class GlyphCollection(Collection):
             self.font_manager = font_manager
         else:
             self.font_manager = FontManager(1024,1024,3)
-        Collection.__init__(self, self.vtype, self.utype)
+        Collection.__init__(self, self.vtype, self.utype, quad=(0,1,2,0,2,3))
         shaders = os.path.join(os.path.dirname(__file__),'shaders')
         vertex_shader= os.path.join( shaders, 'text.vert')
         fragment_shader= os.path.join( shaders, 'text.frag')
-        self.shader = Shader( open(vertex_shader).read(),
-                              open(fragment_shader).read() )
+        self.shader = Shader.from_files( vertex_shader, fragment_shader,
+                                         self._ustorage.code )
 
 
     # ---------------------------------
@@ -179,35 +178,18 @@ class GlyphCollection(Collection):
 
 
     # ---------------------------------
-    def draw(self, P=None, V=None, M=None):
-        atlas = self.font_manager.atlas
+    def _textures(self):
+        """ Textures used by the collection as (unit, target, id) """
+        return [ (0, self._ustorage.target, self._ustorage.id),
+                 (1, gl.GL_TEXTURE_2D, self.font_manager.atlas.texid) ]
+
 
-        if self._dirty:
-            self.upload()
-        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
-        gl.glEnable(gl.GL_BLEND)
-        _,_,width,height = gl.glGetIntegerv( gl.GL_VIEWPORT )
-        P = orthographic( 0, width, 0, height, -1, +1 )
-        V = np.eye(4).astype( np.float32 )
-        M = np.eye(4).astype( np.float32 )
-        shader = self.shader
-        shader.bind()
-
-        gl.glActiveTexture( gl.GL_TEXTURE0 )
-        shader.uniformi( 'u_uniforms', 0 )
-        gl.glBindTexture( gl.GL_TEXTURE_2D, self._ubuffer_id )
-        shape = self._ubuffer_shape
-        shader.uniformf( 'u_uniforms_shape', shape[1]//4, shape[0])
-
-        gl.glActiveTexture( gl.GL_TEXTURE1 )
+    # ---------------------------------
+    def _activate(self, shader, state):
+        """ Set collection uniforms (shader and textures being bound) """
+        atlas = self.font_manager.atlas
+        self._ustorage.setup( shader, 0 )
         shader.uniformi( 'u_font_atlas', 1 )
         shader.uniformf( 'u_font_atlas_shape',
                          atlas.width, atlas.height, atlas.depth)
-        gl.glBindTexture( gl.GL_TEXTURE_2D, self.font_manager.atlas.texid)
-
-        shader.uniform_matrixf( 'u_M', M )
-        shader.uniform_matrixf( 'u_V', V )
-        shader.uniform_matrixf( 'u_P', P )
-        gl.glDisable( gl.GL_DEPTH_TEST )
-        self._vbuffer.draw( )
-        shader.unbind()
+        state.disable( gl.GL_DEPTH_TEST )
@@ -34,8 +34,8 @@ import OpenGL.GL as gl
 from shader import Shader
 from dash_atlas import DashAtlas
 from collection import Collection
-from transforms import orthographic
 from dynamic_buffer import DynamicBuffer
+from uniform_storage import UniformTexture
 
 
 # -----------------------------------------------------------------------------
@@ -73,7 +73,9 @@ class GridCollection(Collection):
                                 ('minor_dash_caps',  'f4', 2)
                                 ] )
         self.gtype = np.dtype( [('name', 'f4', (1024,4))] )
-        Collection.__init__(self, self.vtype, self.utype)
+        # Grid buffer rows are indexed like uniforms, keep them in sync
+        Collection.__init__(self, self.vtype, self.utype, lazy=False,
+                            quad=(0,1,2,1,2,3))
         if dash_atlas is None:
             self.dash_atlas = DashAtlas()
         else:
@@ -81,11 +83,10 @@ class GridCollection(Collection):
         shaders = os.path.join(os.path.dirname(__file__),'shaders')
         vertex_shader= os.path.join( shaders, 'grid.vert')
         fragment_shader= os.path.join( shaders, 'grid.frag')
-        self.shader = Shader( open(vertex_shader).read(),
-                              open(fragment_shader).read() )
+        self.shader = Shader.from_files( vertex_shader, fragment_shader,
+                                         self._ustorage.code )
         self._gbuffer = DynamicBuffer( self.gtype )
-        self._gbuffer_shape = [0,4*1024]
-        self._gbuffer_id = 0
+        self._gstorage = UniformTexture( 1024 )
 
 
     # ---------------------------------
@@ -152,33 +153,36 @@ class GridCollection(Collection):
         G = np.empty((1024,4), dtype='f4')
         G = G.ravel().view(self.gtype)
         self._gbuffer.append(G)
-        index = len(self._gbuffer)
-        self._gbuffer_shape = [index,4*1024]
-        self.update_gbuffer(index-1)
+        self.update_gbuffer(len(self._gbuffer)-1)
 
     # ---------------------------------
     def set_major_grid(self, key, major_grid):
         self._ubuffer.data[key]['major_grid'][...] = major_grid
+        self._ubuffer.set_dirty(key)
         self.update_gbuffer(key)
 
     # ---------------------------------
     def set_minor_grid(self, key, minor_grid):
         self._ubuffer.data[key]['minor_grid'][...] = minor_grid
+        self._ubuffer.set_dirty(key)
         self.update_gbuffer(key)
 
     # ---------------------------------
     def set_zoom(self, key, zoom):
         self._ubuffer.data[key]['zoom'] = zoom
+        self._ubuffer.set_dirty(key)
         self.update_gbuffer(key)
 
     # ---------------------------------
     def set_offset(self, key, offset):
         self._ubuffer.data[key]['offset'][...] = offset
+        self._ubuffer.set_dirty(key)
         self.update_gbuffer(key)
 
     # ---------------------------------
     def set_size(self, key, size):
         self._ubuffer.data[key]['size'][...] = size
+        self._ubuffer.set_dirty(key)
         self.update_gbuffer(key)
 
     # ---------------------------------
@@ -248,66 +252,19 @@ class GridCollection(Collection):
         Collection.upload( self )
 
         gl.glActiveTexture( gl.GL_TEXTURE2 )
-        data = self._gbuffer.data.view(np.float32)
-        shape = len(self._gbuffer), 4*1024
-        if not self._gbuffer_id:
-            self._gbuffer_id = gl.glGenTextures(1)
-
-            gl.glBindTexture( gl.GL_TEXTURE_2D, self._gbuffer_id )
-            gl.glPixelStorei( gl.GL_UNPACK_ALIGNMENT, 1 )
-            gl.glPixelStorei( gl.GL_PACK_ALIGNMENT, 1 )
-            gl.glTexParameterf( gl.GL_TEXTURE_2D,
-                                gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST )
-            gl.glTexParameterf( gl.GL_TEXTURE_2D,
-                                gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST )
-            gl.glTexParameterf( gl.GL_TEXTURE_2D,
-                                gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE )
-            gl.glTexParameterf( gl.GL_TEXTURE_2D,
-                                gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE )
-            gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_BASE_LEVEL, 0)
-            gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAX_LEVEL, 0)
-            gl.glTexImage2D( gl.GL_TEXTURE_2D, 0, gl.GL_RGBA32F,
-                             shape[1]//4, shape[0], 0, gl.GL_RGBA, gl.GL_FLOAT, data )
-
-        gl.glActiveTexture( gl.GL_TEXTURE2 )
-        gl.glBindTexture( gl.GL_TEXTURE_2D, self._gbuffer_id )
-        gl.glTexImage2D( gl.GL_TEXTURE_2D, 0, gl.GL_RGBA32F,
-                         shape[1]//4, shape[0], 0, gl.GL_RGBA, gl.GL_FLOAT, data )
+        self._gstorage.upload( self._gbuffer )
         self._dirty = False
 
     # ---------------------------------
-    def draw(self):
-        if self._dirty:
-            self.upload()
+    def _textures(self):
+        """ Textures used by the collection as (unit, target, id) """
+        textures = Collection._textures( self )
+        textures.append( (2, self._gstorage.target, self._gstorage.id) )
+        return textures
 
-        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
-        gl.glEnable(gl.GL_BLEND)
-        _,_,width,height = gl.glGetIntegerv( gl.GL_VIEWPORT )
-        P = orthographic( 0, width, 0, height, -1, +1 )
-        V = np.eye(4).astype( np.float32 )
-        M = np.eye(4).astype( np.float32 )
 
-        shader = self.shader
-        shader.bind()
-        gl.glActiveTexture( gl.GL_TEXTURE0 )
-        shader.uniformi( 'u_uniforms', 0 )
-        shape = self._ubuffer_shape
-        shader.uniformf( 'u_uniforms_shape', shape[1]//4, shape[0])
-        gl.glBindTexture( gl.GL_TEXTURE_2D, self._ubuffer_id )
-
-        if self.dash_atlas:
-            gl.glActiveTexture( gl.GL_TEXTURE1 )
-            shader.uniformi('u_dash_atlas', 1)
-            gl.glBindTexture( gl.GL_TEXTURE_2D, self.dash_atlas.texture_id )
-
-        gl.glActiveTexture( gl.GL_TEXTURE2 )
-        gl.glBindTexture( gl.GL_TEXTURE_2D, self._gbuffer_id )
-        shader.uniformi( 'u_gbuffer', 2 )
-        shape = self._gbuffer_shape
-        shader.uniformf( 'u_gbuffer_shape', shape[1]//4, shape[0])
-
-        shader.uniform_matrixf( 'u_M', M )
-        shader.uniform_matrixf( 'u_V', V )
-        shader.uniform_matrixf( 'u_P', P )
-        self._vbuffer.draw( )
-        shader.unbind()
+    # ---------------------------------
+    def _activate(self, shader, state):
+        """ Set collection uniforms (shader and textures being bound) """
+        Collection._activate( self, shader, state )
+        self._gstorage.setup( shader, 2, 'u_gbuffer' )
@@ -40,10 +40,29 @@ from glagg.collection import Collection
 class LineCollection(Collection):
 
     # ---------------------------------
-    def __init__(self, dash_atlas = None):
-        self.vtype = np.dtype( [('a_p0',       'f4', 2),
-                                ('a_p1',       'f4', 2),
-                                ('a_texcoord', 'f4', 2) ])
+    def __init__(self, dash_atlas = None, instanced = False):
+        """
+        Create a new line collection.
+
+        Parameters
+        ----------
+
+        dash_atlas: DashAtlas
+            Dash atlas (a new one is created if None)
+
+        instanced: bool
+            Whether segments are drawn by instancing a single quad, each
+            segment being stored as a single vertex (end points and uniform
+            index).
+        """
+        self.instanced = instanced
+        if instanced:
+            self.vtype = np.dtype( [('a_p0',       'f4', 2),
+                                    ('a_p1',       'f4', 2) ])
+        else:
+            self.vtype = np.dtype( [('a_p0',       'f4', 2),
+                                    ('a_p1',       'f4', 2),
+                                    ('a_texcoord', 'f4', 2) ])
         self.utype = np.dtype( [('color',      'f4', 4),
                                 ('translate',  'f4', 2),
                                 ('scale',      'f4', 1),
@@ -55,7 +74,12 @@ class LineCollection(Collection):
                                 ('dash_period','f4', 1),
                                 ('dash_index', 'f4', 1),
                                 ('dash_caps',  'f4', 2)] )
-        Collection.__init__(self, self.vtype, self.utype)
+        if instanced:
+            Collection.__init__(self, self.vtype, self.utype,
+                                shape=self._quad())
+        else:
+            Collection.__init__(self, self.vtype, self.utype,
+                                quad=(0,1,2,1,2,3))
         shaders = os.path.join(os.path.dirname(__file__),'shaders')
         vertex_shader= os.path.join( shaders, 'line.vert')
         fragment_shader= os.path.join( shaders, 'line.frag')
@@ -63,8 +87,8 @@ class LineCollection(Collection):
             self.dash_atlas = DashAtlas()
         else:
             self.dash_atlas = dash_atlas
-        self.shader = Shader( open(vertex_shader).read(),
-                              open(fragment_shader).read() )
+        self.shader = Shader.from_files( vertex_shader, fragment_shader,
+                                         self._ustorage.code )
 
 
     # ---------------------------------
@@ -92,6 +116,42 @@ class LineCollection(Collection):
         Collection.append(self,V,I,U)
 
 
+    # ---------------------------------
+    def append_many( self, vertices, color = (0,0,0,1),
+                     linewidth = 1.0, antialias = 1.0,
+                     translate = (0,0), scale = 1.0, rotate = 0.0, linecaps = ('round','round'),
+                     dash_pattern='solid', dash_phase = 0.0, dash_caps = ('round','round') ):
+        """
+        Append several lists of segments at once. Each parameter is either
+        common to all items (same as for append) or given for each item.
+        """
+        V,I,vsizes,isizes = self.bake_many( vertices )
+        U = np.zeros(len(vsizes), self.utype)
+        U['linewidth']   = linewidth
+        U['antialias']   = antialias
+        U['color']       = color
+        U['translate']   = translate
+        U['scale']       = scale
+        U['rotate']      = rotate
+        U['linecaps']    = self._map(lambda key: self.caps.get(key, 1), linecaps)
+        if self.dash_atlas:
+            dash = self._map(lambda key: self.dash_atlas[key], dash_pattern)
+            U['dash_phase']  = dash_phase
+            U['dash_index']  = dash[...,0]
+            U['dash_period'] = dash[...,1]
+            U['dash_caps']   = self._map(lambda key: self.caps.get(key, 1), dash_caps)
+        Collection.append_many(self,V,I,U,vsizes,isizes)
+
+
+    # ---------------------------------
+    def _quad(self):
+        """ Segment quad shared by all instances """
+        V = np.zeros(4, dtype=[('a_texcoord', 'f4', 2)])
+        V['a_texcoord'] = (-1,+1), (-1,-1), (+1,+1), (+1,-1)
+        I = np.array([0,1,2,1,2,3], dtype=np.uint32)
+        return V, I
+
+
     # ---------------------------------
     def bake(self, vertices, closed=False):
         """
@@ -99,8 +159,34 @@ class LineCollection(Collection):
         segment must have its own vertices because of antialias (this means no
         vertex sharing between two adjacent line segments).
         """
-        n = len(vertices)
-        P = np.array(vertices).reshape(n,2).astype(float)
+        V,I,_,_ = self.bake_many( [vertices] )
+        return V, I
+
+
+    # ---------------------------------
+    def bake_many(self, vertices):
+        """
+        Bake several lists of 2D vertices at once (see bake). Each list is
+        made of pairs of vertices (p0,p1), each pair being a segment.
+
+        Returns concatenated vertices, concatenated indices (relative to the
+        first vertex of their item), number of vertices and number of indices
+        of each item.
+
+        Instanced collections get a single vertex per segment and no indices.
+        """
+        sizes = np.array([len(v) for v in vertices], dtype=int)
+        P = np.concatenate([np.array(v).reshape(len(v),2) for v in vertices])
+        P = P.astype(float)
+        n = len(P)
+        counts = sizes//2
+        if self.instanced:
+            V = np.zeros( n//2, dtype = self.vtype )
+            V['a_p0'] = P[0::2]
+            V['a_p1'] = P[1::2]
+            I = np.zeros(0, dtype=np.uint32)
+            return V, I, counts, np.zeros(len(counts), dtype=int)
+
         V = np.zeros( 2*n, dtype = self.vtype )
         V['a_p0'] = np.repeat(P[0::2],4,axis=0).reshape(2*n,2)
         V['a_p1'] = np.repeat(P[1::2],4,axis=0).reshape(2*n,2)
@@ -108,6 +194,9 @@ class LineCollection(Collection):
         V['a_texcoord'][1::4] = -1,-1
         V['a_texcoord'][2::4] = +1,+1
         V['a_texcoord'][3::4] = +1,-1
-        I = np.resize( np.array([0,1,2,1,2,3], dtype=np.uint32), (n-1)*(2*3))
-        I += np.repeat( 4*np.arange(n-1), 6)
-        return V, I
+
+        # Indices are relative to the first vertex of each item
+        index = np.arange(n//2) - np.repeat(np.cumsum(counts) - counts, counts)
+        I = np.resize( np.array([0,1,2,1,2,3], dtype=np.uint32), (n//2)*(2*3))
+        I += np.repeat( 4*index, 6).astype(np.uint32)
+        return V, I, 4*counts, 6*counts
@@ -30,152 +30,253 @@
 # -----------------------------------------------------------------------------
 import re
 import string
+import numpy as np
 import arc, curves
 
 class Path(object):
+    """
+    Path made of sub-paths, flattened as they are built.
+
+    Vertices of all sub-paths are stored contiguously in a single growing
+    array, sub-path i spanning points[offsets[i]:offsets[i+1]].
+    """
 
     # ---------------------------------
-    def __init__(self):
-        self.vertices = []
+    def __init__(self, approximation=None):
+        if approximation is None:
+            approximation = curves.Approximation()
+        self.approximation = approximation
+        self._points = np.zeros((64,2))
+        self._size = 0
+        self._starts = []
+        self.commands = []
         self.current = None
         self.last_control3 = None
         self.last_control4 = None
 
+    # ---------------------------------
+    def get_points(self):
+        """ Get vertices of all sub-paths """
+        return self._points[:self._size]
+    points = property(get_points)
+
+    # ---------------------------------
+    def get_offsets(self):
+        """ Get start of each sub-path (and end of the last one) """
+        return np.array(self._starts + [self._size], dtype=int)
+    offsets = property(get_offsets)
+
+    # ---------------------------------
+    def get_vertices(self):
+        """ Get vertices of each sub-path (as views of points) """
+        offsets = self._starts + [self._size]
+        return [self._points[offsets[i]:offsets[i+1]]
+                for i in range(len(self._starts))]
+    vertices = property(get_vertices)
+
+    # ---------------------------------
+    def _extend(self, P):
+        """ Append vertices to the current sub-path """
+        P = np.asarray(P, dtype=float).reshape(-1,2)
+        if not len(P):
+            return
+        if not self._starts:
+            self._starts.append(self._size)
+            self.commands.append([])
+        size = self._size + len(P)
+        if size > len(self._points):
+            capacity = int(2**np.ceil(np.log2(size)))
+            self._points = np.resize(self._points, (capacity,2))
+        self._points[self._size:size] = P
+        self._size = size
+        self.current = tuple(P[-1])
+
     # ---------------------------------
     def svg_parse(self, cmd, points):
+        """
+        Parse a SVG path command. Commands are recorded (per sub-path) such
+        that sub-paths can later be flattened again at another scale.
+        """
         relative = cmd in string.lowercase
-        cmd = string.capitalize(cmd)
-        if cmd == 'M':   self.moveto(points,relative)
-        elif cmd == 'Z': self.close()
-        elif cmd == 'L': self.lineto(points,relative)
-        elif cmd == 'H': self.horizontal_lineto(points,relative)
-        elif cmd == 'V': self.vertical_lineto(points,relative)
-        elif cmd == 'C': self.curveto(points,relative)
-        elif cmd == 'Q': self.quadratic_curveto(points,relative)
-        elif cmd == 'A': self.elliptical_arc(points, relative)
+        name = string.capitalize(cmd)
+        if name == 'M':   self.moveto(points,relative)
+        elif name == 'Z': self.close()
+        elif name == 'L': self.lineto(points,relative)
+        elif name == 'H': self.horizontal_lineto(points,relative)
+        elif name == 'V': self.vertical_lineto(points,relative)
+        elif name == 'C': self.curveto(points,relative)
+        elif name == 'S': self.smooth_curveto(points,relative)
+        elif name == 'Q': self.quadratic_curveto(points,relative)
+        elif name == 'T': self.smooth_quadratic_curveto(points,relative)
+        elif name == 'A': self.elliptical_arc(points, relative)
+        if not self.commands:
+            return
+        if name == 'M' and relative:
+            # Record sub-path start as absolute since it depends on the
+            # previous sub-path
+            start = self._points[self._starts[-1]]
+            self.commands[-1].append( ('M', tuple(start)) )
+            if len(points) > 2:
+                self.commands[-1].append( ('l', points[2:]) )
+        else:
+            self.commands[-1].append( (cmd, points) )
+
+    # ---------------------------------
+    def flatten(self, index, approximation):
+        """
+        Flatten again the sub-path of given index using recorded commands.
+
+        Parameters
+        ----------
+
+        index: int
+            Sub-path index
+
+        approximation: Approximation
+            Approximation parameters
+
+        Returns
+        -------
+
+        Sub-path vertices as a (n,2) array
+        """
+        path = Path(approximation)
+        for cmd, points in self.commands[index]:
+            path.svg_parse(cmd, points)
+        if not path._starts:
+            return np.zeros((0,2))
+        return path.vertices[0]
+
+    # ---------------------------------
+    def _absolute(self, P, relative, end=-1):
+        """
+        Convert points of a command (reshaped as one row per segment, end
+        being the index of the segment end point) to absolute coordinates.
+        Each relative segment is relative to the end of the previous one.
+        """
+        if relative:
+            E = P[:,end]
+            origin = np.cumsum(E, axis=0) - E + self.current
+            P += origin.reshape(len(P),-1,2)
+        return P
 
     # ---------------------------------
     def moveto(self, points, relative = False):
-        ox,oy = 0,0
-        if len(self.vertices) and len(self.vertices[-1]) <= 1:
-            del self.vertices[-1]
-        self.vertices.append([])
-        vertices = self.vertices[-1]
+        if self._starts and self._size - self._starts[-1] <= 1:
+            self._size = self._starts.pop()
+            del self.commands[-1]
+        self._starts.append(self._size)
+        self.commands.append([])
         x,y = points[:2]
-        vertices.append( (x+ox,y+oy) )
-        self.current = x+ox,y+oy
+        if relative and self.current is not None:
+            x,y = x+self.current[0], y+self.current[1]
+        self._extend( (x,y) )
         if len(points[2:]):
             self.lineto(points[2:], relative)
-        self.current = vertices[-1]
         self.last_control3 = None
         self.last_control4 = None
 
     # ---------------------------------
     def lineto(self, points, relative = False):
-        if relative:
-            ox,oy = self.current
-        else:
-            ox,oy = 0,0
-        vertices = self.vertices[-1]
-        for i in range(0,len(points),2):
-            x,y = points[i],points[i+1]
-            vertices.append( (x+ox,y+oy) )
-        self.current = vertices[-1]
+        P = np.array(points, dtype=float).reshape(-1,1,2)
+        self._extend( self._absolute(P, relative) )
         self.last_control3 = None
         self.last_control4 = None
 
     # ---------------------------------
     def horizontal_lineto(self, points, relative=False):
+        X = np.array(points, dtype=float).ravel()
         if relative:
-            ox,oy = self.current
-        else:
-            ox,oy = 0,self.current[1]
-        vertices = self.vertices[-1]
-        x = points[-1]
-        vertices.append( (x+ox,oy) )
-        self.current = vertices[-1]
-        self.last_control3 = None
-        self.last_control4 = None
+            X = np.cumsum(X) + self.current[0]
+        self.lineto( np.dstack((X, np.repeat(self.current[1], len(X)))) )
 
     # ---------------------------------
     def vertical_lineto(self, points, relative=False):
+        Y = np.array(points, dtype=float).ravel()
         if relative:
-            ox,oy = self.current
-        else:
-            ox,oy = self.current[0],0
-        vertices = self.vertices[-1]
-        y = points[-1]
-        vertices.append( (ox,y+oy) )
-        self.current = vertices[-1]
+            Y = np.cumsum(Y) + self.current[1]
+        self.lineto( np.dstack((np.repeat(self.current[0], len(Y)), Y)) )
+
+    # ---------------------------------
+    def close(self):
+        self._extend( self._points[self._starts[-1]].copy() )
         self.last_control3 = None
         self.last_control4 = None
 
     # ---------------------------------
-    def close(self):
-        vertices = self.vertices[-1]
-        vertices.append( vertices[0] )
+    def _cubic(self, C):
+        """ Flatten cubic segments (one row of 4 points per segment) """
+        V, offsets = curves.curve4_bezier_many(C, self.approximation)
+        self._extend( np.delete(V, offsets[:-1], axis=0) )
         self.last_control3 = None
+        self.last_control4 = tuple(C[-1,2])
+
+    # ---------------------------------
+    def _quadratic(self, C):
+        """ Flatten quadratic segments (one row of 3 points per segment) """
+        V, offsets = curves.curve3_bezier_many(C, self.approximation)
+        self._extend( np.delete(V, offsets[:-1], axis=0) )
+        self.last_control3 = tuple(C[-1,1])
         self.last_control4 = None
 
     # ---------------------------------
     def curveto(self, points, relative=False):
-        if relative:
-            ox,oy = self.current
-        else:
-            ox,oy = 0,0
-        vertices = self.vertices[-1]
-
-        x0, y0 = self.current
-        for i in range(0,len(points),6):
-            x1,y1 = points[i+0], points[i+1]
-            x2,y2 = points[i+2], points[i+3]
-            self.last_control4 = x2,y2
-            x3,y3 = points[i+4], points[i+5]
-            V = curves.curve4_bezier((x0+ox,y0+oy),
-                                     (x1+ox,y1+oy),
-                                     (x2+ox,y2+oy),
-                                     (x3+ox,y3+oy))
-            vertices.extend(V[1:].tolist())
-            x0,y0 = vertices[-1]
-        self.current = vertices[-1]
+        # All segments are flattened at once, each one starting at the end of
+        # the previous one.
+        P = np.array(points, dtype=float).reshape(-1,3,2)
+        P = self._absolute(P, relative)
+        C = np.empty((len(P),4,2))
+        C[:,1:] = P
+        C[0,0] = self.current
+        C[1:,0] = P[:-1,2]
+        self._cubic(C)
 
     # ---------------------------------
     def quadratic_curveto(self, points, relative=False):
-        if relative:
-            ox,oy = self.current
-        else:
-            ox,oy = 0,0
-        vertices = self.vertices[-1]
-
-        x0, y0 = self.current
-        for i in range(0,range(points),4):
-            x1,y1 = points[i+0], points[i+1]
-            self.last_control3 = x1,y1
-            x2,y2 = points[i+2], points[i+3]
-            V = curves.curve3_bezier((x0+dx,y0+dy),
-                                     (x1+dx,y1+dy),
-                                     (x2+dx,y2+dy))
-            vertices.extend(V[1:].tolist())
-            x0,y0 = vertices[-1]
-        self.current = vertices[-1]
-
+        P = np.array(points, dtype=float).reshape(-1,2,2)
+        P = self._absolute(P, relative)
+        C = np.empty((len(P),3,2))
+        C[:,1:] = P
+        C[0,0] = self.current
+        C[1:,0] = P[:-1,1]
+        self._quadratic(C)
 
     # ---------------------------------
     def smooth_curveto(self, points, relative=False):
-        raise NotImplemented
+        P = np.array(points, dtype=float).reshape(-1,2,2)
+        P = self._absolute(P, relative)
+        C = np.empty((len(P),4,2))
+        C[:,2:] = P
+        C[0,0] = self.current
+        C[1:,0] = P[:-1,1]
+
+        # First control point is the reflection of the second control point
+        # of the previous segment (or the current point if there is none)
+        R = np.empty((len(P),2))
+        R[0] = self.last_control4 or self.current
+        R[1:] = P[:-1,0]
+        C[:,1] = 2*C[:,0] - R
+        self._cubic(C)
 
     # ---------------------------------
     def smooth_quadratic_curveto(self, points, relative=False):
-        raise NotImplemented
+        P = np.array(points, dtype=float).reshape(-1,1,2)
+        P = self._absolute(P, relative)
+        C = np.empty((len(P),3,2))
+        C[:,2] = P[:,0]
+        C[0,0] = self.current
+        C[1:,0] = P[:-1,0]
+
+        # Control point is the reflection of the previous control point (or
+        # the current point if there is none)
+        control = self.last_control3 or self.current
+        for i in range(len(C)):
+            control = 2*C[i,0] - control
+            C[i,1] = control
+        self._quadratic(C)
 
     # ---------------------------------
     def elliptical_arc(self, points, relative=False):
-        if relative:
-            ox,oy = self.current
-        else:
-            ox,oy = 0,0
-        vertices = self.vertices[-1]
-
         x0, y0 = self.current
         for i in range(0,len(points),7):
             rx    = points[i+0]
@@ -185,9 +286,11 @@ class Path(object):
             sweep = points[i+4]
             x2    = points[i+5]
             y2    = points[i+6]
-            V = arc.elliptical_arc(x0, y0, rx, ry, angle, large, sweep, x2+ox, y2+oy)
-            vertices.extend(V[1:].tolist())
-            x0,y0 = vertices[-1]
-        self.current = vertices[-1]
+            if relative:
+                x2, y2 = x2+x0, y2+y0
+            V = arc.elliptical_arc(x0, y0, rx, ry, angle, large, sweep, x2, y2,
+                                   self.approximation)
+            self._extend( V[1:] )
+            x0,y0 = self.current
         self.last_control3 = None
         self.last_control4 = None
@@ -29,24 +29,63 @@
 # policies, either expressed or implied, of Nicolas P. Rougier.
 # -----------------------------------------------------------------------------
 import os
+import hashlib
 import numpy as np
+from collections import OrderedDict
 import OpenGL.GL as gl
 from glagg.shader import Shader
 from glagg.dash_atlas import DashAtlas
 from glagg.collection import Collection
+from glagg.curves import Approximation
 from glagg.transforms import orthographic
 
 
 # -----------------------------------------------------------------------------
 class PathCollection(Collection):
 
+    # Range of approximation scales (as powers of two) paths appended with
+    # append_path are flattened at, depending on their scale.
+    lod_range = (-4, 4)
+
+    # Maximum number of baked paths kept by bake, least recently used ones
+    # being evicted first (0 disables the cache).
+    bake_cache_size = 256
+
     # ---------------------------------
-    def __init__(self, dash_atlas = None):
-        self.vtype = np.dtype( [('a_position', 'f4', 2),
-                                ('a_segment',  'f4', 2),
-                                ('a_angles',   'f4', 2),
-                                ('a_tangents', 'f4', 4),
-                                ('a_texcoord', 'f4', 2) ])
+    def __init__(self, dash_atlas = None, packed = False, itype = np.float32):
+        """
+        Create a new path collection.
+
+        Parameters
+        ----------
+
+        dash_atlas: DashAtlas
+            Dash atlas (a new one is created if None)
+
+        packed: bool
+            Whether to use a compact vertex layout (32 bytes per vertex
+            instead of 52 with a 16 bits index): half float angles, unit
+            tangents as normalized 16 bits integers and texture coordinates as
+            bytes. Positions and curvilinear abscissa remain float.
+
+        itype: numpy dtype
+            Type of the uniform index attribute (float32, uint32 or uint16)
+        """
+        self.packed = packed
+        if packed:
+            self.vtype = np.dtype( [('a_position', 'f4', 2),
+                                    ('a_segment',  'f4', 2),
+                                    ('a_tangents', 'i2', 4),
+                                    ('a_angles',   'f2', 2),
+                                    ('a_texcoord', 'i1', 2) ])
+            normalized = ('a_tangents',)
+        else:
+            self.vtype = np.dtype( [('a_position', 'f4', 2),
+                                    ('a_segment',  'f4', 2),
+                                    ('a_angles',   'f4', 2),
+                                    ('a_tangents', 'f4', 4),
+                                    ('a_texcoord', 'f4', 2) ])
+            normalized = ()
         self.utype = np.dtype( [('color',      'f4', 4),
                                 ('translate',  'f4', 2),
                                 ('scale',      'f4', 1),
@@ -62,7 +101,9 @@ class PathCollection(Collection):
                                 ('dash_index', 'f4', 1),
                                 ('dash_caps',  'f4', 2),
                                 ('closed',     'f4', 1)] )
-        Collection.__init__(self, self.vtype, self.utype)
+        Collection.__init__(self, self.vtype, self.utype,
+                            itype=itype, normalized=normalized,
+                            quad=(0,1,2,1,2,3))
         shaders = os.path.join(os.path.dirname(__file__),'shaders')
         vertex_shader= os.path.join( shaders, 'path.vert')
         fragment_shader= os.path.join( shaders, 'path.frag')
@@ -70,8 +111,15 @@ class PathCollection(Collection):
             self.dash_atlas = DashAtlas()
         else:
             self.dash_atlas = dash_atlas
-        self.shader = Shader( open(vertex_shader).read(),
-                              open(fragment_shader).read() )
+        self.shader = Shader.from_files( vertex_shader, fragment_shader,
+                                         self._ustorage.code )
+        # Level of detail of items appended with append_path: their keys
+        # (sorted), current levels and [path, index, closed, vertices
+        # flattened for each level]
+        self._lod_keys = np.zeros(0, dtype=int)
+        self._lod_levels = np.zeros(0, dtype=int)
+        self._lod = []
+        self._bake_cache = OrderedDict()
 
 
     # ---------------------------------
@@ -105,68 +153,262 @@ class PathCollection(Collection):
         Collection.append(self,V,I,U)
 
 
+    # ---------------------------------
+    def append_path( self, path, closed=None, **kwargs ):
+        """
+        Append all sub-paths of a path. Path commands are kept such that each
+        sub-path can be flattened again when its scale crosses a power of two
+        (see update_lod).
+
+        Parameters
+        ----------
+
+        path: Path
+            Path to append
+
+        closed: bool
+            Whether sub-paths are closed. If None, a sub-path is closed if its
+            first and last vertices are the same.
+
+        Other parameters are the same as for append_many, parameters given
+        for each sub-path being given for sub-paths of at least two vertices.
+        """
+        vertices, commands = path.vertices, path.commands
+        keep = [i for i, V in enumerate(vertices) if len(V) > 1]
+        if not keep:
+            return
+        vertices = [vertices[i] for i in keep]
+
+        # Sub-paths are flattened again at the level of their own scale
+        scale = np.resize(np.array(kwargs.get('scale', 1.0), dtype=float),
+                          len(keep))
+        levels = self._lod_level( scale )
+        for level in np.unique(levels):
+            approximation = Approximation(2.0**level)
+            if approximation.scale == path.approximation.scale:
+                continue
+            for j in np.nonzero(levels == level)[0]:
+                if commands[keep[j]]:
+                    vertices[j] = path.flatten(keep[j], approximation)
+        if closed is None:
+            D = np.array([V[0] for V in vertices]) - [V[-1] for V in vertices]
+            closed = (D*D).sum(axis=1) < 1e-10
+        closed = np.resize(np.array(closed, dtype=bool), len(vertices))
+
+        start = len(self)
+        self.append_many( vertices, closed=closed, **kwargs )
+        lod = [j for j, i in enumerate(keep) if commands[i]]
+        keys = start + np.array(lod, dtype=int)
+        self._lod_keys = np.append(self._lod_keys, keys)
+        self._lod_levels = np.append(self._lod_levels, levels[lod])
+        self._lod.extend([path, keep[j], closed[j], {int(levels[j]): vertices[j]}]
+                         for j in lod)
+
+
+    # ---------------------------------
+    def _lod_level(self, scale):
+        """ Power of two approximation scale for the given scale(s) """
+        lmin, lmax = self.lod_range
+        scale = np.maximum(scale, 2.0**lmin)
+        return np.clip(np.ceil(np.log2(scale)), lmin, lmax).astype(int)
+
+
+    # ---------------------------------
+    def update_lod(self):
+        """
+        Flatten again sub-paths appended with append_path whose scale crossed
+        a power of two since they were last flattened. Flattened vertices are
+        kept for each level such that switching back to a level is cheap.
+        """
+        if not len(self._lod_keys):
+            return
+        rows = self._ubuffer.items[self._lod_keys,0]
+        levels = self._lod_level( self._ubuffer.data['scale'][rows].ravel() )
+        for j in np.nonzero(levels != self._lod_levels)[0]:
+            key = int(self._lod_keys[j])
+            path, index, closed, cache = self._lod[j]
+            level = int(levels[j])
+            if level not in cache:
+                cache[level] = path.flatten(index, Approximation(2.0**level))
+            V,I,length = self.bake( cache[level], closed=closed )
+            self.replace( key, V, I )
+            self._ubuffer.data['length'][rows[j]] = length
+            self._ubuffer.set_dirty(key)
+            self._lod_levels[j] = level
+        if self._vbuffer.vertices.fragmentation > self._vbuffer.vertices.threshold:
+            self.compact()
+
+
+    # ---------------------------------
+    def upload(self):
+        if self._dirty:
+            self.update_lod()
+        Collection.upload(self)
+
+
+    # ---------------------------------
+    def __delitem__(self, key):
+        if len(self._lod_keys):
+            removed = np.sort(np.arange(len(self))[key].ravel())
+            keep = ~np.in1d(self._lod_keys, removed)
+            self._lod = [lod for lod, k in zip(self._lod, keep) if k]
+            self._lod_levels = self._lod_levels[keep]
+            self._lod_keys = self._lod_keys[keep]
+            self._lod_keys -= np.searchsorted(removed, self._lod_keys)
+        Collection.__delitem__(self, key)
+
+
+    # ---------------------------------
+    def clear(self):
+        Collection.clear(self)
+        self._lod_keys = np.zeros(0, dtype=int)
+        self._lod_levels = np.zeros(0, dtype=int)
+        self._lod = []
+
+
+    # ---------------------------------
+    def append_many( self, vertices, closed=False, color = (0,0,0,1),
+                     linewidth = 1.0, antialias = 1.0, linejoin = 'round', miter_limit = 4.0,
+                     translate = (0,0), scale = 1.0, rotate = 0.0, linecaps = ('round','round'),
+                     dash_pattern='solid', dash_phase = 0.0, dash_caps = ('round','round') ):
+        """
+        Append several paths at once. Each parameter is either common to all
+        paths (same as for append) or given for each path.
+        """
+        V,I,length,vsizes,isizes = self.bake_many( vertices, closed=closed )
+        U = np.zeros(len(vsizes), self.utype)
+
+        U['closed']      = closed
+        U['linewidth']   = linewidth
+        U['antialias']   = antialias
+        U['color']       = color
+        U['translate']   = translate
+        U['scale']       = scale
+        U['rotate']      = rotate
+        U['linejoin']    = self._map(lambda key: self.join.get(key, 1), linejoin)
+        U['linecaps']    = self._map(lambda key: self.caps.get(key, 1), linecaps)
+        U['miter_limit'] = miter_limit
+        U['length']      = length
+        if self.dash_atlas:
+            dash = self._map(lambda key: self.dash_atlas[key], dash_pattern)
+            U['dash_phase']  = dash_phase
+            U['dash_index']  = dash[...,0]
+            U['dash_period'] = dash[...,1]
+            U['dash_caps']   = self._map(lambda key: self.caps.get(key, 1), dash_caps)
+        Collection.append_many(self,V,I,U,vsizes,isizes)
+
+
     # ---------------------------------
     def bake(self, vertices, closed=False):
         """
         Bake a list of 2D vertices for rendering them as thick line. Each line
         segment must have its own vertices because of antialias (this means no
         vertex sharing between two adjacent line segments).
+
+        Baked paths are cached (keyed by their vertices and closed status)
+        such that the same shape appended several times is baked only once.
+        Cached arrays are read-only.
         """
 
-        n = len(vertices)
-        P = np.array(vertices).reshape(n,2).astype(float)
+        P = np.ascontiguousarray(vertices, dtype=float)
+        key = (hashlib.sha1(P).digest(), P.shape, bool(closed))
+        cache = self._bake_cache
+        if key in cache:
+            baked = cache.pop(key)
+            cache[key] = baked
+            return baked
 
-        dx,dy = P[0] - P[-1]
-        d = np.sqrt(dx*dx+dy*dy)
+        V,I,length,_,_ = self.bake_many( [P], closed=closed )
+        V.flags.writeable = False
+        I.flags.writeable = False
+        baked = V, I, length[0]
+        if self.bake_cache_size > 0:
+            cache[key] = baked
+            while len(cache) > self.bake_cache_size:
+                cache.popitem(last=False)
+        return baked
 
-        # If closed, make sure first vertex = last vertex (+/- epsilon=1e-10)
-        if closed and d > 1e-10:
-            P = np.append(P, P[0]).reshape(n+1,2)
-            n+= 1
 
-        V = np.zeros( len(P), dtype = self.vtype )
-        V['a_position'] = P
+    # ---------------------------------
+    def bake_many(self, vertices, closed=False):
+        """
+        Bake several lists of 2D vertices at once (see bake). Each path is
+        made of n-1 segments, each one being a quad of 4 vertices.
+
+        Returns concatenated vertices, concatenated indices (relative to the
+        first vertex of their path), length, number of vertices and number of
+        indices of each path.
+        """
+
+        sizes = np.array([len(v) for v in vertices], dtype=int)
+        P = np.concatenate([np.array(v).reshape(len(v),2) for v in vertices])
+        P = P.astype(float)
+        closed = np.resize(np.array(closed, dtype=bool), len(sizes))
 
-        # Tangents & norms
+        # If closed, make sure first vertex = last vertex (+/- epsilon=1e-10)
+        first = np.cumsum(sizes) - sizes
+        last = first + sizes - 1
+        D = P[first] - P[last]
+        close = closed & (np.sqrt((D*D).sum(axis=1)) > 1e-10)
+        if close.any():
+            P = np.insert(P, last[close]+1, P[first[close]], axis=0)
+            sizes += close
+            first = np.cumsum(sizes) - sizes
+            last = first + sizes - 1
+
+        # Tangents & norms (T[i] goes from P[i] to P[i+1])
         T = P[1:] - P[:-1]
-        
         N = np.sqrt(T[:,0]**2 + T[:,1]**2)
-        # T /= N.reshape(len(T),1)
-        V['a_tangents'][+1:, :2] = T
-        if closed: V['a_tangents'][0  , :2] = T[-1]
-        else:      V['a_tangents'][0  , :2] = T[0]
-        V['a_tangents'][:-1, 2:] = T
-        if closed: V['a_tangents'][ -1, 2:] = T[0]
-        else:      V['a_tangents'][ -1, 2:] = T[-1]
+
+        # Incoming & outgoing tangents at each vertex
+        tangents = np.zeros( (len(P),4) )
+        tangents[+1:, :2] = T
+        tangents[:-1, 2:] = T
+        C = closed.reshape(len(sizes),1)
+        tangents[first, :2] = np.where(C, T[last-1], T[first])
+        tangents[last,  2:] = np.where(C, T[first], T[last-1])
 
         # Angles
-        T1 = V['a_tangents'][:,:2]
-        T2 = V['a_tangents'][:,2:]
+        T1 = tangents[:,:2]
+        T2 = tangents[:,2:]
         A = np.arctan2( T1[:,0]*T2[:,1]-T1[:,1]*T2[:,0],
                         T1[:,0]*T2[:,0]+T1[:,1]*T2[:,1])
-        V['a_angles'][:-1,0] = A[:-1] 
-        V['a_angles'][:-1,1] = A[+1:]
 
-        # Segment
-        L = np.cumsum(N)
-        V['a_segment'][+1:,0] = L
-        V['a_segment'][:-1,1] = L
-        #V['a_lengths'][:,2] = L[-1]
+        # Packed tangents are unit vectors stored as normalized shorts (only
+        # their direction is used)
+        if self.packed:
+            T1 /= np.maximum(np.sqrt((T1*T1).sum(axis=1)), 1e-10).reshape(-1,1)
+            T2 /= np.maximum(np.sqrt((T2*T2).sum(axis=1)), 1e-10).reshape(-1,1)
+            tangents = np.round(tangents*32767)
 
-        # Step 1: A -- B -- C  =>  A -- B, B' -- C
-        V = np.repeat(V,2,axis=0)[+1:-1]
-        V['a_segment'][1:] = V['a_segment'][:-1] 
-        V['a_angles'][1:] = V['a_angles'][:-1] 
-        V['a_texcoord'][0::2] = -1
-        V['a_texcoord'][1::2] = +1
+        # Segments (any vertex but last of each path starts a segment)
+        segment = np.ones(len(P), dtype=bool)
+        segment[last] = False
+        S = np.nonzero(segment)[0]
+        counts = sizes - 1
 
-        # Step 2: A -- B, B' -- C  -> A0/A1 -- B0/B1, B'0/B'1 -- C0/C1
-        V = np.repeat(V,2,axis=0)
-        V['a_texcoord'][0::2,1] = -1
-        V['a_texcoord'][1::2,1] = +1
+        # Curvilinear abscissa, restarting at 0 for each path
+        L = np.zeros(len(P))
+        L[1:] = np.cumsum(np.where(segment[:-1], N, 0))
+        L -= np.repeat(L[first], sizes)
+        length = L[last]
 
-        I = np.resize( np.array([0,1,2,1,2,3], dtype=np.uint32), (n-1)*(2*3))
-        I += np.repeat( 4*np.arange(n-1), 6)
+        # Each segment is a quad: A0/A1 -- B0/B1
+        V = np.zeros( (len(S),4), dtype = self.vtype )
+        V['a_position'][:,:2] = P[S].reshape(len(S),1,2)
+        V['a_position'][:,2:] = P[S+1].reshape(len(S),1,2)
+        V['a_tangents'][:,:2] = tangents[S].reshape(len(S),1,4)
+        V['a_tangents'][:,2:] = tangents[S+1].reshape(len(S),1,4)
+        V['a_segment'][...,0] = L[S].reshape(len(S),1)
+        V['a_segment'][...,1] = L[S+1].reshape(len(S),1)
+        V['a_angles'][...,0]  = A[S].reshape(len(S),1)
+        V['a_angles'][...,1]  = A[S+1].reshape(len(S),1)
+        V['a_texcoord'] = (-1,-1), (-1,+1), (+1,-1), (+1,+1)
+        V = V.ravel()
 
-        return V, I, L[-1]
+        # Indices are relative to the first vertex of each path
+        index = np.arange(len(S)) - np.repeat(np.cumsum(counts) - counts, counts)
+        I = np.resize( np.array([0,1,2,1,2,3], dtype=np.uint32), len(S)*6)
+        I += np.repeat( 4*index, 6).astype(np.uint32)
 
+        return V, I, length, 4*counts, 6*counts
@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (C) 2013 Nicolas P. Rougier. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY NICOLAS P. ROUGIER ''AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL NICOLAS P. ROUGIER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of Nicolas P. Rougier.
+# -----------------------------------------------------------------------------
+"""
+A renderer draws several collections in a single pass, sharing the
+projection, view and model matrices and skipping redundant state changes:
+collections are sorted by shader and textures such that a program is bound
+(and its matrices set) only once for consecutive collections using it, and
+a texture is bound only if it is not already bound to the same unit.
+
+When the viewport is given to the renderer (e.g. when the window is resized),
+a pass does not query GL for it. Default projection is cached for a given
+viewport size and default view and model matrices are shared such that no
+matrix is allocated per pass.
+
+Each pass records the number of state changes it issued and skipped, and of
+draw calls. When profiling, it also counts all GL calls issued during the
+pass (see Renderer.stats).
+"""
+import numpy as np
+import OpenGL.GL as gl
+from transforms import orthographic
+
+
+# Default view and model matrices (shared hence read-only)
+_identity = np.eye(4, dtype=np.float32)
+_identity.flags.writeable = False
+
+
+# -----------------------------------------------------------------------------
+class RenderState(object):
+    """
+    Cache of the GL state set during a pass (current program, textures bound
+    to each unit, enabled capabilities) along with counters of state changes
+    and draw calls.
+    """
+
+    # ---------------------------------
+    def __init__(self):
+        self.reset()
+
+
+    # ---------------------------------
+    def reset(self):
+        """ Forget cached state (GL state may have changed) and counters """
+        self.shader = None
+        self.unit = None
+        self.textures = {}
+        self.capabilities = {}
+        self.changes = 0
+        self.skipped = 0
+        self.draws = 0
+
+
+    # ---------------------------------
+    def get_stats(self):
+        """ Counters of the pass as a dict """
+        return { 'changes' : self.changes,
+                 'skipped' : self.skipped,
+                 'draws'   : self.draws }
+    stats = property(get_stats)
+
+
+    # ---------------------------------
+    def use(self, shader):
+        """
+        Bind shader unless it is already bound.
+
+        Returns whether shader has been bound.
+        """
+        if shader is self.shader:
+            self.skipped += 1
+            return False
+        shader.bind()
+        self.shader = shader
+        self.changes += 1
+        return True
+
+
+    # ---------------------------------
+    def bind_texture(self, unit, target, texture):
+        """ Bind texture to a texture unit unless it is already bound """
+        if self.textures.get(unit) == (target, texture):
+            self.skipped += 1
+            return
+        if unit != self.unit:
+            gl.glActiveTexture( gl.GL_TEXTURE0 + unit )
+            self.unit = unit
+        gl.glBindTexture( target, texture )
+        self.textures[unit] = (target, texture)
+        self.changes += 1
+
+
+    # ---------------------------------
+    def enable(self, capability, enabled=True):
+        """ Enable (or disable) a capability unless it is already """
+        if self.capabilities.get(capability) == enabled:
+            self.skipped += 1
+            return
+        if enabled:
+            gl.glEnable( capability )
+        else:
+            gl.glDisable( capability )
+        self.capabilities[capability] = enabled
+        self.changes += 1
+
+
+    # ---------------------------------
+    def disable(self, capability):
+        """ Disable a capability unless it is already """
+        self.enable(capability, False)
+
+
+    # ---------------------------------
+    def draw(self):
+        """ Count a draw call """
+        self.draws += 1
+
+
+
+# -----------------------------------------------------------------------------
+class CallCounter(object):
+    """
+    Counter of the calls to OpenGL.GL functions, which are wrapped between
+    start and stop. This is meant for profiling only since wrapping all
+    functions takes time.
+    """
+
+    # ---------------------------------
+    def __init__(self):
+        self.calls = 0
+        self._functions = {}
+
+
+    # ---------------------------------
+    def _wrap(self, function):
+        def wrapper(*args, **kwargs):
+            self.calls += 1
+            return function(*args, **kwargs)
+        return wrapper
+
+
+    # ---------------------------------
+    def start(self):
+        """ Start counting calls (from 0) """
+        self.calls = 0
+        for name in dir(gl):
+            function = getattr(gl, name)
+            if name.startswith('gl') and callable(function):
+                self._functions[name] = function
+                setattr(gl, name, self._wrap(function))
+
+
+    # ---------------------------------
+    def stop(self):
+        """ Stop counting calls """
+        for name, function in self._functions.items():
+            setattr(gl, name, function)
+        self._functions = {}
+
+
+
+# -----------------------------------------------------------------------------
+class Renderer(object):
+    """
+    Renderer of several collections, drawn in a single pass.
+
+    Since collections are sorted by shader and textures, overlapping
+    collections may not be drawn in the order they have been added. Use
+    sort=False to keep this order (state changes are still skipped between
+    consecutive collections sharing a shader or textures).
+
+    Counters of the last pass are available as a dict (stats) with the number
+    of state changes, of skipped (redundant) ones, of draw calls and, if
+    profile is True, of GL calls.
+    """
+
+    # ---------------------------------
+    def __init__(self, collections=(), sort=True, profile=False):
+        """
+        Create a new renderer.
+
+        Parameters
+        ----------
+
+        collections: sequence of Collection
+            Collections to be drawn
+
+        sort: bool
+            Whether to sort collections by shader and textures
+
+        profile: bool
+            Whether to count GL calls of each pass (slow)
+        """
+        self.collections = list(collections)
+        self.sort = sort
+        self.profile = profile
+        self.state = RenderState()
+        self.stats = {}
+        self._viewport = None
+        self._projection = None, None
+
+
+    # ---------------------------------
+    def get_viewport(self):
+        """ Viewport as (x, y, width, height), None if queried at each pass """
+        return self._viewport
+
+    def set_viewport(self, viewport):
+        if viewport is not None:
+            viewport = tuple(viewport)
+        self._viewport = viewport
+    viewport = property(get_viewport, set_viewport)
+
+
+    # ---------------------------------
+    def get_projection(self):
+        """
+        Default projection: orthographic one covering the viewport (in
+        pixels), computed only when viewport size changes.
+        """
+        viewport = self._viewport
+        if viewport is None:
+            viewport = gl.glGetIntegerv( gl.GL_VIEWPORT )
+        size = int(viewport[2]), int(viewport[3])
+        if size != self._projection[0]:
+            width, height = size
+            P = orthographic( 0, width, 0, height, -1, +1 )
+            P.flags.writeable = False
+            self._projection = size, P
+        return self._projection[1]
+    projection = property(get_projection)
+
+
+    # ---------------------------------
+    def append(self, collection):
+        """ Add a collection """
+        self.collections.append(collection)
+
+
+    # ---------------------------------
+    def remove(self, collection):
+        """ Remove a collection """
+        self.collections.remove(collection)
+
+
+    # ---------------------------------
+    def draw(self, P=None, V=None, M=None):
+        """
+        Draw all collections.
+
+        Parameters
+        ----------
+
+        P, V, M: 4x4 arrays
+            Projection, view and model matrices. Default projection is an
+            orthographic one covering the viewport (in pixels), default view
+            and model are identity.
+        """
+
+        if self.profile:
+            counter = CallCounter()
+            counter.start()
+            try:
+                self._draw(P, V, M)
+            finally:
+                counter.stop()
+            self.stats['calls'] = counter.calls
+        else:
+            self._draw(P, V, M)
+
+
+    # ---------------------------------
+    def _draw(self, P, V, M):
+        state = self.state
+        state.reset()
+
+        if P is None:
+            P = self.projection
+        if V is None:
+            V = _identity
+        if M is None:
+            M = _identity
+
+        # Uploads (and texture creation) bind textures, hence they are done
+        # before any state is cached
+        batches = []
+        for collection in self.collections:
+            if collection._dirty:
+                collection.upload()
+            batches.append( (collection, tuple(collection._textures())) )
+        if self.sort:
+            batches.sort( key=lambda (c, textures): (id(c.shader), textures) )
+
+        gl.glBlendFunc( gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA )
+        state.enable( gl.GL_BLEND )
+        for collection, textures in batches:
+            shader = collection.shader
+            if state.use(shader):
+                shader.uniform_matrixf( 'u_M', M )
+                shader.uniform_matrixf( 'u_V', V )
+                shader.uniform_matrixf( 'u_P', P )
+            for unit, target, texture in textures:
+                state.bind_texture( unit, target, texture )
+            collection._activate( shader, state )
+            collection._draw( shader )
+            state.draw()
+        if state.shader is not None:
+            state.shader.unbind()
+        self.stats = state.stats
@@ -28,5 +28,6 @@
 # those of the authors and should not be interpreted as representing official
 # policies, either expressed or implied, of Nicolas P. Rougier.
 # -----------------------------------------------------------------------------
+from glagg.sdf.texture_font import TextureFont
 from glagg.sdf.font_manager import FontManager
 from glagg.sdf.glyph_collection import GlyphCollection
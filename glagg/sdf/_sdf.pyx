@@ -8,10 +8,25 @@ np.import_array()
 
 # cdefine the signature of our c function
 cdef extern from "sdf.h":
-    void _compute_sdf(double *data, unsigned int width, unsigned int height)
+    void _compute_sdf(double *data, unsigned int width, unsigned int height) nogil
 
 # create the wrapper code, with numpy type annotations
 def compute_sdf(np.ndarray[double, ndim=2, mode="c"] in_array not None):
     """Compute the signed distance field"""
-    _compute_sdf(<double*> np.PyArray_DATA(in_array),
-                  in_array.shape[1], in_array.shape[0])
+    cdef double *data = <double*> np.PyArray_DATA(in_array)
+    cdef unsigned int width = in_array.shape[1]
+    cdef unsigned int height = in_array.shape[0]
+    # The GIL is released such that glyphs can be computed by several threads
+    with nogil:
+        _compute_sdf(data, width, height)
+
+cdef extern from "sdf.h":
+    void _compute_sdf_fh(float *data, unsigned int width, unsigned int height) nogil
+
+def compute_sdf_fh(np.ndarray[float, ndim=2, mode="c"] in_array not None):
+    """Compute the signed distance field (exact transform, single precision)"""
+    cdef float *data = <float*> np.PyArray_DATA(in_array)
+    cdef unsigned int width = in_array.shape[1]
+    cdef unsigned int height = in_array.shape[0]
+    with nogil:
+        _compute_sdf_fh(data, width, height)
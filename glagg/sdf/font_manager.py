@@ -33,6 +33,7 @@ import numpy as np
 
 #import glagg.spatial_filter
 from glagg.texture import Texture
+from glagg.face_cache import FaceCache
 from glagg.atlas_buffer import AtlasBuffer
 from glagg.sdf.texture_font import TextureFont
 
@@ -70,6 +71,10 @@ class FontManagerException(Exception): pass
 
 # -----------------------------------------------------------------------------
 class FontManager(object):
+
+    # FreeType faces shared by all fonts (one per font file)
+    faces = FaceCache()
+
     def __init__(self, atlas = None):
         if atlas is None: 
             self.atlas = AtlasBuffer(512, 512, np.float32)
@@ -90,7 +95,7 @@ class FontManager(object):
         key = '%s-%d' % (os.path.basename(filename), size)
         if key in self.fonts.keys():
             return self.fonts[key]
-        font = TextureFont(filename, self.atlas)
+        font = TextureFont(filename, self.atlas, self.faces)
         self.fonts[key] = font
         return font
         
@@ -34,7 +34,6 @@ import numpy as np
 import OpenGL.GL as gl
 from glagg.shader import Shader
 from glagg.collection import Collection
-from glagg.transforms import orthographic
 from glagg.sdf.font_manager import FontManager
 
 
@@ -52,14 +51,14 @@ class GlyphCollection(Collection):
                                 ('scale',      'f4', 1),
                                 ('rotate',     'f4', 1)] )
         self.font_manager = font_manager
-        Collection.__init__(self, self.vtype, self.utype)
+        Collection.__init__(self, self.vtype, self.utype, quad=(0,1,2,0,2,3))
 
         # code = self.font_manager.filter_code
         shaders = os.path.join(os.path.dirname(__file__),'../shaders')
         vertex_shader= os.path.join( shaders, 'sdf_text.vert')
         fragment_shader= os.path.join( shaders, 'sdf_text.frag')
-        self.shader = Shader( open(vertex_shader).read(),
-                              open(fragment_shader).read() )
+        self.shader = Shader.from_files( vertex_shader, fragment_shader,
+                                         self._ustorage.code )
 
 
     # ---------------------------------
@@ -190,42 +189,21 @@ class GlyphCollection(Collection):
         return vertices
 
     # ---------------------------------
-    def draw(self, P=None, V=None, M=None):
+    def _textures(self):
+        """ Textures used by the collection as (unit, target, id) """
         manager = self.font_manager
-        atlas = manager.atlas
-        shader = self.shader
+        return [ (0, self._ustorage.target, self._ustorage.id),
+                 (1, gl.GL_TEXTURE_2D, manager.atlas_texture.id),
+                 (2, gl.GL_TEXTURE_1D, manager.filter_texture.id) ]
 
-        if self._dirty:
-            self.upload()
 
-        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
-        gl.glEnable(gl.GL_BLEND)
-        _,_,width,height = gl.glGetIntegerv( gl.GL_VIEWPORT )
-        P = orthographic( 0, width, 0, height, -1, +1 )
-        V = np.eye(4).astype( np.float32 )
-        M = np.eye(4).astype( np.float32 )
-
-        shader.bind()
-
-        gl.glActiveTexture( gl.GL_TEXTURE0 )
-        shader.uniformi( 'u_uniforms', 0 )
-        gl.glBindTexture( gl.GL_TEXTURE_2D, self._ubuffer_id )
-        shape = self._ubuffer_shape
-        shader.uniformf( 'u_uniforms_shape', shape[1]//4, shape[0])
-
-        gl.glActiveTexture( gl.GL_TEXTURE1 )
+    # ---------------------------------
+    def _activate(self, shader, state):
+        """ Set collection uniforms (shader and textures being bound) """
+        manager = self.font_manager
+        self._ustorage.setup( shader, 0 )
         shader.uniformi( 'u_font_atlas', 1 )
-        gl.glBindTexture( gl.GL_TEXTURE_2D, manager.atlas_texture.id)
         shader.uniformf( 'u_font_atlas_shape',
                          manager.atlas.width, manager.atlas.height)
-        
-        gl.glActiveTexture( gl.GL_TEXTURE2 )
         shader.uniformi( 'u_filter_lut', 2 )
-        gl.glBindTexture( gl.GL_TEXTURE_1D, manager.filter_texture.id)
-
-        shader.uniform_matrixf( 'u_M', M )
-        shader.uniform_matrixf( 'u_V', V )
-        shader.uniform_matrixf( 'u_P', P )
-        gl.glDisable( gl.GL_DEPTH_TEST )
-        self._vbuffer.draw( )
-        shader.unbind()
+        state.disable( gl.GL_DEPTH_TEST )
@@ -641,3 +641,133 @@ _compute_sdf( double *data, unsigned int width, unsigned int height )
     free( inside );
 }
 
+
+
+/*
+ * One dimensional squared Euclidean distance transform of f (n samples,
+ * separated by stride) using the lower envelope of parabolas (Felzenszwalb &
+ * Huttenlocher, "Distance Transforms of Sampled Functions", 2012). d, v and
+ * z are work buffers of respectively n, n and n+1 elements.
+ */
+static void
+edt_1d( float *f, unsigned int n, unsigned int stride,
+        float *d, int *v, float *z )
+{
+    int k = 0;
+    int q;
+    float s;
+
+    v[0] = 0;
+    z[0] = -INFINITY;
+    z[1] = +INFINITY;
+    for( q=1; q<n; ++q )
+    {
+        s = ((f[q*stride] + q*q) - (f[v[k]*stride] + v[k]*v[k])) / (2*q - 2*v[k]);
+        while( s <= z[k] )
+        {
+            k--;
+            s = ((f[q*stride] + q*q) - (f[v[k]*stride] + v[k]*v[k])) / (2*q - 2*v[k]);
+        }
+        k++;
+        v[k] = q;
+        z[k] = s;
+        z[k+1] = +INFINITY;
+    }
+    k = 0;
+    for( q=0; q<n; ++q )
+    {
+        while( z[k+1] < q )
+            k++;
+        d[q] = (q-v[k])*(q-v[k]) + f[v[k]*stride];
+    }
+    for( q=0; q<n; ++q )
+        f[q*stride] = d[q];
+}
+
+
+/*
+ * Two dimensional squared Euclidean distance transform, in place, of f
+ * (0 on features, infinity elsewhere) using separable passes on columns
+ * then rows.
+ */
+static void
+edt_2d( float *f, unsigned int width, unsigned int height,
+        float *d, int *v, float *z )
+{
+    unsigned int i;
+
+    for( i=0; i<width; ++i )
+        edt_1d( f+i, height, width, d, v, z );
+    for( i=0; i<height; ++i )
+        edt_1d( f+i*width, width, 1, d, v, z );
+}
+
+
+void
+_compute_sdf_fh( float *data, unsigned int width, unsigned int height )
+{
+    unsigned int n = width > height ? width : height;
+    float * outside = (float *) malloc( width * height * sizeof(float) );
+    float * inside  = (float *) malloc( width * height * sizeof(float) );
+    float * d = (float *) malloc( n * sizeof(float) );
+    float * z = (float *) malloc( (n+1) * sizeof(float) );
+    int   * v = (int *)   malloc( n * sizeof(int) );
+    int i;
+
+    // Pixels are split in half coverage: outside pixels measure their
+    // distance to the nearest inside one and conversely.
+    for( i=0; i<width*height; ++i )
+    {
+        if( data[i] > 0.5 )
+        {
+            outside[i] = 0;
+            inside[i] = 1e20;
+        }
+        else
+        {
+            outside[i] = 1e20;
+            inside[i] = 0;
+        }
+    }
+    edt_2d( outside, width, height, d, v, z );
+    edt_2d( inside,  width, height, d, v, z );
+
+    // Bipolar distance field. Distances between pixel centers are shifted by
+    // half a pixel to lie on the edge, which is refined using coverage for
+    // antialiased pixels.
+    float vmin = +INFINITY;
+    for( i=0; i<width*height; ++i )
+    {
+        float a = data[i];
+        if( a > 0.0 && a < 1.0 )
+            outside[i] = 0.5 - a;
+        else if( outside[i] > 0 )
+            outside[i] = sqrtf( outside[i] ) - 0.5;
+        else
+            outside[i] = 0.5 - sqrtf( inside[i] );
+        if( outside[i] < vmin )
+        {
+            vmin = outside[i];
+        }
+    }
+    vmin = fabsf(vmin);
+    for( i=0; i<width*height; ++i)
+    {
+        float v = outside[i];
+        if( vmin == 0 )
+        {
+            // Field is entirely clamped to the edge
+            data[i] = 0.5;
+            continue;
+        }
+        if     ( v < -vmin) outside[i] = -vmin;
+        else if( v > +vmin) outside[i] = +vmin;
+        data[i] = (outside[i]+vmin)/(2*vmin);
+    }
+
+    free( outside );
+    free( inside );
+    free( d );
+    free( z );
+    free( v );
+}
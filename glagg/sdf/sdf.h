@@ -87,3 +87,10 @@ void edtaa3(double *img, double *gx, double *gy, int w, int h,
 
 void
 _compute_sdf( double *dat, unsigned int width, unsigned int height );
+
+/*
+ * Same as _compute_sdf using a separable exact Euclidean distance transform
+ * (Felzenszwalb & Huttenlocher) in single precision.
+ */
+void
+_compute_sdf_fh( float *data, unsigned int width, unsigned int height );
@@ -29,7 +29,13 @@
 # those of the authors and should not be interpreted as representing official
 # policies, either expressed or implied, of Nicolas P. Rougier.
 # -----------------------------------------------------------------------------
+import os
 import sys
+import ctypes
+import hashlib
+import tempfile
+import multiprocessing
+import multiprocessing.pool
 import numpy as np
 from freetype import *
 import OpenGL.GL as gl
@@ -38,8 +44,9 @@ from scipy.ndimage.interpolation import zoom
 
 from glagg.transforms import *
 from glagg.shader import Shader
-from glagg.sdf.sdf import compute_sdf
+from glagg.sdf.sdf import compute_sdf, compute_sdf_fh
 from glagg.vertex_buffer import VertexBuffer
+from glagg.face_cache import FaceCache
 
 
 # -----------------------------------------------------------------------------
@@ -50,7 +57,7 @@ class TextureGlyph:
     Font.
     '''
 
-    def __init__(self, charcode, size, offset, advance, texcoords):
+    def __init__(self, charcode, size, offset, advance, texcoords, font=None):
         '''
         Build a new texture glyph
 
@@ -71,12 +78,16 @@ class TextureGlyph:
 
         texcoords: tuple of 4 floats
             Texture coordinates of bottom-left and top-right corner
+
+        font: TextureFont
+            Font the glyph belongs to, used to compute kerning
         '''
         self.charcode = charcode
         self.size = size
         self.offset = offset
         self.advance = advance
         self.texcoords = texcoords
+        self.font = font
         self.kerning = {}
 
 
@@ -89,24 +100,46 @@ class TextureGlyph:
         charcode: char
             Character preceding this glyph
         '''
-        if charcode in self.kerning.keys():
-            return self.kerning[charcode]
-        else:
-            return 0
+        # Kerning is computed on first use of each pair
+        if charcode not in self.kerning:
+            kerning = 0
+            if charcode is not None and self.font is not None:
+                kerning = self.font.get_kerning(charcode, self.charcode)
+            self.kerning[charcode] = kerning
+        return self.kerning[charcode]
 
 
 # -----------------------------------------------------------------------------
 class TextureFont:
-    def __init__(self, filename, atlas):
+
+    # Directory where distance fields of glyphs are cached (None for no cache).
+    # Each glyph is stored in its own file, named after the font file content
+    # and glyph parameters, holding a single record made of its metrics and
+    # its (float32) distance field (see _write_glyph).
+    cache_dir = None
+
+    # Distance transform used to compute distance fields of glyphs:
+    #  'edtaa3': anti-aliased sweep-and-update transform (double precision)
+    #  'fh':     exact separable transform of Felzenszwalb & Huttenlocher
+    #            (single precision), about 6 times faster
+    engine = 'edtaa3'
+
+    _hashes = {}
+
+    def __init__(self, filename, atlas, faces=None):
         self.atlas = atlas
         self.filename = filename
         self.glyphs = {}
-        face = Face( self.filename )
-        face.set_char_size( int(64*64))
-        metrics = face.size
-        self.ascender  = metrics.ascender/64.0
-        self.descender = metrics.descender/64.0
-        self.height    = metrics.height/64.0
+        if faces is None:
+            faces = FaceCache()
+        self.faces = faces
+        with faces.lock:
+            face = faces.get( self.filename, 64 )
+            metrics = face.size
+            self.ascender  = metrics.ascender/64.0
+            self.descender = metrics.descender/64.0
+            self.height    = metrics.height/64.0
+            self.has_kerning = face.has_kerning
         self.linegap   = self.height - self.ascender + self.descender
 
     def __getitem__(self, charcode):
@@ -114,54 +147,167 @@ class TextureFont:
             self.load('%c' % charcode)
         return self.glyphs[charcode]
 
-    def load_glyph(self, face, charcode, h_size=512, l_size=64, padding=0.25):
-        face.set_char_size( h_size*64 )
-        face.load_char(charcode, FT_LOAD_RENDER | FT_LOAD_NO_HINTING | FT_LOAD_NO_AUTOHINT);
+    def get_kerning(self, left, right):
+        ''' Get kerning between two characters (0 if font has no kerning) '''
+        if not self.has_kerning:
+            return 0
+        with self.faces.lock:
+            face = self.faces.get( self.filename, 64 )
+            kerning = face.get_kerning(left, right, mode=FT_KERNING_UNFITTED)
+        return kerning.x/64.0
 
-        bitmap = face.glyph.bitmap
-        width  = face.glyph.bitmap.width
-        height = face.glyph.bitmap.rows
-        pitch  = face.glyph.bitmap.pitch
+    def _glyph_filename(self, charcode, h_size, l_size, padding):
+        ''' Cache filename of a glyph, None if there is no cache '''
+        if not TextureFont.cache_dir:
+            return None
+        if self.filename not in TextureFont._hashes:
+            content = open(self.filename, 'rb').read()
+            TextureFont._hashes[self.filename] = hashlib.sha1(content).hexdigest()
+        key = repr( (TextureFont._hashes[self.filename], ord(charcode),
+                     h_size, l_size, padding, TextureFont.engine, 'f4') )
+        return os.path.join(TextureFont.cache_dir,
+                            hashlib.sha1(key).hexdigest() + '.npy')
 
-        # Get glyph into a numpy array
-        G = np.array(bitmap.buffer).reshape(height,pitch)
-        G = G[:,:width].astype(np.ubyte)
+    def _read_glyph(self, filename):
+        ''' Read a cached glyph (distance field is memory mapped) '''
+        Z = np.load(filename, mmap_mode='r')
+        w, h = [int(v) for v in Z['size'][0]]
+        offset = tuple(float(v) for v in Z['offset'][0])
+        advance = tuple(float(v) for v in Z['advance'][0])
+        return Z['data'][0], (w,h), offset, advance
+
+    def _write_glyph(self, filename, data, offset, advance):
+        ''' Write a glyph into the cache '''
+        h, w = data.shape
+        Z = np.zeros(1, [('size',    np.int32,   2),
+                         ('offset',  np.float64, 2),
+                         ('advance', np.float64, 2),
+                         ('data',    np.float32, (h,w))])
+        Z['size'] = w, h
+        Z['offset'] = offset
+        Z['advance'] = advance
+        Z['data'] = data
+        if not os.path.isdir(TextureFont.cache_dir):
+            os.makedirs(TextureFont.cache_dir)
+        # Written aside then renamed such that concurrent processes never
+        # read a partial file
+        fd, temp = tempfile.mkstemp(dir=TextureFont.cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, Z)
+        os.rename(temp, filename)
+
+    def load_glyph(self, charcode, h_size=512, l_size=64, padding=0.25):
+        filename = self._glyph_filename(charcode, h_size, l_size, padding)
+        if filename is not None and os.path.exists(filename):
+            return self._read_glyph(filename)
+
+        # Face is only needed (and locked) to render the glyph
+        with self.faces.lock:
+            face = self.faces.get( self.filename, h_size )
+            face.load_char(charcode, FT_LOAD_RENDER | FT_LOAD_NO_HINTING | FT_LOAD_NO_AUTOHINT);
+
+            bitmap = face.glyph.bitmap
+            width  = face.glyph.bitmap.width
+            height = face.glyph.bitmap.rows
+            pitch  = face.glyph.bitmap.pitch
+            left   = face.glyph.bitmap_left
+            top    = face.glyph.bitmap_top
+            advance_x = face.glyph.advance.x
+            advance_y = face.glyph.advance.y
+
+            # Get glyph into a numpy array (read directly from the FreeType
+            # buffer since bitmap.buffer is built as a list)
+            G = np.zeros((height,pitch), np.ubyte)
+            if G.size:
+                ctypes.memmove(G.ctypes.data, bitmap._FT_Bitmap.buffer, G.size)
+            G = G[:,:width].astype(np.ubyte)
 
         # Pad high resolution glyph with a blank border and normalize values
         # between 0 and 1
         h_width  = (1+2*padding)*width
         h_height = (1+2*padding)*height
-        h_data = np.zeros( (h_height,h_width), np.double)
+        if TextureFont.engine == 'fh':
+            h_data = np.zeros( (h_height,h_width), np.float32)
+        else:
+            h_data = np.zeros( (h_height,h_width), np.double)
         ox,oy = padding*width, padding*height
         h_data[oy:oy+height, ox:ox+width] = G/255.0
 
        # Compute distance field at high resolution
-        compute_sdf(h_data)
+        if TextureFont.engine == 'fh':
+            compute_sdf_fh(h_data)
+            # Distance field is nearly linear, so is its interpolation
+            order = 1
+        else:
+            compute_sdf(h_data)
+            order = 3
 
        # Scale down glyph to low resoltion size
         ratio = l_size/float(h_size)
-        l_data = 1 - zoom(h_data, ratio, cval=1.0)
+        l_data = 1 - zoom(h_data, ratio, order=order, cval=1.0)
         if len(l_data):
             l_data  /= l_data.max()
 
 
        # Compute information at low resolution size
         size   = ( l_data.shape[1],l_data.shape[0] )
-        offset = ( (face.glyph.bitmap_left - padding*width) * ratio,
-                   (face.glyph.bitmap_top + padding*height) * ratio )
-        advance = ( (face.glyph.advance.x/64.0)*ratio,
-                    (face.glyph.advance.y/64.0)*ratio )
+        offset = ( (left - padding*width) * ratio,
+                   (top + padding*height) * ratio )
+        advance = ( (advance_x/64.0)*ratio,
+                    (advance_y/64.0)*ratio )
+        if filename is not None:
+            self._write_glyph(filename, l_data, offset, advance)
         return l_data, size, offset, advance
 
 
-    def load(self, charcodes = ''):
-        face = Face( self.filename )
+    def load(self, charcodes = '', workers=None, threads=False):
+        '''
+        Build glyphs corresponding to individual characters in charcodes.
+
+        Parameters:
+        -----------
 
+        charcodes: [str | unicode]
+            Set of characters to be represented
+
+        workers: int
+            Number of processes (or threads) computing distance fields of
+            glyphs. Glyphs are packed into the atlas in charcodes order
+            whatever the number of workers. Workers are started by each call
+            and are meant for preloading many glyphs at once.
+
+        threads: bool
+            Whether workers are threads rather than processes
+        '''
+        todo = []
         for charcode in charcodes:
-            if charcode in self.glyphs.keys():
-                continue
+            if charcode not in self.glyphs and charcode not in todo:
+                todo.append(charcode)
+        if workers > 1 and len(todo) > 1:
+            if threads:
+                pool = multiprocessing.pool.ThreadPool(workers)
+                function = lambda c: self.load_glyph(c, 256, 64)
+                args = todo
+            else:
+                pool = multiprocessing.Pool(workers)
+                function = _load_glyph
+                args = [(self.filename, c, 256, 64,
+                         TextureFont.cache_dir, TextureFont.engine)
+                        for c in todo]
+            # Workers are stopped whatever happens (e.g. FreeType error)
+            try:
+                glyphs = pool.map(function, args)
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+        else:
+            glyphs = [self.load_glyph(c, 256, 64) for c in todo]
+
+        for charcode, (data,size,offset,advance) in zip(todo, glyphs):
             self.atlas._dirty = True
-            data,size,offset,advance = self.load_glyph(face, charcode, 256, 64)
             w,h = size
             x,y = self.atlas.allocate(w+4,h+4)
             self.atlas.add(data, (x+2,y+2,w,h))
@@ -172,14 +318,23 @@ class TextureFont:
             u1     = (x + w - 0.0)/float(self.atlas.width)
             v1     = (y + h - 0.0)/float(self.atlas.height)
             texcoords = (u0,v0,u1,v1)
-            glyph = TextureGlyph(charcode, size, offset, advance, texcoords)
+            glyph = TextureGlyph(charcode, size, offset, advance, texcoords,
+                                 self)
             self.glyphs[charcode] = glyph
-            # Generate kerning
-            face.set_char_size( 64*64 )
-            for g in self.glyphs.values():
-                kerning = face.get_kerning(g.charcode, charcode, mode=FT_KERNING_UNFITTED)
-                if kerning.x != 0:
-                    glyph.kerning[g.charcode] = kerning.x/64.0
-                kerning = face.get_kerning(charcode, g.charcode, mode=FT_KERNING_UNFITTED)
-                if kerning.x != 0:
-                    g.kerning[charcode] = kerning.x/64.0
+
+
+
+# -----------------------------------------------------------------------------
+_fonts = {}
+
+def _load_glyph(args):
+    ''' Load a glyph within a worker process (see TextureFont.load) '''
+    filename, charcode, h_size, l_size, cache_dir, engine = args
+    TextureFont.cache_dir = cache_dir
+    TextureFont.engine = engine
+    if filename not in _fonts:
+        _fonts[filename] = TextureFont(filename, None)
+    data, size, offset, advance = _fonts[filename].load_glyph(charcode,
+                                                              h_size, l_size)
+    # Cached distance fields are memory mapped
+    return np.array(data), size, offset, advance
@@ -28,25 +28,136 @@
 # those of the authors and should not be interpreted as representing official
 # policies, either expressed or implied, of Nicolas P. Rougier.
 # -----------------------------------------------------------------------------
+"""
+Shaders built from the same sources are shared through a process-wide
+registry (see Shader.get and Shader.from_files) such that a program is
+compiled and linked only once for all collections of a given type.
+
+Linked programs can also be saved (glGetProgramBinary) into a cache directory
+and reloaded by later processes, skipping GLSL compilation altogether::
+
+    Shader.cache_dir = os.path.expanduser('~/.cache/glagg')
+
+Binaries are specific to a driver: they are stored per GL vendor, renderer and
+version, and a binary rejected by the driver is simply rebuilt from sources.
+"""
+import os
 import ctypes
+import hashlib
+import tempfile
+import numpy as np
 import OpenGL.GL as gl
 
 class ShaderException(Exception):
     pass
 
 class Shader:
+
+    # Directory where program binaries are saved (None for no binary cache)
+    cache_dir = None
+
+    _shaders = {}
+    _sources = {}
+    _programs = {}
+
     def __init__(self, vertex_code = None, fragment_code = None):
         self.uniforms = {}
+        self.attributes = {}
+        self._values = {}
         self.handle = 0
         self.vertex_code   = vertex_code
         self.fragment_code = fragment_code
 
+    @staticmethod
+    def get(vertex_code, fragment_code):
+        """ Get the shader shared by all users of the same sources """
+        key = hashlib.sha1(vertex_code + '\0' + fragment_code).hexdigest()
+        if key not in Shader._shaders:
+            Shader._shaders[key] = Shader(vertex_code, fragment_code)
+        return Shader._shaders[key]
+
+    @staticmethod
+    def from_handle(handle):
+        """ Get the shader of a (linked) program, None if it has none """
+        return Shader._programs.get(handle)
+
+    @staticmethod
+    def from_files(vertex_filename, fragment_filename, vertex_prefix=''):
+        """
+        Get the shared shader built from source files (read only once), the
+        vertex source being prepended with the given code.
+        """
+        for filename in vertex_filename, fragment_filename:
+            if filename not in Shader._sources:
+                Shader._sources[filename] = open(filename).read()
+        return Shader.get(vertex_prefix + Shader._sources[vertex_filename],
+                          Shader._sources[fragment_filename])
+
     def build(self):
         self.handle = gl.glCreateProgram()
         self.linked = False
+        filename = self._binary_filename()
+        if filename and self._load_binary(filename):
+            return
         self._build_shader(self.vertex_code, gl.GL_VERTEX_SHADER)
         self._build_shader(self.fragment_code, gl.GL_FRAGMENT_SHADER)
+        if filename:
+            gl.glProgramParameteri(self.handle,
+                                   gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT,
+                                   gl.GL_TRUE)
         self._link()
+        if filename:
+            self._save_binary(filename)
+
+    def _binary_filename(self):
+        """ Program binary filename, None if binaries are not available """
+        if not Shader.cache_dir or not bool(gl.glGetProgramBinary):
+            return None
+        if not gl.glGetIntegerv(gl.GL_NUM_PROGRAM_BINARY_FORMATS):
+            return None
+        driver = [gl.glGetString(name) for name in
+                  (gl.GL_VENDOR, gl.GL_RENDERER, gl.GL_VERSION)]
+        key = '\0'.join([self.vertex_code, self.fragment_code] + driver)
+        return os.path.join(Shader.cache_dir,
+                            hashlib.sha1(key).hexdigest() + '.bin')
+
+    def _load_binary(self, filename):
+        """ Load program from a binary file, return whether it succeeded """
+        if not os.path.exists(filename):
+            return False
+        data = np.fromfile(filename, dtype=np.uint8)
+        if len(data) <= 4:
+            return False
+        binary_format = int(data[:4].view(np.uint32)[0])
+        binary = data[4:]
+        gl.glProgramBinary(self.handle, binary_format, binary, len(binary))
+        if not gl.glGetProgramiv(self.handle, gl.GL_LINK_STATUS):
+            # Binary has been rejected (e.g. driver has been updated)
+            gl.glDeleteProgram(self.handle)
+            self.handle = gl.glCreateProgram()
+            return False
+        self.linked = True
+        self._introspect()
+        return True
+
+    def _save_binary(self, filename):
+        """ Save linked program into a binary file """
+        size = gl.glGetProgramiv(self.handle, gl.GL_PROGRAM_BINARY_LENGTH)
+        if not size:
+            return
+        length = np.zeros(1, dtype=np.int32)
+        binary_format = np.zeros(1, dtype=np.uint32)
+        binary = np.zeros(size, dtype=np.uint8)
+        gl.glGetProgramBinary(self.handle, size, length, binary_format, binary)
+        if not os.path.isdir(Shader.cache_dir):
+            os.makedirs(Shader.cache_dir)
+        # Written aside then renamed such that concurrent processes never
+        # read a partial file
+        fd, temp = tempfile.mkstemp(dir=Shader.cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(binary_format.tostring())
+            f.write(binary[:length[0]].tostring())
+        os.rename(temp, filename)
 
     def _build_shader(self, strings, shader_type):
         count = len(strings)
@@ -80,6 +191,39 @@ class Shader:
             raise(ShaderException, 'Linking error' )
         else:
             self.linked = True
+            self._introspect()
+
+    def _introspect(self):
+        """ Get locations of all active uniforms and attributes """
+        Shader._programs[self.handle] = self
+        self.uniforms = {}
+        self.attributes = {}
+        self._values = {}
+        count = gl.glGetProgramiv(self.handle, gl.GL_ACTIVE_UNIFORMS)
+        for i in range(count):
+            name, size, gtype = gl.glGetActiveUniform(self.handle, i)
+            # Arrays are reported as their first element
+            name = name.split('[')[0]
+            self.uniforms[name] = gl.glGetUniformLocation(self.handle, name)
+        count = gl.glGetProgramiv(self.handle, gl.GL_ACTIVE_ATTRIBUTES)
+        for i in range(count):
+            name, size, gtype = gl.glGetActiveAttrib(self.handle, i)
+            self.attributes[name] = gl.glGetAttribLocation(self.handle, name)
+
+    def _location(self, name, value):
+        """
+        Location of a uniform if value differs from the last one sent, None
+        otherwise (or if uniform is not active).
+        """
+        if not self.handle: self.build()
+        loc = self.uniforms.get(name, -1)
+        if loc == -1:
+            return None
+        last = self._values.get(name)
+        if last is not None and np.array_equal(last, value):
+            return None
+        self._values[name] = np.array(value)
+        return loc
 
     def bind(self):
         if not self.handle: self.build()
@@ -90,9 +234,9 @@ class Shader:
         gl.glUseProgram(0)
 
     def uniformf(self, name, *vals):
-        if not self.handle: self.build()
-        loc = self.uniforms.get(name, gl.glGetUniformLocation(self.handle,name))
-        self.uniforms[name] = loc
+        loc = self._location(name, vals)
+        if loc is None:
+            return
         if len(vals) in range(1, 5):
             { 1 : gl.glUniform1f,
               2 : gl.glUniform2f,
@@ -101,9 +245,9 @@ class Shader:
             }[len(vals)](loc, *vals)
 
     def uniformi(self, name, *vals):
-        if not self.handle: self.build()
-        loc = self.uniforms.get(name, gl.glGetUniformLocation(self.handle,name))
-        self.uniforms[name] = loc
+        loc = self._location(name, vals)
+        if loc is None:
+            return
         if len(vals) in range(1, 5):
             { 1 : gl.glUniform1i,
               2 : gl.glUniform2i,
@@ -112,7 +256,7 @@ class Shader:
             }[len(vals)](loc, *vals)
 
     def uniform_matrixf(self, name, mat):
-        if not self.handle: self.build()
-        loc = self.uniforms.get(name, gl.glGetUniformLocation(self.handle,name))
-        self.uniforms[name] = loc
+        loc = self._location(name, mat)
+        if loc is None:
+            return
         gl.glUniformMatrix4fv(loc, 1, False, mat)
@@ -33,8 +33,7 @@ const float THETA = 15.0 * 3.14159265358979323846264/180.0;
 // Uniforms
 // ------------------------------------
 uniform mat4      u_M, u_V, u_P, u_N;
-uniform sampler2D u_uniforms;
-uniform vec2      u_uniforms_shape;
+// u_uniforms and fetch_uniform() are declared by the collection
 
 // Attributes
 // ------------------------------------
@@ -56,35 +55,33 @@ varying float v_dash_index;
 varying vec2  v_dash_caps;
 void main()
 {
-    // Extract uniforms from uniform texture
-    float size = u_uniforms_shape.x - 1.0;
+    // Extract uniforms from uniform storage
     int i = 0;
-    float index = a_index/(u_uniforms_shape.y-1.0);
     vec4 _uniform;
 
     // Get fg_color(4)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_fg_color = _uniform;
 
     // Get bg_color(4)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_bg_color = _uniform;
 
     // Get translate(2), scale(1), rotate(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     vec2  translate = _uniform.xy;
     float scale     = _uniform.z;
     float theta     = _uniform.w;
 
     // Get linewidth(1), antialias(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_radius     = _uniform.x;
     v_linewidth  = _uniform.y;
     v_antialias  = _uniform.z;
     v_dash_phase = _uniform.w;
 
     // Get dash_period(1), dash_index(1), dash_caps(2)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_dash_period = _uniform.x;
     v_dash_index  = _uniform.y;
     v_dash_caps   = _uniform.wz;
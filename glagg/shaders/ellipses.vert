@@ -30,8 +30,7 @@
 // Uniforms
 // ------------------------------------
 uniform mat4      u_M, u_V, u_P, u_N;
-uniform sampler2D u_uniforms;
-uniform vec2      u_uniforms_shape;
+// u_uniforms and fetch_uniform() are declared by the collection
 
 // Attributes
 // ------------------------------------
@@ -48,24 +47,22 @@ varying float v_linewidth;
 varying float v_antialias;
 void main()
 {
-    // Extract uniforms from uniform texture
-    float size = u_uniforms_shape.x - 1.0;
+    // Extract uniforms from uniform storage
     int i = 0;
-    float index = a_index/(u_uniforms_shape.y-1.0);
     vec4 _uniform;
 
     // Get color(4)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_color = _uniform;
 
     // Get translate(2), scale(1), rotate(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     vec2  translate = _uniform.xy;
     float scale     = _uniform.z;
     float theta     = _uniform.w;
 
     // Get radius(2), linewidth(1), antialias(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_radius     = _uniform.xy;
     v_linewidth  = _uniform.z;
     v_antialias  = _uniform.w;
@@ -30,8 +30,7 @@
 // Uniforms
 // ------------------------------------
 uniform mat4      u_M, u_V, u_P, u_N;
-uniform sampler2D u_uniforms;
-uniform vec2      u_uniforms_shape;
+// u_uniforms and fetch_uniform() are declared by the collection
 
 uniform sampler2D u_gbuffer;
 uniform vec2      u_gbuffer_shape;
@@ -71,10 +70,8 @@ varying vec2  v_minor_dash_caps;
 varying float v_antialias;
 void main()
 {
-    // Extract uniforms from uniform texture
-    float size = (u_uniforms_shape.x - 1.0);
+    // Extract uniforms from uniform storage
     int i = 0;
-    float index = a_index/(u_uniforms_shape.y-1.0);
 
     // gbuffer index is also ubuffer index
     v_gindex = a_index/(u_gbuffer_shape.y-1.0);
@@ -82,61 +79,61 @@ void main()
     vec4 _uniform;
 
     // Get translate(2), scale(1), rotate(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     vec2  translate = _uniform.xy;
     float scale     = _uniform.z;
     float theta     = _uniform.w;
 
     // Get major_grid(2), minor_grid(2)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_major_grid = _uniform.xy;
     v_minor_grid = _uniform.zw;
 
     // Get major_tick_size(2), minor_tick_size(2)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_major_tick_size = _uniform.xy;
     v_minor_tick_size = _uniform.zw;
 
     // Get major_grid_color(4)
-    v_major_grid_color = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    v_major_grid_color = fetch_uniform(a_index, i++);
 
     // Get minor_grid_color(4)
-    v_minor_grid_color = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    v_minor_grid_color = fetch_uniform(a_index, i++);
 
     // Get major_tick_color(4)
-    v_major_tick_color = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    v_major_tick_color = fetch_uniform(a_index, i++);
 
     // Get minor_tick_color(4)
-    v_minor_tick_color = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    v_minor_tick_color = fetch_uniform(a_index, i++);
 
     // Get major_grid_width(1), minor_grid_width(1),
     //     major_tick_width(1), minor_tick_width(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_major_grid_width = _uniform.x;
     v_minor_grid_width = _uniform.y;
     v_major_tick_width = _uniform.z;
     v_minor_tick_width = _uniform.w;
 
     // Get size(2), offset(2)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_size    = _uniform.xy;
     // v_offset  = _uniform.zw;
 
     // Get zoom(1), antialias(1), major_dash_phase(1), minoir_dash_phase(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     // v_zoom = _uniform.x;
     v_antialias         = _uniform.y;
     v_major_dash_phase  = _uniform.z;
     v_minor_dash_phase  = _uniform.w;
 
     // Get major_dash_index, major_dash_period(1), major_dash_caps(2)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_major_dash_index  = _uniform.x;
     v_major_dash_period = _uniform.y;
     v_major_dash_caps   = _uniform.zw;
 
     // Get minor_dash_index, minor_dash_period(1), minor_dash_caps(2)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_minor_dash_index  = _uniform.x;
     v_minor_dash_period = _uniform.y;
     v_minor_dash_caps   = _uniform.zw;
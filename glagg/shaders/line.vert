@@ -40,8 +40,7 @@ void rotate( in vec2 v, in float alpha, out vec2 result )
 // Uniforms
 // ------------------------------------
 uniform mat4      u_M, u_V, u_P, u_N;
-uniform sampler2D u_uniforms;
-uniform vec2      u_uniforms_shape;
+// u_uniforms and fetch_uniform() are declared by the collection
 
 // Attributes
 // ------------------------------------
@@ -64,40 +63,38 @@ varying float v_dash_index;
 varying vec2  v_dash_caps;
 void main()
 {
-    // Extract uniforms from uniform texture
-    float size = u_uniforms_shape.x - 1.0;
-    float index = a_index/(u_uniforms_shape.y-1.0);
+    // Extract uniforms from uniform storage
     int i = 0;
     vec4 _uniform;
 
     // Get color(4)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_color = _uniform;
 
     // If color is fully transparent we just will discard the fragment later
     if( v_color.a <= 0.0 ) { gl_Position = vec4(0.0,0.0,0.0,1.0);  return; }
 
     // Get translate(2), scale(1), rotate(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     vec2  translate = _uniform.xy;
     float scale     = _uniform.z;
     float theta     = _uniform.w;
 
     // Get linewidth(1), antialias(1), linecaps(2)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_linewidth = _uniform.x;
     v_antialias = _uniform.y;
     v_linecaps  = _uniform.zw;
 
     // Get dash_phase(1) dash_period(1), dash_index(1), dash_caps(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_dash_phase  = _uniform.x;
     v_dash_period = _uniform.y;
     v_dash_index  = _uniform.z;
     v_dash_caps.x = _uniform.w;
 
     // Get dash_caps(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_dash_caps.y   = _uniform.x;
 
     // Thickness below 1 pixel are represented using a 1 pixel thickness
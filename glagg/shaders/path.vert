@@ -56,8 +56,7 @@ void rotate( in vec2 v, in float alpha, out vec2 result )
 // Uniforms
 // ------------------------------------
 uniform mat4      u_M, u_V, u_P, u_N;
-uniform sampler2D u_uniforms;
-uniform vec2      u_uniforms_shape;
+// u_uniforms and fetch_uniform() are declared by the collection
 
 // Attributes
 // ------------------------------------
@@ -88,43 +87,41 @@ varying vec2  v_dash_caps;
 varying float v_closed;
 void main()
 {
-    // Extract uniforms from uniform texture
-    float size = u_uniforms_shape.x - 1.0;
-    float index = a_index/(u_uniforms_shape.y-1.0);
+    // Extract uniforms from uniform storage
     int i = 0;
     vec4 _uniform;
 
     // Get color(4)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_color = _uniform;
 
     // Get translate(2), scale(1), rotate(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     vec2  translate = _uniform.xy;
     float scale     = _uniform.z;
     float theta     = _uniform.w;
 
     // Get linewidth(1), antialias(1), linecaps(2)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_linewidth = _uniform.x;
     v_antialias = _uniform.y;
     v_linecaps  = _uniform.zw;
 
     // Get linejoin(1), miterlimit(1), length(1), dash_phase(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_linejoin    = _uniform.x;
     v_miter_limit = _uniform.y;
     v_length      = _uniform.z;
     v_dash_phase  = _uniform.w;
 
     // Get dash_period(1), dash_index(1), dash_caps(2)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_dash_period = _uniform.x;
     v_dash_index  = _uniform.y;
     v_dash_caps   = _uniform.zw;
 
     // Get closed(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_closed = _uniform.x;
     bool closed = (v_closed > 0.0);
 
@@ -141,8 +141,6 @@ const float glow_center    = 1.25;
 uniform mat4      u_M, u_V, u_P, u_N;
 uniform sampler2D u_font_atlas;
 uniform vec2      u_font_atlas_shape;
-uniform sampler2D u_uniforms;
-uniform vec2      u_uniforms_shape;
 uniform sampler1D u_filter_lut;
 
 // Varying
@@ -32,8 +32,7 @@
 uniform mat4      u_M, u_V, u_P, u_N;
 uniform sampler2D u_font_atlas;
 uniform vec2      u_font_atlas_shape;
-uniform sampler2D u_uniforms;
-uniform vec2      u_uniforms_shape;
+// u_uniforms and fetch_uniform() are declared by the collection
 uniform sampler1D u_kernel;
 
 // Attributes
@@ -49,21 +48,19 @@ varying vec2  v_texcoord;
 varying vec4  v_color;
 void main()
 {
-    // Extract uniforms from uniform texture
-    float size = u_uniforms_shape.x - 1.0;
-    float index = a_index/(u_uniforms_shape.y-1.0);
+    // Extract uniforms from uniform storage
     int i = 0;
     vec4 _uniform;
 
     // Get color(4)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     v_color = _uniform;
 
     // If color is fully transparent we just will discard the fragment later
     if( v_color.a <= 0.0 ) { gl_Position = vec4(0.0,0.0,0.0,1.0);  return; }
 
     // Get translate(2), scale(1), rotate(1)
-    _uniform = texture2D(u_uniforms, vec2(float(i++)/size,index));
+    _uniform = fetch_uniform(a_index, i++);
     vec2  translate = _uniform.xy;
     float scale     = _uniform.z;
     float theta     = _uniform.w;
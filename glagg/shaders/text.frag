@@ -32,8 +32,6 @@
 uniform mat4      u_M, u_V, u_P, u_N;
 uniform sampler2D u_font_atlas;
 uniform vec3      u_font_atlas_shape;
-uniform sampler2D u_uniforms;
-uniform vec2      u_uniforms_shape;
 
 
 // Varying
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (C) 2013 Nicolas P. Rougier. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY NICOLAS P. ROUGIER ''AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL NICOLAS P. ROUGIER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of Nicolas P. Rougier.
+# -----------------------------------------------------------------------------
+"""
+SVG path parsing.
+
+Path data of a whole document is parsed at once: commands are extracted by a
+single regular expression pass and all numbers are converted by numpy in a
+single call such that parsing produces command and coordinate arrays that
+can be fed to a Path (and its batched curve flattening) with no further
+string processing.
+
+>>> commands, values, offsets = parse('M 0,0 l 10-5 H.5e1z')
+>>> print commands
+['M' 'l' 'H' 'z']
+>>> print values
+[  0.   0.  10.  -5.   5.]
+>>> print offsets
+[0 2 4 5 5]
+"""
+import re
+import numpy as np
+from path import Path
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+
+# Command letters and path separator (|)
+_command_re = re.compile(r'[MmZzLlHhVvCcSsQqTtAa|]')
+
+# Numbers whose fractional part is directly followed by another number (.5.5)
+_fraction_re = re.compile(r'(\.[0-9]+)(?=\.)')
+
+# Elliptical arc commands and their arguments, whose flags (single 0 or 1) may
+# not be separated from what follows (a 10 10 0 0150 50)
+_arc_re = re.compile(r'([Aa])([^MmZzLlHhVvCcSsQqTtAa|]*)')
+_number = r'[\s,]*([-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?)'
+_flag = r'[\s,]*([01])'
+_arc_args_re = re.compile(3*_number + 2*_flag + 2*_number)
+
+# Number of values of each command (indexed by command character code)
+_arity = np.zeros(128, dtype=int)
+for _command, _count in zip('MLHVCSQTA', (2,2,1,1,6,4,4,2,7)):
+    _arity[ord(_command)] = _arity[ord(_command.lower())] = _count
+
+
+# -----------------------------------------------------------------------------
+def iterpaths(filename):
+    """
+    Iterate over path data (d attribute) of all path elements of a SVG file,
+    without building the document tree.
+    """
+    for event, element in ElementTree.iterparse(filename):
+        if element.tag == 'path' or element.tag.endswith('}path'):
+            data = element.get('d')
+            if data:
+                yield data
+        element.clear()
+
+
+# -----------------------------------------------------------------------------
+def _split_arc(match):
+    """ Separate arguments of an elliptical arc command (see _arc_re) """
+    args, pos, values = match.group(2), 0, []
+    while args[pos:].strip(' \t\r\n,'):
+        arg = _arc_args_re.match(args, pos)
+        if arg is None:
+            return match.group(0)
+        values.extend(arg.groups())
+        pos = arg.end()
+    return match.group(1) + ' ' + ' '.join(values) + ' '
+
+
+# -----------------------------------------------------------------------------
+def parse(data, flip=False):
+    """
+    Parse SVG path data.
+
+    Parameters
+    ----------
+
+    data : str
+        Path data. Several paths can be given at once, separated by '|'.
+
+    flip : bool
+        Whether to flip the y axis
+
+    Returns
+    -------
+
+    commands, values, offsets where values of the command i are
+    values[offsets[i]:offsets[i+1]]. Path separators are returned as '|'
+    commands.
+
+    Raises ValueError if data is not made of commands each followed by a
+    (non null) multiple of its number of values.
+    """
+
+    if not data.strip(' \t\r\n,'):
+        return np.zeros(0, dtype='S1'), np.zeros(0), np.zeros(1, dtype=int)
+    if 'a' in data or 'A' in data:
+        data = _arc_re.sub(_split_arc, data)
+
+    # Commands are replaced by NaN and numbers are separated by blanks such
+    # that numpy can convert all of them at once.
+    commands = np.array(_command_re.findall(data), dtype='S1')
+    data = _command_re.sub(' nan ', data).replace(',', ' ')
+    data = data.replace('-', ' -').replace('e -', 'e-').replace('E -', 'E-')
+    data = data.replace('+', ' +').replace('e +', 'e+').replace('E +', 'E+')
+    if _fraction_re.search(data):
+        data = _fraction_re.sub(r'\1 ', data)
+    values = np.fromstring(data, sep=' ')
+
+    # Number of values before each command
+    command = np.isnan(values)
+    index = np.nonzero(command)[0]
+    if len(index) != len(commands):
+        raise ValueError('Invalid path data')
+    values = values[~command]
+    offsets = np.zeros(len(commands)+1, dtype=int)
+    offsets[:-1] = index - np.arange(len(index))
+    offsets[-1] = len(values)
+    arity = _arity[commands.view(np.uint8)]
+    sizes = np.diff(offsets)
+    if offsets[0] or (sizes % np.maximum(arity, 1)).any() or \
+       ((sizes == 0) != (arity == 0)).any():
+        raise ValueError('Invalid path data')
+
+    if flip and len(values):
+        name = np.repeat(np.char.upper(commands), sizes)
+        rank = np.arange(len(values)) - np.repeat(offsets[:-1], sizes)
+        y = (name == 'V') | ((name != 'H') & (name != 'A') & (rank % 2 == 1))
+        arc = name == 'A'
+        y |= arc & ((rank % 7 == 2) | (rank % 7 == 6))
+        values[y] = -values[y]
+        sweep = arc & (rank % 7 == 4)
+        values[sweep] = 1 - values[sweep]
+
+    return commands, values, offsets
+
+
+# -----------------------------------------------------------------------------
+def load(filename, approximation=None, flip=False):
+    """
+    Load all paths of a SVG file into a single Path (one sub-path per SVG
+    sub-path). Transforms and styles are ignored.
+
+    Parameters
+    ----------
+
+    filename : str
+        SVG filename
+
+    approximation : Approximation
+        Approximation parameters used to flatten curves
+
+    flip : bool
+        Whether to flip the y axis
+    """
+
+    commands, values, offsets = parse('|'.join(iterpaths(filename)), flip)
+    path = Path(approximation)
+    for i, cmd in enumerate(commands):
+        if cmd != '|':
+            path.svg_parse(cmd, values[offsets[i]:offsets[i+1]])
+        else:
+            # Each path starts at the origin (a leading moveto is absolute
+            # even if relative)
+            path.current = (0.0, 0.0)
+    return path
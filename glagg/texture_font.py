@@ -32,6 +32,7 @@
 import os
 import numpy as np
 from freetype import *
+from glagg.face_cache import FaceCache
 
 
 # -----------------------------------------------------------------------------
@@ -42,7 +43,7 @@ class TextureGlyph:
     Font.
     '''
 
-    def __init__(self, charcode, size, offset, advance, texcoords):
+    def __init__(self, charcode, size, offset, advance, texcoords, font=None):
         '''
         Build a new texture glyph
 
@@ -63,12 +64,16 @@ class TextureGlyph:
 
         texcoords: tuple of 4 floats
             Texture coordinates of bottom-left and top-right corner
+
+        font: TextureFont
+            Font the glyph belongs to, used to compute kerning
         '''
         self.charcode = charcode
         self.size = size
         self.offset = offset
         self.advance = advance
         self.texcoords = texcoords
+        self.font = font
         self.kerning = {}
 
 
@@ -81,10 +86,13 @@ class TextureGlyph:
         charcode: char
             Character preceding this glyph
         '''
-        if charcode in self.kerning.keys():
-            return self.kerning[charcode]
-        else:
-            return 0
+        # Kerning is computed on first use of each pair
+        if charcode not in self.kerning:
+            kerning = 0
+            if charcode is not None and self.font is not None:
+                kerning = self.font.get_kerning(charcode, self.charcode)
+            self.kerning[charcode] = kerning
+        return self.kerning[charcode]
 
 
 # -----------------------------------------------------------------------------
@@ -94,7 +102,7 @@ class TextureFont:
     and size.
     '''
 
-    def __init__(self, filename, size, atlas):
+    def __init__(self, filename, size, atlas, faces=None):
         '''
         Initialize font
 
@@ -109,18 +117,25 @@ class TextureFont:
         
         size : float
             Font size
+
+        faces: FaceCache
+            Cache of FreeType faces (possibly shared with other fonts)
         '''
 
         self.atlas = atlas
         self.filename = filename
         self.size = size
         self.glyphs = {}
-        face = Face( self.filename )
-        face.set_char_size( int(self.size*64))
-        metrics = face.size
-        self.ascender  = metrics.ascender/64.0
-        self.descender = metrics.descender/64.0
-        self.height    = metrics.height/64.0
+        if faces is None:
+            faces = FaceCache()
+        self.faces = faces
+        with faces.lock:
+            face = faces.get( self.filename, self.size )
+            metrics = face.size
+            self.ascender  = metrics.ascender/64.0
+            self.descender = metrics.descender/64.0
+            self.height    = metrics.height/64.0
+            self.has_kerning = face.has_kerning
         self.linegap   = self.height - self.ascender + self.descender
         self.depth     = self.atlas.depth
         set_lcd_filter(FT_LCD_FILTER_LIGHT)
@@ -135,6 +150,29 @@ class TextureFont:
         return self.glyphs[charcode]
 
 
+    def get_kerning(self, left, right):
+        '''
+        Get kerning between two characters (0 if font has no kerning).
+
+        Parameters:
+        -----------
+
+        left: char
+            Left character of the pair
+
+        right: char
+            Right character of the pair
+        '''
+        if not self.has_kerning:
+            return 0
+        # 64 * 64 because of 26.6 encoding AND the horizontal resolution used
+        # in load (hres = 64)
+        with self.faces.lock:
+            face = self.faces.get( self.filename, self.size, 64 )
+            kerning = face.get_kerning(left, right, mode=FT_KERNING_UNFITTED)
+        return kerning.x/(64.0*64)
+
+
  
     def load(self, charcodes = ''):
         '''
@@ -146,66 +184,51 @@ class TextureFont:
         charcodes: [str | unicode]
             Set of characters to be represented
         '''
-        face = Face( self.filename )
-        pen = Vector(0,0)
-        hres = 64
-        hscale = 1.0/64
-        face.set_char_size( int(self.size * 64), 0, hres*72, 72 )
-        matrix = Matrix( int((hscale) * 0x10000L), int((0.0) * 0x10000L),
-                         int((0.0)    * 0x10000L), int((1.0) * 0x10000L) )
-
-        for charcode in charcodes:
-            face.set_transform( matrix, pen )
-            if charcode in self.glyphs.keys():
-                continue
-            self.atlas._dirty = True
-            flags = FT_LOAD_RENDER | FT_LOAD_FORCE_AUTOHINT
-            if self.depth == 3:
-                flags |= FT_LOAD_TARGET_LCD
-
-            face.load_char( charcode, flags )
-            bitmap = face.glyph.bitmap
-            left   = face.glyph.bitmap_left
-            top    = face.glyph.bitmap_top
-            width  = face.glyph.bitmap.width
-            rows   = face.glyph.bitmap.rows
-            pitch  = face.glyph.bitmap.pitch
-
-            x,y,w,h = self.atlas.get_region(width/self.depth+2, rows+2)
-            if x < 0:
-                print 'Missed !'
-                continue
-            x,y = x+1, y+1
-            w,h = w-2, h-2
-            data = np.array(bitmap.buffer).reshape(rows,pitch)
-            data = (data[:,:width].astype(np.ubyte))
-            data = data.reshape(rows,width/self.depth,self.depth)
-            self.atlas.set_region((x,y,w,h), data)
-
-            # Build glyph
-            size   = w,h
-            offset = left, top
-            advance= face.glyph.advance.x, face.glyph.advance.y
-
-            u0     = (x +     0.0)/float(self.atlas.width)
-            v0     = (y +     0.0)/float(self.atlas.height)
-            u1     = (x + w - 0.0)/float(self.atlas.width)
-            v1     = (y + h - 0.0)/float(self.atlas.height)
-            texcoords = (u0,v0,u1,v1)
-            glyph = TextureGlyph(charcode, size, offset, advance, texcoords)
-            self.glyphs[charcode] = glyph
-
-            # Generate kerning
-            for g in self.glyphs.values():
-                # 64 * 64 because of 26.6 encoding AND the transform matrix used
-                # in texture_font_load_face (hres = 64)
-                kerning = face.get_kerning(g.charcode, charcode, mode=FT_KERNING_UNFITTED)
-                if kerning.x != 0:
-                    glyph.kerning[g.charcode] = kerning.x/(64.0*hres)
-                kerning = face.get_kerning(charcode, g.charcode, mode=FT_KERNING_UNFITTED)
-                if kerning.x != 0:
-                    g.kerning[charcode] = kerning.x/(64.0*hres)
-            # High resolution advance.x calculation
-            # gindex = face.get_char_index( charcode )
-            # a = face.get_advance(gindex, FT_LOAD_RENDER | FT_LOAD_TARGET_LCD)/(64*72)
-            # glyph.advance = a, glyph.advance[1]
+        # Glyphs are rendered with a 1/64 pixel horizontal precision
+        with self.faces.lock:
+            face = self.faces.get( self.filename, self.size, 64 )
+            for charcode in charcodes:
+                if charcode in self.glyphs.keys():
+                    continue
+                self.atlas._dirty = True
+                flags = FT_LOAD_RENDER | FT_LOAD_FORCE_AUTOHINT
+                if self.depth == 3:
+                    flags |= FT_LOAD_TARGET_LCD
+
+                face.load_char( charcode, flags )
+                bitmap = face.glyph.bitmap
+                left   = face.glyph.bitmap_left
+                top    = face.glyph.bitmap_top
+                width  = face.glyph.bitmap.width
+                rows   = face.glyph.bitmap.rows
+                pitch  = face.glyph.bitmap.pitch
+
+                x,y,w,h = self.atlas.get_region(width/self.depth+2, rows+2)
+                if x < 0:
+                    print 'Missed !'
+                    continue
+                x,y = x+1, y+1
+                w,h = w-2, h-2
+                data = np.array(bitmap.buffer).reshape(rows,pitch)
+                data = (data[:,:width].astype(np.ubyte))
+                data = data.reshape(rows,width/self.depth,self.depth)
+                self.atlas.set_region((x,y,w,h), data)
+
+                # Build glyph
+                size   = w,h
+                offset = left, top
+                advance= face.glyph.advance.x, face.glyph.advance.y
+
+                u0     = (x +     0.0)/float(self.atlas.width)
+                v0     = (y +     0.0)/float(self.atlas.height)
+                u1     = (x + w - 0.0)/float(self.atlas.width)
+                v1     = (y + h - 0.0)/float(self.atlas.height)
+                texcoords = (u0,v0,u1,v1)
+                glyph = TextureGlyph(charcode, size, offset, advance,
+                                     texcoords, self)
+                self.glyphs[charcode] = glyph
+
+                # High resolution advance.x calculation
+                # gindex = face.get_char_index( charcode )
+                # a = face.get_advance(gindex, FT_LOAD_RENDER | FT_LOAD_TARGET_LCD)/(64*72)
+                # glyph.advance = a, glyph.advance[1]
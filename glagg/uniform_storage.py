@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (C) 2013 Nicolas P. Rougier. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY NICOLAS P. ROUGIER ''AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL NICOLAS P. ROUGIER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of Nicolas P. Rougier.
+# -----------------------------------------------------------------------------
+"""
+A uniform storage holds the uniforms of all items of a collection on the GPU,
+each item having the same number of float RGBA (vec4) values. The storage
+provides the GLSL code declaring how a vertex shader fetches them::
+
+    vec4 fetch_uniform(float index, int i)
+
+which returns the i-th vec4 of the item at the given (uniform) index.
+
+Three storages are available:
+
+* UniformTexture: a 2D texture with one row per item, which limits the number
+  of items to GL_MAX_TEXTURE_SIZE.
+
+* WrappedUniformTexture: a 2D texture of fixed width where items are stored
+  one after the other, wrapping at the end of each row.
+
+* UniformTextureBuffer: a texture buffer object (GL_EXT_texture_buffer_object
+  and GL_EXT_gpu_shader4), updated through glBufferSubData.
+
+Data is uploaded from a DynamicBuffer: storage is allocated at buffer capacity
+and only dirty ranges are uploaded afterwards.
+"""
+import numpy as np
+import OpenGL.GL as gl
+from vertex_buffer import upload_buffer
+
+
+# -----------------------------------------------------------------------------
+class UniformTexture(object):
+    """
+    Uniforms stored in a float RGBA 2D texture, one row per item.
+    """
+
+    target = gl.GL_TEXTURE_2D
+
+    code = """
+uniform sampler2D u_uniforms;
+uniform vec2      u_uniforms_shape;
+vec4 fetch_uniform(float index, int i)
+{
+    vec2 size = u_uniforms_shape - 1.0;
+    return texture2D(u_uniforms, vec2(float(i)/size.x, index/size.y));
+}
+"""
+
+    # ---------------------------------
+    def __init__(self, count):
+        """
+        Create a new uniform storage.
+
+        Parameters
+        ----------
+
+        count: int
+            Number of vec4 per item
+        """
+        self.count = count
+        self.id = 0
+        self.shape = [0, 4*count]
+
+
+    # ---------------------------------
+    def _create(self):
+        """ Create texture (nearest filtering, no mipmaps) """
+        self.id = gl.glGenTextures(1)
+        gl.glBindTexture( gl.GL_TEXTURE_2D, self.id )
+        gl.glPixelStorei( gl.GL_UNPACK_ALIGNMENT, 1 )
+        gl.glPixelStorei( gl.GL_PACK_ALIGNMENT, 1 )
+        gl.glTexParameterf( gl.GL_TEXTURE_2D,
+                            gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST )
+        gl.glTexParameterf( gl.GL_TEXTURE_2D,
+                            gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST )
+        gl.glTexParameterf( gl.GL_TEXTURE_2D,
+                            gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE )
+        gl.glTexParameterf( gl.GL_TEXTURE_2D,
+                            gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE )
+        gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_BASE_LEVEL, 0)
+        gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAX_LEVEL, 0)
+
+
+    # ---------------------------------
+    def upload(self, buffer):
+        """
+        Upload dirty rows of a dynamic buffer (one row per element). Texture
+        storage is reallocated only when it has not enough rows.
+        """
+
+        data = buffer.data
+        rows, width = len(data), self.shape[1]//4
+        if not self.id:
+            self._create()
+
+        gl.glBindTexture( gl.GL_TEXTURE_2D, self.id )
+        if rows > self.shape[0]:
+            storage = buffer.storage
+            self.shape[0] = len(storage)
+            gl.glTexImage2D( gl.GL_TEXTURE_2D, 0, gl.GL_RGBA32F, width, self.shape[0],
+                             0, gl.GL_RGBA, gl.GL_FLOAT, storage.view(np.float32) )
+        else:
+            for start, stop in buffer.dirty_ranges:
+                gl.glTexSubImage2D( gl.GL_TEXTURE_2D, 0, 0, start, width, stop-start,
+                                    gl.GL_RGBA, gl.GL_FLOAT,
+                                    data[start:stop].view(np.float32) )
+        buffer.clean()
+
+
+    # ---------------------------------
+    def activate(self, shader, unit=0, name='u_uniforms'):
+        """ Bind storage to a texture unit and set shader uniforms """
+        gl.glActiveTexture( gl.GL_TEXTURE0 + unit )
+        gl.glBindTexture( self.target, self.id )
+        self.setup( shader, unit, name )
+
+
+    # ---------------------------------
+    def setup(self, shader, unit=0, name='u_uniforms'):
+        """ Set shader uniforms (storage being bound to given unit) """
+        shader.uniformi( name, unit )
+        shader.uniformf( name+'_shape', self.shape[1]//4, self.shape[0] )
+
+
+
+# -----------------------------------------------------------------------------
+class WrappedUniformTexture(UniformTexture):
+    """
+    Uniforms stored in a float RGBA 2D texture of fixed width, items being
+    stored one after the other and wrapped at the end of each row. Number of
+    items is limited by the number of texels and by float precision of texel
+    indices in the shader (2^24).
+    """
+
+    code = """
+uniform sampler2D u_uniforms;
+uniform vec3      u_uniforms_shape;
+vec4 fetch_uniform(float index, int i)
+{
+    float t = index*u_uniforms_shape.z + float(i);
+    float y = floor((t+0.5)/u_uniforms_shape.x);
+    float x = t - y*u_uniforms_shape.x;
+    return texture2D(u_uniforms, (vec2(x,y)+0.5)/u_uniforms_shape.xy);
+}
+"""
+
+    # ---------------------------------
+    def __init__(self, count, width=1024):
+        """
+        Create a new uniform storage.
+
+        Parameters
+        ----------
+
+        count: int
+            Number of vec4 per item
+
+        width: int
+            Texture width (in texels)
+        """
+        UniformTexture.__init__(self, count)
+        self.width = width
+        self.shape = [0, 4*width]
+
+
+    # ---------------------------------
+    def _rows(self, storage, start, stop):
+        """ Rows [start,stop[ of storage as (zero padded) texels """
+        texels = storage.view(np.float32).reshape(-1,4)
+        texels = texels[start*self.width:stop*self.width]
+        size, count = (stop-start)*self.width, len(texels)
+        if count < size:
+            texels = np.resize(texels, (size,4))
+            texels[count:] = 0
+        return texels
+
+
+    # ---------------------------------
+    def upload(self, buffer):
+        """
+        Upload texture rows covering dirty ranges of a dynamic buffer. Texture
+        storage is reallocated only when it has not enough rows.
+        """
+
+        data = buffer.data
+        count, width = self.count, self.width
+        rows = (len(data)*count + width - 1)//width
+        if not self.id:
+            self._create()
+
+        gl.glBindTexture( gl.GL_TEXTURE_2D, self.id )
+        storage = buffer.storage
+        if rows > self.shape[0]:
+            self.shape[0] = (len(storage)*count + width - 1)//width
+            gl.glTexImage2D( gl.GL_TEXTURE_2D, 0, gl.GL_RGBA32F, width, self.shape[0],
+                             0, gl.GL_RGBA, gl.GL_FLOAT,
+                             self._rows(storage, 0, self.shape[0]) )
+        else:
+            for start, stop in buffer.dirty_ranges:
+                start = (start*count)//width
+                stop = (stop*count + width - 1)//width
+                gl.glTexSubImage2D( gl.GL_TEXTURE_2D, 0, 0, start, width, stop-start,
+                                    gl.GL_RGBA, gl.GL_FLOAT,
+                                    self._rows(storage, start, stop) )
+        buffer.clean()
+
+
+    # ---------------------------------
+    def setup(self, shader, unit=0, name='u_uniforms'):
+        """ Set shader uniforms (storage being bound to given unit) """
+        shader.uniformi( name, unit )
+        shader.uniformf( name+'_shape', self.width, self.shape[0], self.count )
+
+
+
+# -----------------------------------------------------------------------------
+class UniformTextureBuffer(object):
+    """
+    Uniforms stored in a buffer object accessed through a float RGBA buffer
+    texture.
+    """
+
+    target = gl.GL_TEXTURE_BUFFER
+
+    code = """
+#extension GL_EXT_gpu_shader4 : require
+uniform samplerBuffer u_uniforms;
+uniform float         u_uniforms_count;
+vec4 fetch_uniform(float index, int i)
+{
+    return texelFetchBuffer(u_uniforms, int(index)*int(u_uniforms_count) + i);
+}
+"""
+
+    # ---------------------------------
+    def __init__(self, count):
+        """
+        Create a new uniform storage.
+
+        Parameters
+        ----------
+
+        count: int
+            Number of vec4 per item
+        """
+        self.count = count
+        self.id = 0
+        self.buffer_id = 0
+        self.size = 0
+
+
+    # ---------------------------------
+    def upload(self, buffer):
+        """
+        Upload dirty ranges of a dynamic buffer into the buffer object, whose
+        storage is reallocated only when it is too small.
+        """
+
+        size = self.size
+        self.buffer_id, self.size = upload_buffer(
+            gl.GL_TEXTURE_BUFFER, self.buffer_id, buffer, self.size )
+        if not self.id:
+            self.id = gl.glGenTextures(1)
+        if self.size != size:
+            gl.glBindTexture( gl.GL_TEXTURE_BUFFER, self.id )
+            gl.glTexBuffer( gl.GL_TEXTURE_BUFFER, gl.GL_RGBA32F, self.buffer_id )
+            gl.glBindTexture( gl.GL_TEXTURE_BUFFER, 0 )
+
+
+    # ---------------------------------
+    def activate(self, shader, unit=0, name='u_uniforms'):
+        """ Bind storage to a texture unit and set shader uniforms """
+        gl.glActiveTexture( gl.GL_TEXTURE0 + unit )
+        gl.glBindTexture( self.target, self.id )
+        self.setup( shader, unit, name )
+
+
+    # ---------------------------------
+    def setup(self, shader, unit=0, name='u_uniforms'):
+        """ Set shader uniforms (storage being bound to given unit) """
+        shader.uniformi( name, unit )
+        shader.uniformf( name+'_count', self.count )
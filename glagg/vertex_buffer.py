@@ -32,6 +32,7 @@ import ctypes
 import numpy as np
 import OpenGL.GL as gl
 from dynamic_buffer import DynamicBuffer
+from shader import Shader
 
 
 # -----------------------------------------------------------------------------
@@ -43,7 +44,8 @@ class VertexAttributeException(Exception):
 # -----------------------------------------------------------------------------
 class VertexAttribute(object):
 
-    def __init__(self, name, count, gltype, stride, offset, normalized=False):
+    def __init__(self, name, count, gltype, stride, offset, normalized=False,
+                 divisor=0):
         self.index  = -1
         self.name   = name
         self.count  = count
@@ -51,18 +53,39 @@ class VertexAttribute(object):
         self.stride = stride
         self.offset = ctypes.c_void_p(offset)
         self.normalized = normalized
-
-    def enable(self):
-        if self.index == -1:
+        self.divisor = divisor
+
+    def enable(self, program=None):
+        """
+        Enable attribute within given (or current) program, reading it from
+        currently bound array buffer. Location is the one found by the shader
+        of the program if any (see Shader) or is queried otherwise.
+        """
+        if program is None:
             program = gl.glGetIntegerv( gl.GL_CURRENT_PROGRAM )
-            if not program:
-                return
+        if not program:
+            return
+        shader = Shader.from_handle( program )
+        if shader is not None:
+            self.index = shader.attributes.get( self.name, -1 )
+        else:
             self.index = gl.glGetAttribLocation( program, self.name )
-            if self.index == -1:
-                return
+        if self.index == -1:
+            return
         gl.glEnableVertexAttribArray( self.index )
         gl.glVertexAttribPointer( self.index, self.count, self.gltype,
                                   self.normalized, self.stride, self.offset )
+        if self.divisor:
+            gl.glVertexAttribDivisor( self.index, self.divisor )
+
+    def disable(self):
+        if self.index == -1:
+            return
+        # Reset divisor since attribute location may be used by another
+        # (non instanced) buffer
+        if self.divisor:
+            gl.glVertexAttribDivisor( self.index, 0 )
+        gl.glDisableVertexAttribArray( self.index )
 
 
 
@@ -73,13 +96,130 @@ class VertexBufferException(Exception):
 
 
 
+# -----------------------------------------------------------------------------
+def upload_buffer(target, buffer_id, buffer, size):
+    """
+    Upload dirty ranges of a dynamic buffer into a GPU buffer whose storage
+    (size in bytes) is reallocated only when it is too small. Storage is
+    allocated at buffer capacity such that GPU memory grows along with the
+    dynamic buffer and appends only upload the new tail.
+
+    Returns buffer id and size.
+    """
+
+    data = buffer.data
+    if not buffer_id:
+        buffer_id = gl.glGenBuffers(1)
+    gl.glBindBuffer( target, buffer_id )
+    if data.nbytes > size:
+        storage = buffer.storage
+        gl.glBufferData( target, storage, gl.GL_DYNAMIC_DRAW )
+        size = storage.nbytes
+    else:
+        itemsize = data.dtype.itemsize
+        for start, stop in buffer.dirty_ranges:
+            gl.glBufferSubData( target, start*itemsize,
+                                (stop-start)*itemsize, data[start:stop] )
+    gl.glBindBuffer( target, 0 )
+    buffer.clean()
+    return buffer_id, size
+
+
+
+# -----------------------------------------------------------------------------
+class QuadIndexBuffer(object):
+    """
+    Static index buffer for vertices grouped as quads of 4 consecutive
+    vertices, each quad being made of two triangles described by a pattern
+    of 6 indices. It is grown (by powers of two) when more quads are drawn and
+    shared by all vertex buffers using the same pattern (see get).
+    """
+
+    _buffers = {}
+
+    # ---------------------------------
+    def __init__(self, pattern):
+        self.pattern = np.array(pattern, dtype=np.uint32)
+        self.id = 0
+        self.count = 0
+
+
+    # ---------------------------------
+    @staticmethod
+    def get(pattern):
+        """ Get the index buffer shared by all buffers using pattern """
+        pattern = tuple(pattern)
+        if pattern not in QuadIndexBuffer._buffers:
+            QuadIndexBuffer._buffers[pattern] = QuadIndexBuffer(pattern)
+        return QuadIndexBuffer._buffers[pattern]
+
+
+    # ---------------------------------
+    def indices(self, vertices):
+        """ Get indices of quads made of given vertices (4 per quad) """
+        vertices = np.asarray(vertices, dtype=np.uint32).reshape(-1,4)
+        return vertices[:,self.pattern].ravel()
+
+
+    # ---------------------------------
+    def bind(self, count):
+        """ Bind index buffer, making sure it holds at least count quads """
+        if not self.id:
+            self.id = gl.glGenBuffers(1)
+        gl.glBindBuffer( gl.GL_ELEMENT_ARRAY_BUFFER, self.id )
+        if count > self.count:
+            self.count = int(2**np.ceil(np.log2(count)))
+            indices = self.indices(np.arange(4*self.count))
+            gl.glBufferData( gl.GL_ELEMENT_ARRAY_BUFFER, indices,
+                             gl.GL_STATIC_DRAW )
+
+
+    # ---------------------------------
+    def reserve(self, count):
+        """ Make sure (already bound) index buffer holds at least count quads """
+        if count > self.count:
+            self.bind(count)
+
+
+
 # -----------------------------------------------------------------------------
 class VertexBuffer(object):
 
+    # Whether attribute setup is recorded in vertex array objects (one per
+    # program and buffers). None means it is detected on first draw.
+    vertex_arrays = None
+
     # ---------------------------------
-    def __init__(self, dtype):
+    def __init__(self, dtype, lazy=False, divisor=0, normalized=(),
+                 quad=None):
+        """
+        Create a new vertex buffer.
+
+        Parameters
+        ----------
+
+        dtype: numpy dtype
+            Type of vertices, one attribute per field
+
+        lazy: bool
+            Whether deleted items are only marked as free (see DynamicBuffer)
+
+        divisor: int
+            Attribute divisor. When non zero, the buffer holds per-instance
+            attributes (see draw)
+
+        normalized: sequence of str
+            Names of (integer) fields whose values are normalized to [-1,1]
+            (signed) or [0,1] (unsigned) when accessed in shaders.
+
+        quad: sequence of 6 int
+            If given, vertices are grouped as quads of 4 consecutive vertices
+            triangulated using this pattern. No indices are stored, a static
+            index buffer shared by all such buffers is used instead (indices
+            given to append and replace are ignored).
+        """
         # Parse vertices dtype and generate attributes
-        gltypes = { 'float32': gl.GL_FLOAT,
+        gltypes = { 'float16': gl.GL_HALF_FLOAT, 'float32': gl.GL_FLOAT,
                     'float'  : gl.GL_DOUBLE, 'float64': gl.GL_DOUBLE,
                     'int8'   : gl.GL_BYTE,   'uint8'  : gl.GL_UNSIGNED_BYTE,
                     'int16'  : gl.GL_SHORT,  'uint16' : gl.GL_UNSIGNED_SHORT,
@@ -99,14 +239,23 @@ class VertexBuffer(object):
             if gtype not in gltypes.keys():
                 raise VertexBufferException('Data type not understood')
             gltype = gltypes[gtype]
-            attribute = VertexAttribute(name,count,gltype,stride,offset)
+            attribute = VertexAttribute(name,count,gltype,stride,offset,
+                                        normalized=name in normalized,
+                                        divisor=divisor)
             self._attributes.append( attribute )
             offset += dtype[name].itemsize
 
-        self._vertices = DynamicBuffer(dtype)
-        self._indices  = DynamicBuffer(np.uint32)
+        self._lazy = lazy
+        self._quad = None
+        if quad is not None:
+            self._quad = QuadIndexBuffer.get(quad)
+        self._vertices = DynamicBuffer(dtype, lazy)
+        self._indices  = DynamicBuffer(np.uint32, lazy)
         self._vertices_id = 0
         self._indices_id = 0
+        self._vertices_size = 0
+        self._indices_size = 0
+        self._vaos = {}
         self._dirty = True
 
 
@@ -131,29 +280,135 @@ class VertexBuffer(object):
 
     # ---------------------------------
     def append(self, vertices, indices):
-        vsize = len(self._vertices.data)
         vertices = np.array(vertices).astype(self._vertices.dtype)
         self._vertices.append(vertices)
-        indices = np.array(indices).astype(self._indices.dtype) + vsize
+        self._dirty = True
+        if self._quad:
+            return
+        # Vertices may have been stored in place of deleted ones (lazy buffer)
+        vstart,_ = self._vertices.range(len(self._vertices)-1)
+        indices = np.array(indices).astype(self._indices.dtype) + vstart
         self._indices.append(indices)
+
+
+    # ---------------------------------
+    def append_many(self, vertices, indices, vsizes, isizes):
+        """
+        Append several items at once.
+
+        Parameters
+        ----------
+
+        vertices: array-like
+            Concatenated vertices of all items
+
+        indices: array-like
+            Concatenated indices of all items, each one being relative to the
+            first vertex of its own item
+
+        vsizes: array-like
+            Number of vertices of each item
+
+        isizes: array-like
+            Number of indices of each item
+        """
+        vsizes = np.array(vsizes, dtype=int)
+        vstart = len(self._vertices.data)
+        vertices = np.array(vertices).astype(self._vertices.dtype)
+        self._vertices.append_many(vertices, vsizes)
+        self._dirty = True
+        if self._quad:
+            return
+        offsets = vstart + np.cumsum(vsizes) - vsizes
+        indices = np.array(indices).astype(self._indices.dtype)
+        indices += np.repeat(offsets, isizes).astype(self._indices.dtype)
+        self._indices.append_many(indices, isizes)
+
+
+    # ---------------------------------
+    def replace(self, key, vertices, indices):
+        """
+        Replace vertices and indices of an item with new ones (of any size).
+
+        Parameters
+        ----------
+
+        key: int
+            Item index
+
+        vertices: array-like
+            New vertices of the item
+
+        indices: array-like
+            New indices of the item, relative to its first vertex
+        """
+        vertices = np.array(vertices).astype(self._vertices.dtype)
+        vstart, vstop = self._vertices.range(key)
+        delta = int(len(vertices) - (vstop-vstart))
+        self._vertices.replace(key, vertices)
         self._dirty = True
+        if self._quad:
+            return
+        # Vertices may have been moved (lazy buffer)
+        vstart,_ = self._vertices.range(key)
+        indices = np.array(indices).astype(self._indices.dtype) + vstart
+        self._indices.replace(key, indices)
+
+        # Vertices of following items have been shifted (regular buffer)
+        if not self._lazy and delta:
+            _,istop = self._indices.range(key)
+            self._indices.data[istop:] += delta
+            self._indices._set_dirty_range(istop, len(self._indices.data))
 
 
     # ---------------------------------
     def __delitem__(self, key):
+        if self._quad:
+            del self._vertices[key]
+            if self._lazy and self._vertices.fragmentation > self._vertices.threshold:
+                self.compact()
+            self._dirty = True
+            return
+
+        if self._lazy:
+            del self._vertices[key]
+            del self._indices[key]
+            if self._vertices.fragmentation > self._vertices.threshold:
+                self.compact()
+            self._dirty = True
+            return
+
         vsize = len(self._vertices[key])
         _,_,dstart,_ = self._indices._get_indices(key)
         del self._vertices[key]
         del self._indices[key]
         self._indices.data[dstart:] -= vsize
+        self._indices._set_dirty_range(dstart, len(self._indices.data))
         self._dirty = True
 
 
     # ---------------------------------
     def __getitem__(self, key):
+        if self._quad:
+            items = self._vertices.items[key].reshape(-1,2)
+            return self._vertices[key], self._quad.indices(self._vertices._gather(items))
         return self._vertices[key], self._indices[key]
 
 
+    # ---------------------------------
+    def compact(self):
+        """ Reclaim space left by deleted items (lazy buffer only) """
+        remap = self._vertices.compact()
+        if self._quad:
+            self._dirty = self._dirty or remap is not None
+            return
+        self._indices.compact()
+        if remap is not None:
+            indices = self._indices.data
+            indices[...] = remap[indices]
+            self._dirty = True
+
+
     # ---------------------------------
     def __len__(self):
         return len(self.vertices)
@@ -165,31 +420,136 @@ class VertexBuffer(object):
         if not self._dirty:
             return
 
-        if not self._vertices_id:
-            self._vertices_id = gl.glGenBuffers(1)
+        self._vertices_id, self._vertices_size = upload_buffer(
+            gl.GL_ARRAY_BUFFER, self._vertices_id,
+            self._vertices, self._vertices_size )
+        if self._quad:
+            self._dirty = False
+            return
+        self._indices_id, self._indices_size = upload_buffer(
+            gl.GL_ELEMENT_ARRAY_BUFFER, self._indices_id,
+            self._indices, self._indices_size )
+        self._dirty = False
+
+
+    # ---------------------------------
+    def _bind(self, program, instances=None):
+        """ Bind buffers and enable attributes within program """
+
+        if instances is not None:
+            gl.glBindBuffer( gl.GL_ARRAY_BUFFER, instances._vertices_id )
+            for attribute in instances._attributes:
+                attribute.enable( program )
         gl.glBindBuffer( gl.GL_ARRAY_BUFFER, self._vertices_id )
-        gl.glBufferData( gl.GL_ARRAY_BUFFER, self._vertices.data, gl.GL_DYNAMIC_DRAW )
+        if self._quad:
+            self._quad.bind( len(self._vertices.data)//4 )
+        else:
+            gl.glBindBuffer( gl.GL_ELEMENT_ARRAY_BUFFER, self._indices_id )
+        for attribute in self._attributes:
+            attribute.enable( program )
+
+
+    # ---------------------------------
+    def _bind_array(self, program, instances=None):
+        """
+        Bind vertex array object recording buffers and attributes setup for
+        program, building it if necessary. There is a single one per program,
+        replaced whenever buffers have been (re)created or the program name
+        has been reused by another shader.
+        """
+
+        setup = ( self._vertices_id, self._indices_id,
+                  instances is not None and instances._vertices_id,
+                  Shader.from_handle(program) )
+        vao, vao_setup = self._vaos.get(program, (0, None))
+        if vao and vao_setup == setup:
+            gl.glBindVertexArray( vao )
+            return
+        if vao:
+            gl.glDeleteVertexArrays( 1, [vao] )
+        vao = gl.glGenVertexArrays(1)
+        gl.glBindVertexArray( vao )
+        self._bind( program, instances )
         gl.glBindBuffer( gl.GL_ARRAY_BUFFER, 0 )
+        self._vaos[program] = vao, setup
 
-        if not self._indices_id:
-            self._indices_id = gl.glGenBuffers(1)
-        gl.glBindBuffer( gl.GL_ELEMENT_ARRAY_BUFFER, self._indices_id )
-        gl.glBufferData( gl.GL_ELEMENT_ARRAY_BUFFER, self._indices.data, gl.GL_DYNAMIC_DRAW )
-        gl.glBindBuffer( gl.GL_ELEMENT_ARRAY_BUFFER, 0 )
 
-        self._dirty = False
+    # ---------------------------------
+    def delete(self):
+        """ Delete vertex arrays and buffers of this buffer (if any) """
+
+        if self._vaos:
+            vaos = [vao for vao, setup in self._vaos.values()]
+            gl.glDeleteVertexArrays( len(vaos), vaos )
+            self._vaos = {}
+        buffers = [id for id in (self._vertices_id, self._indices_id) if id]
+        if buffers:
+            gl.glDeleteBuffers( len(buffers), buffers )
+        self._vertices_id = self._indices_id = 0
+        self._vertices_size = self._indices_size = 0
+        self._dirty = True
+
+
+    # ---------------------------------
+    def __del__(self):
+        # Creation may have failed (invalid dtype)
+        if hasattr(self, '_vaos'):
+            self.delete()
 
 
     # ---------------------------------
-    def draw( self, mode=gl.GL_TRIANGLES ):
+    def draw( self, mode=gl.GL_TRIANGLES, instances=None, program=None ):
+        """
+        Draw buffer.
+
+        Parameters
+        ----------
+
+        mode: GLenum
+            Primitive type
+
+        instances: VertexBuffer
+            Buffer of per-instance attributes (created with a non zero
+            divisor). If given, buffer is drawn once per instance vertex.
+
+        program: int
+            Program the buffer is drawn with (default is current program)
+        """
 
         if self._dirty:
             self.upload()
-        gl.glBindBuffer( gl.GL_ARRAY_BUFFER, self._vertices_id )
-        gl.glBindBuffer( gl.GL_ELEMENT_ARRAY_BUFFER, self._indices_id )
-        for attribute in self._attributes:
-            attribute.enable()
-        gl.glDrawElements( mode, len(self._indices.data), gl.GL_UNSIGNED_INT, None)
+        if instances is not None and instances._dirty:
+            instances.upload()
+        if program is None:
+            program = int(gl.glGetIntegerv( gl.GL_CURRENT_PROGRAM ))
+        if self._quad:
+            quads = len(self._vertices.data)//4
+            count = 6*quads
+        else:
+            count = len(self._indices.data)
+
+        if VertexBuffer.vertex_arrays is None:
+            VertexBuffer.vertex_arrays = bool(gl.glGenVertexArrays)
+        if VertexBuffer.vertex_arrays:
+            self._bind_array( program, instances )
+            if self._quad:
+                self._quad.reserve( quads )
+        else:
+            self._bind( program, instances )
+
+        if instances is None:
+            gl.glDrawElements( mode, count, gl.GL_UNSIGNED_INT, None )
+        else:
+            gl.glDrawElementsInstanced( mode, count,
+                                        gl.GL_UNSIGNED_INT, None,
+                                        len(instances._vertices.data) )
+
+        if VertexBuffer.vertex_arrays:
+            gl.glBindVertexArray( 0 )
+            return
+        if instances is not None:
+            for attribute in instances._attributes:
+                attribute.disable()
         gl.glBindBuffer( gl.GL_ELEMENT_ARRAY_BUFFER, 0 )
         gl.glBindBuffer( gl.GL_ARRAY_BUFFER, 0 )
 
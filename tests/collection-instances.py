@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (C) 2013 Nicolas P. Rougier. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY NICOLAS P. ROUGIER ''AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL NICOLAS P. ROUGIER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of Nicolas P. Rougier.
+# -----------------------------------------------------------------------------
+"""
+Check that free instances of lazy instanced collections never use the
+uniforms of a live item (they are drawn anyway).
+
+Usage: python collection-instances.py
+"""
+import sys
+sys.path.insert(0, '..')
+import numpy as np
+from glagg import LineCollection
+
+
+# -------------------------------------
+def check(collection):
+    vertices = collection.vertices
+    uniforms = collection.uniforms
+    used = np.zeros(len(vertices.data), dtype=bool)
+    for start, stop in vertices.items:
+        used[start:stop] = True
+    live = set(uniforms.items[:,0])
+    for row in vertices.data['a_index'][~used].astype(int):
+        assert row not in live, "Free instance uses uniforms of a live item"
+        assert not uniforms.data[row:row+1].view(np.float32).any()
+
+
+# -------------------------------------
+np.random.seed(1)
+collection = LineCollection(instanced=True)
+for i in range(2000):
+    if len(collection) and np.random.uniform() < 0.45:
+        del collection[np.random.randint(len(collection))]
+    elif len(collection) and np.random.uniform() < 0.2:
+        n = np.random.randint(1,4)
+        vertices = np.random.uniform(0,100,(2*n,2))
+        collection.replace(np.random.randint(len(collection)),
+                           *collection.bake(vertices))
+    else:
+        n = np.random.randint(1,4)
+        collection.append(np.random.uniform(0,100,(2*n,2)),
+                          color=np.random.uniform(0,1,4))
+    check(collection)
+print "ok"
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (C) 2013 Nicolas P. Rougier. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY NICOLAS P. ROUGIER ''AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL NICOLAS P. ROUGIER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of Nicolas P. Rougier.
+# -----------------------------------------------------------------------------
+"""
+Check that sub-paths appended with a per sub-path scale are flattened (and
+flattened again) at the level of their own scale.
+
+Usage: python path-collection-lod.py
+"""
+import sys
+sys.path.insert(0, '..')
+import numpy as np
+from glagg import svg, PathCollection, Approximation
+
+
+# -------------------------------------
+def check(collection, path, scales):
+    levels = collection._lod_level(scales)
+    for key, level in enumerate(levels):
+        V = path.flatten(key, Approximation(2.0**level))
+        closed = ((V[0]-V[-1])**2).sum() < 1e-10
+        expected,_,_ = collection.bake(V, closed=closed)
+        vertices,_ = collection._vbuffer[key]
+        names = [name for name in expected.dtype.names if name != 'a_index']
+        for name in names:
+            assert np.allclose(vertices[name], expected[name])
+
+
+# -------------------------------------
+path = svg.load('tiger.svg')
+count = len(path.vertices)
+assert all(len(V) > 1 for V in path.vertices)
+collection = PathCollection()
+scales = np.linspace(0.5, 4, count)
+collection.append_path(path, scale=scales)
+check(collection, path, scales)
+
+np.random.seed(1)
+for key in np.random.randint(0, count, 50):
+    scales[key] = np.random.choice([0.25, 1.0, 3.0, 16.0])
+    collection[key]['scale'] = scales[key]
+collection.update_lod()
+check(collection, path, scales)
+print "ok"
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (C) 2013 Nicolas P. Rougier. All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 
+# THIS SOFTWARE IS PROVIDED BY NICOLAS P. ROUGIER ''AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO
+# EVENT SHALL NICOLAS P. ROUGIER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT,
+# INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+# 
+# The views and conclusions contained in the software and documentation are
+# those of the authors and should not be interpreted as representing official
+# policies, either expressed or implied, of Nicolas P. Rougier.
+# -----------------------------------------------------------------------------
+"""
+Check that distance fields of thin strokes (a pixel wide or less) are finite
+and keep strokes inside (below 0.5) and background outside (above 0.5).
+
+Usage: python sdf-thin-strokes.py (sdf extension being built in place)
+"""
+import sys
+sys.path.insert(0, '..')
+import numpy as np
+from glagg.sdf.sdf import compute_sdf_fh
+
+
+# -------------------------------------
+for width in (1, 2, 3):
+    for coverage in (0.6, 1.0):
+        for axis in (0, 1):
+            Z = np.zeros((9,9), np.float32)
+            Z[:,4:4+width] = coverage
+            if axis:
+                Z = np.ascontiguousarray(Z.T)
+            stroke = Z > 0.5
+            compute_sdf_fh(Z)
+            assert np.isfinite(Z).all()
+            assert (Z[stroke] < 0.5).all() and (Z[~stroke] > 0.5).all()
+
+# Single pixel and empty bitmap
+Z = np.zeros((9,9), np.float32)
+Z[4,4] = 1
+compute_sdf_fh(Z)
+assert np.isfinite(Z).all() and Z[4,4] < 0.5
+Z = np.zeros((9,9), np.float32)
+compute_sdf_fh(Z)
+assert np.isfinite(Z).all()
+print "ok"